@@ -0,0 +1,95 @@
+# Compares recall and search latency of shortened text-embedding-3 vectors against full size.
+#   python -m benchmarks.embedding_dimensions --collection "Acme Aerospace"
+#
+# Shortening a text-embedding-3 vector and re-normalising it gives the same vector the API
+# returns for that `dimensions` value, so the stored full-size vectors are cut down locally
+# and only the clause queries are embedded.
+import argparse
+import json
+import os
+import time
+import numpy as np
+from dotenv import load_dotenv
+from qdrant_client.models import VectorParams, Distance, PointStruct
+from src.config import EmbeddingConfig
+from src.embeddings import embed_query
+from src.clients import get_qdrant_client
+from src.qdrant_operations import SEARCH_PARAMS
+from src.utils import load_notable_clauses
+from benchmarks.quantization_recall import load_vectors
+
+load_dotenv()
+
+DIMENSIONS = [256, 512, 768, 1024, 1536]
+
+def shorten(vectors: np.ndarray, dimensions: int) -> np.ndarray:
+    shortened = vectors[:, :dimensions]
+    return shortened / np.linalg.norm(shortened, axis=1, keepdims=True)
+
+def benchmark_dimensions(client, vectors: np.ndarray, queries: np.ndarray, dimensions: int, top_k: int):
+    expected = np.argsort(-(queries @ vectors.T), axis=1)[:, :top_k]
+    found = np.argsort(-(shorten(queries, dimensions) @ shorten(vectors, dimensions).T), axis=1)[:, :top_k]
+    recall = sum(len(set(a) & set(b)) for a, b in zip(expected, found)) / expected.size
+
+    collection_name = f"embedding_dimensions_benchmark_{dimensions}"
+    client.recreate_collection(
+        collection_name=collection_name,
+        vectors_config=VectorParams(size=dimensions, distance=Distance.COSINE),
+    )
+    try:
+        short_vectors = shorten(vectors, dimensions)
+        for i in range(0, len(short_vectors), 100):
+            client.upsert(collection_name=collection_name, points=[
+                PointStruct(id=i + j, vector=vector.tolist()) for j, vector in enumerate(short_vectors[i:i+100])
+            ])
+        latencies = []
+        for query in shorten(queries, dimensions):
+            start = time.perf_counter()
+            client.search(collection_name=collection_name, query_vector=query.tolist(), limit=top_k, search_params=SEARCH_PARAMS)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        client.delete_collection(collection_name=collection_name)
+
+    return {
+        "dimensions": dimensions,
+        "recall": recall,
+        "search_ms_mean": 1000 * float(np.mean(latencies)),
+        "search_ms_p95": 1000 * float(np.percentile(latencies, 95)),
+        "bytes_per_vector": dimensions * 4,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall and latency of reduced embedding dimensions")
+    parser.add_argument("--collection", required=True, help="Collection of full-size vectors to sample from")
+    parser.add_argument("--sample", type=int, default=2000)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "embedding_dimensions.json"))
+    args = parser.parse_args()
+
+    full_size = EmbeddingConfig()
+    client = get_qdrant_client()
+    vectors = load_vectors(client, args.collection, args.sample)
+    if vectors.shape[1] != full_size.dimensions:
+        raise ValueError(f"{args.collection} holds {vectors.shape[1]}-dimension vectors, need {full_size.dimensions}")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    # The notable clause queries are what the review pipeline actually searches for
+    queries = np.asarray([
+        embed_query(f"{clause_id}: {clause_info['Description']}", full_size)
+        for clause_id, clause_info in load_notable_clauses().items()
+    ], dtype=np.float32)
+
+    report = {
+        "collection": args.collection,
+        "vectors": len(vectors),
+        "queries": len(queries),
+        "top_k": args.top_k,
+        "results": [benchmark_dimensions(client, vectors, queries, dimensions, args.top_k) for dimensions in DIMENSIONS],
+    }
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+# Deterministic local stand-ins for OpenAI, LlamaParse and Qdrant so the pipeline can be
+# benchmarked without network access or API spend.
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+import numpy as np
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import DecodedStreamObject, NameObject
+
+SYNTHETIC_PAGE_PATTERN = re.compile(rb"% synthetic doc=(\S+) type=(\S+) page=(\d+)")
+
+class FakeRateLimitError(Exception):
+    pass
+
+class Throttle:
+    # Fixed latency per request plus a sliding one-minute request budget. Over budget,
+    # requests either wait for a slot (like a client backing off on 429s) or fail.
+    def __init__(self, latency: float = 0.0, requests_per_minute: int = 0, mode: str = "wait"):
+        self.latency = latency
+        self.requests_per_minute = requests_per_minute
+        self.mode = mode
+        self.requests = 0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+        self._window = deque()
+
+    def __call__(self):
+        if self.requests_per_minute:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    while self._window and now - self._window[0] > 60:
+                        self._window.popleft()
+                    if len(self._window) < self.requests_per_minute:
+                        self._window.append(now)
+                        break
+                    self.rate_limited += 1
+                    wait = 60 - (now - self._window[0])
+                if self.mode == "error":
+                    raise FakeRateLimitError("Rate limit reached")
+                time.sleep(min(wait, 1.0))
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+def _words(text: str):
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+def fake_embedding(text: str, dimensions: int) -> list:
+    # Feature hashing of words, so texts sharing vocabulary land close together
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for word in _words(text):
+        digest = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+        vector[digest % dimensions] += 1.0 if (digest >> 32) & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        vector[0] = 1.0
+        norm = 1.0
+    return (vector / norm).tolist()
+
+class FakeEncoding:
+    # Splits into words, punctuation and whitespace runs instead of BPE, so chunk sizes are in
+    # the same ballpark as tiktoken's without downloading its ranks
+    TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]|\s+")
+
+    def encode(self, text: str, **_) -> list:
+        return self.TOKEN_PATTERN.findall(text)
+
+def _usage(prompt: str, completion: str = ""):
+    prompt_tokens = max(1, len(prompt) // 4)
+    completion_tokens = len(completion) // 4
+    return SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                           total_tokens=prompt_tokens + completion_tokens)
+
+class _FakeEmbeddings:
+    def __init__(self, throttle: Throttle, dimensions: int):
+        self.throttle = throttle
+        self.dimensions = dimensions
+
+    def create(self, input, model, dimensions=None, **kwargs):
+        self.throttle()
+        texts = [input] if isinstance(input, str) else list(input)
+        return SimpleNamespace(
+            data=[SimpleNamespace(embedding=fake_embedding(text, dimensions or self.dimensions), index=i)
+                  for i, text in enumerate(texts)],
+            model=model,
+            usage=_usage(" ".join(texts)),
+        )
+
+def _prompt_of(messages) -> str:
+    return "\n".join(message["content"] for message in messages)
+
+def _document_type(prompt: str) -> str:
+    text = prompt.lower()
+    if "purchase order no" in text:
+        return "Purchase Order"
+    if "terms and conditions of purchase" in text:
+        return "Terms and Conditions"
+    return "Quality Document"
+
+def _fake_parsed(response_format, prompt: str):
+    name = response_format.__name__
+    if name == "POAnalysisResponse":
+        return response_format(all_invoked=False, clause_identifiers=[f"WQR{i}" for i in range(1, 8)],
+                               requirements=["Certificate of conformance required with each shipment"])
+    if name == "ClauseAnalysisResponse":
+        clause = re.search(r"Clause ID: (.+)", prompt).group(1).strip()
+        invoked = int(hashlib.sha256(clause.encode("utf-8")).hexdigest(), 16) % 2 == 0
+        quotes = []
+        if invoked:
+            chunk = re.search(r'"content": "(.{0,200})', prompt)
+            quotes.append({"quote": chunk.group(1) if chunk else clause, "document_type": "Quality Document",
+                           "header": "Synthetic", "requires_human_review": "No"})
+        return response_format(clause=clause, invoked="Yes" if invoked else "No", quotes=quotes)
+    return response_format.model_construct()
+
+def _completion(content: str, prompt: str, parsed=None):
+    message = SimpleNamespace(content=content, parsed=parsed, role="assistant")
+    return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop", index=0)],
+                           usage=_usage(prompt, content))
+
+def _stream(content: str):
+    for i in range(0, len(content), 16):
+        delta = SimpleNamespace(content=content[i:i+16])
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=None, index=0)], usage=None)
+
+class _FakeCompletions:
+    def __init__(self, throttle: Throttle):
+        self.throttle = throttle
+
+    def create(self, model, messages, response_format=None, stream=False, **kwargs):
+        self.throttle()
+        prompt = _prompt_of(messages)
+        if response_format and response_format.get("type") == "json_object":
+            content = json.dumps({"referenced_documents": [
+                {"identifier": "QP-100 Rev F", "document_type": "Quality Document", "location": "Supplier portal"}
+            ]})
+        else:
+            content = "Based on the provided context, the requirement applies to all shipments."
+        if stream:
+            return _stream(content)
+        return _completion(content, prompt)
+
+    def parse(self, model, messages, response_format=None, **kwargs):
+        self.throttle()
+        prompt = _prompt_of(messages)
+        if response_format is None:
+            return _completion(_document_type(prompt), prompt)
+        parsed = _fake_parsed(response_format, prompt)
+        return _completion(parsed.model_dump_json(), prompt, parsed)
+
+class FakeOpenAI:
+    def __init__(self, latency: float = 0.0, requests_per_minute: int = 0, rate_limit_mode: str = "wait",
+                 dimensions: int = 1536):
+        self.throttle = Throttle(latency, requests_per_minute, rate_limit_mode)
+        self.embeddings = _FakeEmbeddings(self.throttle, dimensions)
+        self.chat = SimpleNamespace(completions=_FakeCompletions(self.throttle))
+        self.beta = SimpleNamespace(chat=SimpleNamespace(completions=self.chat.completions))
+
+def synthetic_page_markdown(doc_id: str, doc_type: str, page: int) -> str:
+    rng = np.random.default_rng(int(hashlib.sha256(f"{doc_id}:{page}".encode("utf-8")).hexdigest()[:8], 16))
+    lines = []
+    if page == 1 and doc_type == "po":
+        lines += [f"# PURCHASE ORDER NO. {doc_id.upper()}", "", "Quality requirements WQR1-WQR7 apply.", ""]
+    elif page == 1 and doc_type == "tc":
+        lines += ["# TERMS AND CONDITIONS OF PURCHASE", ""]
+    topics = ["Shelf life", "Counterfeit parts", "DFARS specialty metals", "First article inspection",
+              "Record retention", "Foreign object debris", "Calibration", "Flow down of requirements"]
+    for section in range(3):
+        topic = topics[int(rng.integers(len(topics)))]
+        lines.append(f"## {page}.{section + 1} {topic}")
+        for _ in range(int(rng.integers(2, 5))):
+            words = rng.choice(["seller", "shall", "supplier", "comply", "records", "inspection", "material",
+                                "certificate", "buyer", "approval", "retain", "years", "notify", "changes",
+                                topic.lower()], size=int(rng.integers(25, 60)))
+            lines.append(" ".join(words).capitalize() + ".")
+            lines.append("")
+        if rng.random() < 0.25:
+            lines.append("| Part number | Quantity | Shelf life |")
+            lines.append("|---|---|---|")
+            for row in range(int(rng.integers(3, 15))):
+                lines.append(f"| P{page:03d}-{row:03d} | {int(rng.integers(1, 500))} | {int(rng.integers(6, 60))} months |")
+            lines.append("")
+    return "\n".join(lines)
+
+def write_synthetic_pdf(path: str, doc_id: str, doc_type: str, pages: int):
+    # Blank pages whose content stream only holds a marker comment, FakeLlamaParse
+    # turns each marker into generated markdown
+    writer = PdfWriter()
+    for page_number in range(1, pages + 1):
+        page = writer.add_blank_page(612, 792)
+        stream = DecodedStreamObject()
+        stream.set_data(f"% synthetic doc={doc_id} type={doc_type} page={page_number}\n".encode("utf-8"))
+        page[NameObject("/Contents")] = writer._add_object(stream)
+    with open(path, "wb") as f:
+        writer.write(f)
+
+class FakeLlamaParse:
+    def __init__(self, latency_per_page: float = 0.0):
+        self.latency_per_page = latency_per_page
+        self.pages_parsed = 0
+        self._lock = threading.Lock()
+
+    def load_data(self, file_path, **kwargs):
+        documents = []
+        for page in PdfReader(file_path).pages:
+            contents = page.get_contents()
+            match = SYNTHETIC_PAGE_PATTERN.search(contents.get_data() if contents is not None else b"")
+            if match:
+                doc_id, doc_type, number = match.group(1).decode(), match.group(2).decode(), int(match.group(3))
+                text = synthetic_page_markdown(doc_id, doc_type, number)
+            else:
+                text = ""
+            documents.append(SimpleNamespace(text=text, metadata={}))
+            if self.latency_per_page:
+                time.sleep(self.latency_per_page)
+        with self._lock:
+            self.pages_parsed += len(documents)
+        return documents
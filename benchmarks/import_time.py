@@ -0,0 +1,118 @@
+# Measures how long the app takes to import and to show its first window, and which
+# heavy libraries get pulled in on the way.
+#   python -m benchmarks.import_time --runs 5
+# Each run is a fresh interpreter, so numbers include bytecode loading but not a cold disk cache.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from benchmarks.offline_pipeline import git_version
+
+# Should only load once a job or a chat actually needs them
+HEAVY_MODULES = ["openai", "llama_parse", "llama_index", "langchain_text_splitters", "tiktoken", "pytesseract",
+                 "PIL", "pypdf", "qdrant_client", "numpy", "pydantic", "tenacity"]
+
+FIRST_WINDOW_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+from PyQt5.QtWidgets import QApplication
+from gui.tabbed_interface import TabbedInterface
+app = QApplication(sys.argv)
+window = TabbedInterface()
+window.show()
+app.processEvents()
+print(time.perf_counter() - start)
+"""
+
+def parse_importtime(stderr: str):
+    # Lines look like "import time:       self [us] |  cumulative | imported package"
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append({"module": name.strip(), "self_us": int(self_us), "cumulative_us": int(cumulative_us)})
+    return modules
+
+def measure_import(target: str):
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {target}"],
+                               capture_output=True, text=True, cwd=os.getcwd())
+    wall = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {target} failed:\n{completed.stderr[-2000:]}")
+    modules = parse_importtime(completed.stderr)
+    top_level = {module["module"].split(".")[0] for module in modules}
+    total = next((module["cumulative_us"] for module in modules if module["module"] == target), None)
+    return {
+        "wall_seconds": wall,
+        "import_seconds": total / 1e6 if total is not None else None,
+        "heavy_modules_loaded": sorted(name for name in HEAVY_MODULES if name in top_level),
+        "slowest": sorted(modules, key=lambda module: -module["self_us"])[:15],
+    }
+
+def measure_first_window():
+    environment = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    completed = subprocess.run([sys.executable, "-c", FIRST_WINDOW_SCRIPT], capture_output=True, text=True,
+                               cwd=os.getcwd(), env=environment)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Could not open the window: {completed.stderr.strip()[-500:]}")
+    return float(completed.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time and time to first window")
+    parser.add_argument("--target", default="main", help="Module to import")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--no-window", action="store_true", help="Skip opening the window, e.g. without PyQt5")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Exit with status 1 if the median import is slower")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    runs = [measure_import(args.target) for _ in range(args.runs)]
+    windows = []
+    window_errors = []
+    for _ in range(0 if args.no_window else args.runs):
+        try:
+            windows.append(measure_first_window())
+        except RuntimeError as e:
+            print(f"Warning: {e}", file=sys.stderr)
+            window_errors.append(str(e))
+
+    import_ms = statistics.median(run["import_seconds"] for run in runs) * 1000
+    version = git_version()
+    report = {
+        "version": version,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "target": args.target,
+        "runs": args.runs,
+        "import_ms_median": round(import_ms, 1),
+        "interpreter_wall_ms_median": round(statistics.median(run["wall_seconds"] for run in runs) * 1000, 1),
+        "first_window_ms_median": round(statistics.median(windows) * 1000, 1) if windows else None,
+        # Runs where the window didn't open are left out of the median
+        "first_window_errors": window_errors,
+        "heavy_modules_loaded": runs[-1]["heavy_modules_loaded"],
+        "slowest_modules": runs[-1]["slowest"],
+    }
+    output = args.output or os.path.join("benchmarks", "results", f"import_time_{version}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"import {args.target}: {report['import_ms_median']} ms (median of {args.runs})")
+    print(f"first window: {report['first_window_ms_median']} ms")
+    if window_errors:
+        print(f"  the window didn't open in {len(window_errors)} of {args.runs} runs, see first_window_errors")
+    print(f"heavy modules loaded at import: {', '.join(report['heavy_modules_loaded']) or 'none'}")
+    for module in report["slowest_modules"][:10]:
+        print(f"  {module['self_us'] / 1000:8.1f} ms  {module['module']}")
+    print(f"Saved results to {output}")
+
+    if args.budget_ms is not None and import_ms > args.budget_ms:
+        print(f"Import time {import_ms:.1f} ms is over the {args.budget_ms} ms budget")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+# Runs review_documents end to end on synthetic jobs against local fakes and reports
+# per-stage time, throughput and peak memory.
+#   python -m benchmarks.offline_pipeline --sizes small medium --latency 0.2 --requests-per-minute 3000
+import argparse
+import functools
+import inspect
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+JOB_SIZES = {
+    "small": {"documents": 3, "pages": 5, "clauses": 5},
+    "medium": {"documents": 5, "pages": 40, "clauses": 15},
+    "large": {"documents": 8, "pages": 200, "clauses": 30},
+}
+
+# (module, function, stage name) for every function patched with a timer
+STAGES = [
+    ("src.document_processing", "parse_document", "parse"),
+    ("src.document_processing", "determine_document_type", "classify"),
+    ("src.document_processing", "chunk_markdown_text", "chunk"),
+    ("src.document_processing", "reuse_known_embeddings", "near_duplicates"),
+    ("src.document_processing", "create_embeddings", "embed"),
+    ("src.document_processing", "review_po", "po_analysis"),
+    ("src.review", "attach_corpus_document", "corpus_attach"),
+    ("src.review", "store_embeddings_in_qdrant", "store"),
+    ("src.review", "query_qdrant_for_clauses", "query"),
+    ("src.review", "analyze_clauses_batch", "clause_analysis"),
+]
+
+class StageTimer:
+    # Accumulates busy time per stage across threads, generators are only charged
+    # for the time spent producing items
+    def __init__(self):
+        self.seconds = {}
+        self.calls = {}
+        self._lock = threading.Lock()
+        self._patches = []
+
+    def add(self, stage: str, seconds: float, call: bool = True):
+        with self._lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+            if call:
+                self.calls[stage] = self.calls.get(stage, 0) + 1
+
+    def wrap(self, module, name: str, stage: str):
+        original = getattr(module, name)
+
+        if inspect.iscoroutinefunction(original):
+            @functools.wraps(original)
+            async def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await original(*args, **kwargs)
+                finally:
+                    self.add(stage, time.perf_counter() - start)
+        elif inspect.isgeneratorfunction(original):
+            @functools.wraps(original)
+            def wrapper(*args, **kwargs):
+                generator = original(*args, **kwargs)
+                self.add(stage, 0.0)
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        item = next(generator)
+                    except StopIteration:
+                        self.add(stage, time.perf_counter() - start, call=False)
+                        return
+                    self.add(stage, time.perf_counter() - start, call=False)
+                    yield item
+        else:
+            @functools.wraps(original)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    self.add(stage, time.perf_counter() - start)
+
+        setattr(module, name, wrapper)
+        self._patches.append((module, name, original))
+
+    def reset(self):
+        with self._lock:
+            self.seconds.clear()
+            self.calls.clear()
+
+    def restore(self):
+        for module, name, original in reversed(self._patches):
+            setattr(module, name, original)
+        self._patches.clear()
+
+def git_version() -> str:
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def install_fakes(args):
+    # Imported here so CONTRACT_REVIEW_CACHE_DIR is already pointing at the scratch directory
+    from qdrant_client import QdrantClient
+    import src.chunking
+    import src.cpu_pool
+    import src.review
+    import src.usage
+    from src.clients import set_client
+    from src.config import embedding_config
+    from benchmarks.fakes import FakeEncoding, FakeOpenAI, FakeLlamaParse
+
+    openai = FakeOpenAI(args.latency, args.requests_per_minute, args.rate_limit_mode, embedding_config.dimensions)
+    llama_parse = FakeLlamaParse(args.parse_latency)
+    qdrant = QdrantClient(":memory:")
+
+    set_client("openai", openai)
+    set_client("llama_parse", llama_parse)
+    set_client("qdrant", qdrant)
+    encoding = FakeEncoding()
+    src.chunking.get_encoding = lambda: encoding
+    src.usage._encoding = lambda model: encoding
+    # Spawned CPU workers import the real modules and would load tiktoken, chunk in this process
+    src.cpu_pool.CPU_WORKERS = 0
+    return openai, llama_parse, qdrant
+
+def make_job(work_dir: str, name: str, spec: dict):
+    from benchmarks.fakes import write_synthetic_pdf
+
+    file_paths = []
+    for i in range(spec["documents"]):
+        doc_type = "po" if i == 0 else "tc" if i == 1 else "quality"
+        path = os.path.join(work_dir, f"{name}-{doc_type}-{i}.pdf")
+        write_synthetic_pdf(path, f"{name}-{i}", doc_type, spec["pages"])
+        file_paths.append(path)
+    return file_paths
+
+def clause_subset(count: int):
+    from src.utils import load_notable_clauses
+
+    clauses = load_notable_clauses()
+    names = list(clauses)
+    subset = {}
+    for i in range(count):
+        name = names[i % len(names)]
+        subset[name if i < len(names) else f"{name} ({i // len(names) + 1})"] = clauses[name]
+    return subset
+
+def run_job(name: str, spec: dict, file_paths, timer: StageTimer, fakes, trace_memory: bool):
+    import src.review
+
+    openai, llama_parse, qdrant = fakes
+    src.review.load_notable_clauses = lambda: clause_subset(spec["clauses"])
+    timer.reset()
+    requests_before = openai.throttle.requests
+    rate_limited_before = openai.throttle.rate_limited
+    pages_before = llama_parse.pages_parsed
+
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    # Warm runs measure the caches, not the stored report for identical inputs
+    result = src.review.review_documents(file_paths, f"benchmark-{name}", reuse_stored=False)
+    wall = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    if trace_memory:
+        tracemalloc.stop()
+
+    points = qdrant.count(collection_name=f"benchmark-{name}").count
+    pages = spec["documents"] * spec["pages"]
+    return {
+        "job": name,
+        **spec,
+        "wall_seconds": round(wall, 3),
+        "stages": {stage: {"seconds": round(seconds, 3), "calls": timer.calls.get(stage, 0)}
+                   for stage, seconds in sorted(timer.seconds.items(), key=lambda item: -item[1])},
+        "throughput": {
+            "documents_per_second": round(spec["documents"] / wall, 3),
+            "pages_per_second": round(pages / wall, 3),
+            "clauses_per_second": round(spec["clauses"] / wall, 3),
+        },
+        "points_stored": points,
+        "invoked_clauses": len(result["clause_analysis"]),
+        "openai_requests": openai.throttle.requests - requests_before,
+        "rate_limited_requests": openai.throttle.rate_limited - rate_limited_before,
+        "llamaparse_pages": llama_parse.pages_parsed - pages_before,
+        "usage": result["usage"]["totals"],
+        "peak_traced_mb": round(peak / 2**20, 2) if peak is not None else None,
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of review_documents")
+    parser.add_argument("--sizes", nargs="+", default=["small", "medium"], choices=list(JOB_SIZES))
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every OpenAI request")
+    parser.add_argument("--parse-latency", type=float, default=0.0, help="Seconds added per LlamaParse page")
+    parser.add_argument("--requests-per-minute", type=int, default=0, help="OpenAI request budget, 0 for unlimited")
+    parser.add_argument("--rate-limit-mode", choices=["wait", "error"], default="wait")
+    parser.add_argument("--warm", action="store_true", help="Run each job a second time against the warm caches")
+    parser.add_argument("--no-trace-memory", action="store_true", help="Skip tracemalloc, it slows the run down")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="contract-review-benchmark-")
+    os.environ["CONTRACT_REVIEW_CACHE_DIR"] = os.path.join(work_dir, "cache")
+    sys.path.insert(0, os.getcwd())
+
+    fakes = install_fakes(args)
+    timer = StageTimer()
+    for module_name, function_name, stage in STAGES:
+        timer.wrap(sys.modules[module_name], function_name, stage)
+
+    jobs = []
+    try:
+        for name in args.sizes:
+            file_paths = make_job(work_dir, name, JOB_SIZES[name])
+            jobs.append({"run": "cold", **run_job(name, JOB_SIZES[name], file_paths, timer, fakes, not args.no_trace_memory)})
+            if args.warm:
+                jobs.append({"run": "warm", **run_job(name, JOB_SIZES[name], file_paths, timer, fakes, not args.no_trace_memory)})
+    finally:
+        timer.restore()
+
+    version = git_version()
+    report = {
+        "version": version,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": {key: value for key, value in vars(args).items() if key != "output"},
+        "jobs": jobs,
+    }
+    output = args.output or os.path.join("benchmarks", "results", f"offline_pipeline_{version}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    print(f"Saved results to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# Measures how much recall compact vector storage costs, on the vectors of an existing collection.
+#   python -m benchmarks.quantization_recall --collection "Acme Aerospace"
+import argparse
+import json
+import os
+import time
+import numpy as np
+from dotenv import load_dotenv
+from qdrant_client.models import VectorParams, Distance, PointStruct
+from src.clients import get_qdrant_client
+from src.qdrant_operations import quantization_config, measure_quantization_recall
+from src.embeddings import compress_embedding, decompress_embedding
+
+load_dotenv()
+
+def load_vectors(client, collection_name: str, limit: int) -> np.ndarray:
+    vectors = []
+    offset = None
+    while len(vectors) < limit:
+        points, offset = client.scroll(collection_name=collection_name, limit=min(256, limit - len(vectors)),
+                                       offset=offset, with_vectors=True, with_payload=False)
+        vectors.extend(point.vector for point in points)
+        if offset is None:
+            break
+    return np.asarray(vectors, dtype=np.float32)
+
+def top_k_ids(vectors: np.ndarray, queries: np.ndarray, top_k: int) -> np.ndarray:
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = queries @ normalized.T
+    return np.argsort(-scores, axis=1)[:, :top_k]
+
+def local_cache_recall(vectors: np.ndarray, queries: np.ndarray, top_k: int):
+    expected = top_k_ids(vectors, queries, top_k)
+    results = {}
+    for dtype in ("float16", "int8"):
+        restored = np.stack([decompress_embedding(compress_embedding(vector, dtype)) for vector in vectors])
+        found = top_k_ids(restored, queries, top_k)
+        hits = sum(len(set(a) & set(b)) for a, b in zip(expected, found))
+        results[dtype] = {
+            "recall": hits / expected.size,
+            "bytes_per_vector": sum(array.nbytes for array in compress_embedding(vectors[0], dtype).values())
+        }
+    results["float32"] = {"recall": 1.0, "bytes_per_vector": vectors[0].nbytes}
+    return results
+
+def qdrant_recall(client, vectors: np.ndarray, queries: np.ndarray, top_k: int):
+    # Runs on a temporary int8 copy of the sample so the source collection is left alone
+    collection_name = "quantization_recall_benchmark"
+    client.recreate_collection(
+        collection_name=collection_name,
+        vectors_config=VectorParams(size=vectors.shape[1], distance=Distance.COSINE),
+        quantization_config=quantization_config("int8"),
+    )
+    try:
+        for i in range(0, len(vectors), 100):
+            client.upsert(collection_name=collection_name, points=[
+                PointStruct(id=i + j, vector=vector.tolist()) for j, vector in enumerate(vectors[i:i+100])
+            ])
+        start = time.perf_counter()
+        recall = measure_quantization_recall(client, collection_name, [query.tolist() for query in queries], top_k)
+        recall["seconds"] = time.perf_counter() - start
+        return recall
+    finally:
+        client.delete_collection(collection_name=collection_name)
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall of int8/float16 vector storage against full precision")
+    parser.add_argument("--collection", required=True)
+    parser.add_argument("--sample", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "quantization_recall.json"))
+    args = parser.parse_args()
+
+    client = get_qdrant_client()
+    vectors = load_vectors(client, args.collection, args.sample)
+    # Stored chunks stand in for queries, with a little noise so they don't match themselves exactly
+    rng = np.random.default_rng(0)
+    queries = vectors[rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)]
+    queries = queries + rng.normal(0, 0.01, queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    report = {
+        "collection": args.collection,
+        "vectors": len(vectors),
+        "queries": len(queries),
+        "top_k": args.top_k,
+        "local_cache": local_cache_recall(vectors, queries, args.top_k),
+        "qdrant_int8": qdrant_recall(client, vectors, queries, args.top_k),
+    }
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
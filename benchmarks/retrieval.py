@@ -0,0 +1,206 @@
+# Sweeps chunking, top_k, embedding dimensions and retrieval mode over a labelled corpus and
+# reports recall@k of the expected clause quotes, prompt size and query latency.
+#   python -m benchmarks.retrieval --corpus benchmarks/data/labelled_corpus.example.json --fake
+#
+# Corpus format: {"documents": [{"name", "document_type", "markdown" | "markdown_path"}],
+#                 "labels": [{"clause", "quotes": [...], "document_types": [...] (optional)}]}
+# Clause queries are built from notable_clauses.json exactly like review_documents does.
+import argparse
+import itertools
+import json
+import math
+import os
+import re
+import sys
+import tempfile
+import time
+from collections import Counter
+import numpy as np
+
+DEFAULT_CHUNK_TOKENS = [200, 400, 800]
+DEFAULT_CHUNK_OVERLAP = [0, 40]
+DEFAULT_TOP_K = [5, 10, 20]
+DEFAULT_DIMENSIONS = [512, 1536]
+MODES = ["dense", "hybrid", "filtered"]
+# Hybrid fuses dense and keyword rankings over this many candidates per result slot
+HYBRID_CANDIDATES = 4
+RRF_K = 60
+QUOTE_SHINGLE_WORDS = 5
+QUOTE_MATCH_THRESHOLD = 0.8
+
+def _words(text: str):
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+def _shingles(words):
+    return {tuple(words[i:i + QUOTE_SHINGLE_WORDS]) for i in range(max(1, len(words) - QUOTE_SHINGLE_WORDS + 1))}
+
+def quote_found(quote: str, chunks) -> bool:
+    # A quote counts as retrieved when most of its word 5-grams are in a single chunk,
+    # which tolerates OCR noise and quotes cut at a chunk boundary
+    quote_shingles = _shingles(_words(quote))
+    return any(len(quote_shingles & _shingles(_words(chunk["content"]))) >= QUOTE_MATCH_THRESHOLD * len(quote_shingles)
+               for chunk in chunks)
+
+class BM25:
+    def __init__(self, texts, k1: float = 1.5, b: float = 0.75):
+        self.documents = [Counter(_words(text)) for text in texts]
+        self.lengths = np.array([sum(document.values()) for document in self.documents], dtype=np.float32)
+        self.average_length = float(self.lengths.mean()) if len(self.lengths) else 0.0
+        frequencies = Counter(word for document in self.documents for word in document)
+        self.idf = {word: math.log(1 + (len(self.documents) - count + 0.5) / (count + 0.5)) for word, count in frequencies.items()}
+        self.k1 = k1
+        self.b = b
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        for word in set(_words(query)):
+            idf = self.idf.get(word)
+            if idf is None:
+                continue
+            tf = np.array([document.get(word, 0) for document in self.documents], dtype=np.float32)
+            scores += idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * self.lengths / self.average_length))
+        return scores
+
+def load_corpus(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        corpus = json.load(f)
+    for document in corpus["documents"]:
+        if "markdown" not in document:
+            with open(os.path.join(os.path.dirname(path), document["markdown_path"]), "r", encoding="utf-8") as f:
+                document["markdown"] = f.read()
+    return corpus
+
+def build_collection(client, documents, chunk_tokens: int, chunk_overlap: int, config):
+    from qdrant_client.models import VectorParams, Distance, PointStruct
+    from src.chunking import chunk_markdown_text
+    from src.embeddings import create_embeddings
+
+    payloads = [
+        chunk.to_payload(document_type=document["document_type"], document_name=document["name"])
+        for document in documents
+        for chunk in chunk_markdown_text(document["markdown"], chunk_tokens, chunk_overlap)
+    ]
+    embeddings = create_embeddings([payload["content"] for payload in payloads], config=config)
+
+    collection_name = f"retrieval_benchmark_{chunk_tokens}_{chunk_overlap}_{config.dimensions}"
+    client.recreate_collection(
+        collection_name=collection_name,
+        vectors_config=VectorParams(size=config.dimensions, distance=Distance.COSINE),
+    )
+    points = [PointStruct(id=i, vector=embedding.tolist(), payload=payload)
+              for i, (payload, embedding) in enumerate(zip(payloads, embeddings)) if embedding is not None]
+    for i in range(0, len(points), 100):
+        client.upsert(collection_name=collection_name, points=points[i:i+100])
+    return collection_name, payloads, BM25([payload["content"] for payload in payloads])
+
+def retrieve(client, collection_name: str, payloads, bm25: BM25, query: str, query_vector, top_k: int, mode: str, document_types):
+    from qdrant_client.models import Filter, FieldCondition, MatchAny
+    from src.qdrant_operations import SEARCH_PARAMS
+
+    if mode == "filtered" and document_types:
+        query_filter = Filter(must=[FieldCondition(key="metadata.document_type", match=MatchAny(any=document_types))])
+        hits = client.search(collection_name=collection_name, query_vector=query_vector, limit=top_k,
+                             query_filter=query_filter, search_params=SEARCH_PARAMS)
+        return [hit.payload for hit in hits]
+    if mode != "hybrid":
+        hits = client.search(collection_name=collection_name, query_vector=query_vector, limit=top_k, search_params=SEARCH_PARAMS)
+        return [hit.payload for hit in hits]
+
+    # Reciprocal rank fusion of the dense and BM25 rankings
+    candidates = top_k * HYBRID_CANDIDATES
+    hits = client.search(collection_name=collection_name, query_vector=query_vector, limit=candidates, search_params=SEARCH_PARAMS)
+    fused = Counter()
+    for rank, hit in enumerate(hits):
+        fused[hit.id] += 1 / (RRF_K + rank + 1)
+    for rank, index in enumerate(np.argsort(-bm25.scores(query))[:candidates]):
+        fused[int(index)] += 1 / (RRF_K + rank + 1)
+    return [payloads[index] for index, _ in fused.most_common(top_k)]
+
+def run_sweep(client, corpus, args):
+    from src.chunking import count_tokens
+    from src.config import EmbeddingConfig, embedding_config
+    from src.embeddings import embed_query
+    from src.utils import load_notable_clauses
+
+    notable_clauses = load_notable_clauses()
+    labels = [label for label in corpus["labels"] if label["clause"] in notable_clauses]
+    rows = []
+    for chunk_tokens, chunk_overlap, dimensions in itertools.product(args.chunk_tokens, args.chunk_overlap, args.dimensions):
+        config = EmbeddingConfig(model=embedding_config.model, dimensions=dimensions)
+        collection_name, payloads, bm25 = build_collection(client, corpus["documents"], chunk_tokens, chunk_overlap, config)
+        try:
+            for top_k, mode in itertools.product(args.top_k, args.modes):
+                found = 0
+                expected = 0
+                prompt_tokens = []
+                latencies = []
+                for label in labels:
+                    query = f"{label['clause']}: {notable_clauses[label['clause']]['Description']}"
+                    start = time.perf_counter()
+                    query_vector = embed_query(query, config)
+                    results = retrieve(client, collection_name, payloads, bm25, query, query_vector, top_k, mode,
+                                       label.get("document_types"))
+                    latencies.append(time.perf_counter() - start)
+
+                    found += sum(quote_found(quote, results) for quote in label["quotes"])
+                    expected += len(label["quotes"])
+                    prompt_tokens.append(count_tokens(json.dumps(results, indent=2)))
+
+                rows.append({
+                    "chunk_tokens": chunk_tokens,
+                    "chunk_overlap": chunk_overlap,
+                    "dimensions": dimensions,
+                    "top_k": top_k,
+                    "mode": mode,
+                    "chunks": len(payloads),
+                    "recall_at_k": round(found / expected, 3) if expected else None,
+                    "prompt_tokens_mean": round(float(np.mean(prompt_tokens)), 1) if prompt_tokens else None,
+                    "latency_ms_mean": round(1000 * float(np.mean(latencies)), 2) if latencies else None,
+                    "latency_ms_p95": round(1000 * float(np.percentile(latencies, 95)), 2) if latencies else None,
+                })
+        finally:
+            client.delete_collection(collection_name=collection_name)
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval recall/latency sweep over a labelled corpus")
+    parser.add_argument("--corpus", required=True)
+    parser.add_argument("--chunk-tokens", type=int, nargs="+", default=DEFAULT_CHUNK_TOKENS)
+    parser.add_argument("--chunk-overlap", type=int, nargs="+", default=DEFAULT_CHUNK_OVERLAP)
+    parser.add_argument("--top-k", type=int, nargs="+", default=DEFAULT_TOP_K)
+    parser.add_argument("--dimensions", type=int, nargs="+", default=DEFAULT_DIMENSIONS)
+    parser.add_argument("--modes", nargs="+", default=MODES, choices=MODES)
+    parser.add_argument("--fake", action="store_true", help="Use the local fake embeddings instead of OpenAI")
+    parser.add_argument("--cloud", action="store_true", help="Search the Qdrant cluster instead of an in-memory instance")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "retrieval.json"))
+    args = parser.parse_args()
+
+    if args.fake:
+        # Keep fake vectors out of the real embedding cache
+        os.environ["CONTRACT_REVIEW_CACHE_DIR"] = tempfile.mkdtemp(prefix="contract-review-retrieval-")
+    sys.path.insert(0, os.getcwd())
+
+    from dotenv import load_dotenv
+    from qdrant_client import QdrantClient
+    from src.clients import get_qdrant_client, set_client
+
+    load_dotenv()
+    if args.fake:
+        from benchmarks.fakes import FakeOpenAI
+        set_client("openai", FakeOpenAI())
+    client = get_qdrant_client() if args.cloud else QdrantClient(":memory:")
+
+    rows = run_sweep(client, load_corpus(args.corpus), args)
+    report = {"corpus": args.corpus, "fake_embeddings": args.fake, "cloud": args.cloud, "results": rows}
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'tokens':>6} {'overlap':>7} {'dims':>5} {'k':>3} {'mode':>8} {'recall':>6} {'prompt':>7} {'ms':>7}")
+    for row in rows:
+        print(f"{row['chunk_tokens']:>6} {row['chunk_overlap']:>7} {row['dimensions']:>5} {row['top_k']:>3} {row['mode']:>8} "
+              f"{row['recall_at_k']!s:>6} {row['prompt_tokens_mean']!s:>7} {row['latency_ms_mean']!s:>7}")
+    print(f"Saved results to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,70 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTextEdit, QLineEdit, 
                              QPushButton, QLabel, QFrame, QComboBox, QCompleter)
-from PyQt5.QtCore import Qt, QTimer, QSortFilterProxyModel
-from PyQt5.QtGui import QFont, QPalette, QColor, QStandardItemModel, QStandardItem
-from src.qdrant_operations import initialize_qdrant, query_qdrant_for_clauses, get_ai_response
+from PyQt5.QtCore import Qt, QTimer, QSortFilterProxyModel, QThread, pyqtSignal
+from PyQt5.QtGui import QFont, QPalette, QColor, QStandardItemModel, QStandardItem, QTextCursor, QTextCharFormat
+import logging
+from src.service_client import SERVICE_URL
+
+logger = logging.getLogger(__name__)
 
 # Remove the SearchableComboBox class as it's no longer needed
 
+class ChatWorker(QThread):
+    token = pyqtSignal(str)
+    failed = pyqtSignal(str)
+
+    def __init__(self, qdrant_client, company, message):
+        super().__init__()
+        self.qdrant_client = qdrant_client
+        self.company = company
+        self.message = message
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        if SERVICE_URL:
+            self.run_remote()
+            return
+        from src.qdrant_operations import stream_ai_response
+
+        tokens = stream_ai_response(self.qdrant_client, self.company, self.message)
+        try:
+            for token in tokens:
+                if self.cancelled:
+                    break
+                self.token.emit(token)
+        except Exception as e:
+            logger.exception("Chat response failed")
+            if not self.cancelled:
+                self.failed.emit(str(e))
+        finally:
+            tokens.close()
+
+    def run_remote(self):
+        # The service answers in one piece, there is no stream to cancel
+        from src.service_client import remote_chat
+        try:
+            answer = remote_chat(self.company, self.message)
+        except Exception as e:
+            logger.exception("Chat response failed")
+            if not self.cancelled:
+                self.failed.emit(str(e))
+            return
+        if not self.cancelled:
+            self.token.emit(answer)
+
 class ChatWindow(QWidget):
     def __init__(self):
         super().__init__()
+        self.qdrant_client = None  # Set by TabbedInterface once the background connection is up
+        self.worker = None
+        self.workers = []  # Kept until they finish, a cancelled stream can take a moment to close
         self.init_ui()
-        self.qdrant_client = initialize_qdrant("po_clauses", 1536)  # Uncomment and adjust as needed
+
+    def set_qdrant_client(self, client):
+        self.qdrant_client = client
 
     def init_ui(self):
         self.setStyleSheet("""
@@ -98,16 +152,43 @@ class ChatWindow(QWidget):
         if not company_name:
             self.append_message('System', 'Please enter a company name.', '#FF0000')
             return
+
+        if self.qdrant_client is None and not SERVICE_URL:
+            self.append_message('System', 'Still connecting to the document store, please try again shortly.', '#FF0000')
+            return
         
-        # Use QTimer to add messages asynchronously
-        QTimer.singleShot(0, lambda: self.append_message('You', user_message, '#4CAF50'))
-        
-        # Get AI response
-        QTimer.singleShot(100, lambda: self.get_and_display_response(user_message, company_name))
+        # A new question replaces the answer still being streamed
+        if self.worker is not None and self.worker.isRunning():
+            self.worker.cancel()
+            self.insert_text(' [cancelled]', '#888888')
+
+        self.append_message('You', user_message, '#4CAF50')
+        self.append_message('Assistant', '', '#2196F3')
+
+        worker = ChatWorker(self.qdrant_client, company_name, user_message)
+        worker.token.connect(lambda token, worker=worker: self.on_token(worker, token))
+        worker.failed.connect(lambda error, worker=worker: self.on_failed(worker, error))
+        worker.finished.connect(lambda worker=worker: self.workers.remove(worker))
+        self.worker = worker
+        self.workers.append(worker)
+        worker.start()
 
     def append_message(self, sender, message, color):
         self.chat_history.append(f'<p style="color: {color};"><b>{sender}:</b> {message}</p>')
 
-    def get_and_display_response(self, user_message, company):
-        response = get_ai_response(self.qdrant_client, company, user_message)
-        self.append_message('Assistant', response, '#2196F3')
\ No newline at end of file
+    def insert_text(self, text, color):
+        cursor = self.chat_history.textCursor()
+        cursor.movePosition(QTextCursor.End)
+        text_format = QTextCharFormat()
+        text_format.setForeground(QColor(color))
+        cursor.insertText(text, text_format)
+        self.chat_history.ensureCursorVisible()
+
+    def on_token(self, worker, token):
+        # Tokens queued by a cancelled worker are dropped
+        if worker is self.worker and not worker.cancelled:
+            self.insert_text(token, '#2196F3')
+
+    def on_failed(self, worker, error):
+        if worker is self.worker:
+            self.insert_text(f' [error: {error}]', '#FF0000')
\ No newline at end of file
@@ -0,0 +1,68 @@
+from PyQt5.QtWidgets import QLabel
+from PyQt5.QtCore import QThread, QTimer, pyqtSignal
+import logging
+
+logger = logging.getLogger(__name__)
+
+RETRY_INTERVAL_MS = 30000
+
+class QdrantConnectThread(QThread):
+    connected = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, collection_name):
+        super().__init__()
+        self.collection_name = collection_name
+
+    def run(self):
+        try:
+            from src.qdrant_operations import initialize_qdrant
+            self.connected.emit(initialize_qdrant(self.collection_name))
+        except Exception as e:
+            logger.warning("Could not connect to Qdrant: %s", str(e))
+            self.failed.emit(str(e))
+
+class BackendConnection(QLabel):
+    # Connects to Qdrant off the UI thread, shows the state in the status bar and
+    # retries every RETRY_INTERVAL_MS while the cluster is unreachable
+    connected = pyqtSignal(object)
+
+    STYLES = {
+        "connecting": ("Qdrant: connecting...", "#FFC107"),
+        "connected": ("Qdrant: connected", "#4CAF50"),
+        "failed": ("Qdrant: unavailable, retrying", "#FF5722"),
+    }
+
+    def __init__(self, collection_name, parent=None):
+        super().__init__(parent)
+        self.collection_name = collection_name
+        self.client = None
+        self.thread = None
+        self.retry_timer = QTimer(self)
+        self.retry_timer.setSingleShot(True)
+        self.retry_timer.timeout.connect(self.start)
+        self.set_state("connecting")
+
+    def set_state(self, state, detail=""):
+        text, color = self.STYLES[state]
+        self.setText(text)
+        self.setToolTip(detail)
+        self.setStyleSheet(f"color: {color}; padding: 0 8px;")
+
+    def start(self):
+        if self.thread is not None and self.thread.isRunning():
+            return
+        self.set_state("connecting")
+        self.thread = QdrantConnectThread(self.collection_name)
+        self.thread.connected.connect(self.on_connected)
+        self.thread.failed.connect(self.on_failed)
+        self.thread.start()
+
+    def on_connected(self, client):
+        self.client = client
+        self.set_state("connected")
+        self.connected.emit(client)
+
+    def on_failed(self, error):
+        self.set_state("failed", error)
+        self.retry_timer.start(RETRY_INTERVAL_MS)
@@ -1,11 +1,15 @@
 import os
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QListWidget, QPushButton, QLabel, 
                              QSizePolicy, QFileDialog, QLineEdit, QMessageBox, QComboBox, QTextEdit,
-                             QApplication, QMainWindow, QTreeWidget, QTreeWidgetItem, QMenu)
+                             QApplication, QMainWindow, QMenu, QProgressBar, QListWidgetItem)
 from PyQt5.QtCore import Qt, QMimeData, QTimer, QThread, pyqtSignal
 from PyQt5.QtGui import QDragEnterEvent, QDropEvent, QColor, QFont, QPainter
-from src.review import review_documents
 import json
+import logging
+import time
+from .results_view import ResultsDisplay
+
+logger = logging.getLogger(__name__)
 
 class DropArea(QLabel):
     def __init__(self, parent=None):
@@ -35,7 +39,7 @@ class DropArea(QLabel):
                 if main_window:
                     main_window.add_file(file_path)
                 else:
-                    print("Error: Could not find MainWindow instance")
+                    logger.error("Could not find MainWindow instance")
 
     def findMainWindow(self):
         parent = self.parent()
@@ -91,6 +95,8 @@ class LoadingIndicator(QWidget):
             painter.drawRect(-4, -20, 8, 20)
 
 class ReviewThread(QThread):
+    progress = pyqtSignal(dict)
+    job_finished = pyqtSignal(str, dict)
     finished = pyqtSignal(dict)
 
     def __init__(self, jobs):
@@ -98,390 +104,67 @@ class ReviewThread(QThread):
         self.jobs = jobs
 
     def run(self):
+        # Imported here so the pipeline's dependencies load on the worker thread, not at startup
+        from src.service_client import SERVICE_URL
+        if SERVICE_URL:
+            from src.service_client import remote_review_documents as review_documents
+        else:
+            from src.review import review_documents
+
         results = {}
         for company_name, file_paths in self.jobs.items():
-            results[company_name] = review_documents(file_paths, company_name)
+            try:
+                results[company_name] = review_documents(file_paths, company_name, progress=self.progress.emit)
+            except Exception:
+                logger.exception("Review of %s failed", company_name)
+                continue
+            self.job_finished.emit(company_name, results[company_name])
         self.finished.emit(results)
 
-class MainWindow(QWidget):
-    def __init__(self):
-        super().__init__()
-        self.initUI()
-
-    def initUI(self):
-        self.setStyleSheet("""
-            QWidget {
-                background-color: #1e1e1e;
-                color: #ffffff;
-            }
-            QLabel {
-                font-size: 13px;
-                color: #cccccc;
-            }
-            QListWidget, QTextEdit, QLineEdit, QComboBox {
-                background-color: #2a2a2a;
-                border: 1px solid #444444;
-                border-radius: 4px;
-                padding: 4px;
-                font-size: 13px;
-                color: #ffffff;
-            }
-            QListWidget::item {
-                padding: 4px;
-            }
-            QListWidget::item:selected {
-                background-color: #3a3a3a;
-            }
-            QComboBox::drop-down {
-                border: none;
-            }
-            QComboBox::down-arrow {
-                image: url(down_arrow.png);
-                width: 14px;
-                height: 14px;
-            }
-        """)
-        
-        self.layout = QHBoxLayout(self)
-        
-        # Left side: File drop area and current files
-        left_layout = QVBoxLayout()
-        self.drop_area = DropArea(self)
-        self.drop_area.mousePressEvent = self.open_file_dialog
-        self.drop_area.setMinimumHeight(150)
-        self.drop_area.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-        
-        self.current_files = QListWidget()
-        
-        left_layout.addWidget(self.drop_area)
-        left_layout.addWidget(QLabel("Current Files:"))
-        left_layout.addWidget(self.current_files)
-        
-        # Middle: Job list, company name input, and buttons
-        middle_layout = QVBoxLayout()
-        self.job_list = QListWidget()
-        
-        self.company_name_input = QLineEdit()
-        self.company_name_input.setPlaceholderText("Enter company name")
-        
-        self.add_job_button = ModernButton("Add Job", "#4CAF50")
-        self.add_job_button.clicked.connect(self.add_job)
-        self.review_button = ModernButton("Review All Jobs", "#2196F3")
-        self.review_button.clicked.connect(self.review_all_jobs)
-        
-        self.job_selector = QComboBox()
-        self.job_selector.currentIndexChanged.connect(self.update_results_display)
-        middle_layout.addWidget(QLabel("Select Job:"))
-        middle_layout.addWidget(self.job_selector)
-        
-        middle_layout.addWidget(QLabel("Jobs:"))
-        middle_layout.addWidget(self.job_list)
-        middle_layout.addWidget(QLabel("Company Name:"))
-        middle_layout.addWidget(self.company_name_input)
-        middle_layout.addWidget(self.add_job_button)
-        middle_layout.addWidget(self.review_button)
-        
-        # Right side: Results display
-        right_layout = QVBoxLayout()
-        self.results_display = ResultsDisplay()
-        right_layout.addWidget(QLabel("Review Results:"))
-        right_layout.addWidget(self.results_display)
-        
-        self.layout.addLayout(left_layout, 2)
-        self.layout.addLayout(middle_layout, 1)
-        self.layout.addLayout(right_layout, 3)
-        
-        self.files = []
-        self.jobs = {}
-        self.review_results = {}
-
-        # Add loading indicator
-        self.loading_indicator = LoadingIndicator(self)
-        self.loading_indicator.setGeometry(self.width() // 2 - 50, self.height() // 2 - 50, 100, 100)
-
-        self.clear_button = ModernButton("Clear All", "#FF5722")
-        self.clear_button.clicked.connect(self.clear_all)
-        middle_layout.addWidget(self.clear_button)
-
-        # Enable context menu for job_list and current_files
-        self.job_list.setContextMenuPolicy(Qt.CustomContextMenu)
-        self.job_list.customContextMenuRequested.connect(self.show_job_context_menu)
-        
-        self.current_files.setContextMenuPolicy(Qt.CustomContextMenu)
-        self.current_files.customContextMenuRequested.connect(self.show_file_context_menu)
-    
-    def show_job_context_menu(self, position):
-        menu = QMenu()
-        delete_action = menu.addAction("Delete Job")
-        action = menu.exec_(self.job_list.mapToGlobal(position))
-        if action == delete_action:
-            self.delete_selected_job()
-
-    def show_file_context_menu(self, position):
-        menu = QMenu()
-        delete_action = menu.addAction("Delete File")
-        action = menu.exec_(self.current_files.mapToGlobal(position))
-        if action == delete_action:
-            self.delete_selected_file()
-
-    def delete_selected_job(self):
-        current_item = self.job_list.currentItem()
-        if current_item:
-            company_name = current_item.text().split(" (")[0]
-            del self.jobs[company_name]
-            self.update_job_list()
-            self.job_selector.clear()
-            for company in self.jobs.keys():
-                self.job_selector.addItem(company)
-
-    def delete_selected_file(self):
-        current_item = self.current_files.currentItem()
-        if current_item:
-            file_name = current_item.text()
-            self.files = [f for f in self.files if os.path.basename(f) != file_name]
-            self.current_files.takeItem(self.current_files.row(current_item))
-
-    def clear_all(self):
-        self.files.clear()
-        self.jobs.clear()
-        self.review_results.clear()
-        self.current_files.clear()
-        self.job_list.clear()
-        self.job_selector.clear()
-        self.company_name_input.clear()
-        self.results_display.clear()
-
-    def showEvent(self, event):
-        super().showEvent(event)
-        self.loading_indicator.setGeometry(self.width() // 2 - 50, self.height() // 2 - 50, 100, 100)
-
-    def resizeEvent(self, event):
-        super().resizeEvent(event)
-        self.loading_indicator.setGeometry(self.width() // 2 - 50, self.height() // 2 - 50, 100, 100)
-
-    def open_file_dialog(self, event):
-        file_dialog = QFileDialog()
-        file_paths, _ = file_dialog.getOpenFileNames(self, "Select Files")
-        for file_path in file_paths:
-            if os.path.isfile(file_path):
-                self.add_file(file_path)
-
-    def add_file(self, file_path):
-        self.files.append(file_path)
-        self.current_files.addItem(os.path.basename(file_path))
+class RereviewThread(QThread):
+    progress = pyqtSignal(dict)
+    finished = pyqtSignal(dict)
+    failed = pyqtSignal(str)
 
-    def add_job(self):
-        if self.current_files.count() > 0:
-            company_name = self.company_name_input.text().strip()
-            if not company_name:
-                QMessageBox.warning(self, "Missing Company Name", "Please enter a company name before adding a job.")
-                return
-            
-            self.jobs[company_name] = self.files.copy()
-            
-            self.update_job_list()
+    def __init__(self, run_id):
+        super().__init__()
+        self.run_id = run_id
 
-            self.current_files.clear()
-            self.files.clear()
-            self.company_name_input.clear()
+    def run(self):
+        from src.service_client import SERVICE_URL
+        if SERVICE_URL:
+            from src.service_client import remote_rereview_stored_run as rereview_stored_run
         else:
-            QMessageBox.warning(self, "No Files", "Please add files before creating a job.")
+            from src.review import rereview_stored_run
 
-    def update_job_list(self):
-        self.job_list.clear()
-        for company, files in self.jobs.items():
-            self.job_list.addItem(f"{company} ({len(files)} files)")
-    
-    def review_all_jobs(self):
-        self.loading_indicator.show()
-        self.setEnabled(False)  # Disable the entire window
-        
-        self.results_display.clear()
-        self.review_results.clear()
-        self.job_selector.clear()
-
-        self.review_thread = ReviewThread(self.jobs)
-        self.review_thread.finished.connect(self.on_review_finished)
-        self.review_thread.start()
-
-    def on_review_finished(self, results):
-        self.review_results = results
-        for company_name in results.keys():
-            self.job_selector.addItem(company_name)
-
-        if self.job_selector.count() > 0:
-            self.job_selector.setCurrentIndex(0)
-            self.update_results_display()
-
-        self.loading_indicator.hide()
-        self.setEnabled(True)  # Re-enable the window
-
-    def update_results_display(self):
-        selected_job = self.job_selector.currentText()
-        if selected_job in self.review_results:
-            self.results_display.display_results(self.review_results[selected_job])
+        try:
+            self.finished.emit(rereview_stored_run(self.run_id, progress=self.progress.emit))
+        except Exception as e:
+            logger.exception("Re-review of run %s failed", self.run_id)
+            self.failed.emit(str(e))
 
-import json
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QTreeWidget, QTreeWidgetItem
-from PyQt5.QtGui import QFont, QColor
-from PyQt5.QtCore import Qt
-import textwrap
-
-class ResultsDisplay(QWidget):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.layout = QVBoxLayout(self)
-        self.tree = QTreeWidget()
-        self.tree.setHeaderLabels(["Category / Clause / Quote"])
-        self.tree.setColumnCount(1)
-        self.tree.setWordWrap(True)
-        self.tree.setUniformRowHeights(False)
-        self.layout.addWidget(self.tree)
-        
-        with open('notable_clauses.json', 'r') as f:
-            self.categories = json.load(f)
+class StoredRunsThread(QThread):
+    # Lists the stored runs, or loads one when given its id. In thin-client mode these are
+    # requests to the service, which can take up to its timeout.
+    loaded = pyqtSignal(object)
+    failed = pyqtSignal(str)
 
-        self.setStyleSheet("""
-            QTreeWidget {
-                background-color: #2a2a2a;
-                color: #cccccc;
-                font-size: 13px;
-            }
-            QTreeWidget::item {
-                padding: 4px;
-            }
-            QTreeWidget::item:selected {
-                background-color: #3a3a3a;
-            }
-        """)
-
-    def clear(self):
-        self.tree.clear()
-
-    def wrap_text(self, text, width=80):
-        return '\n'.join(textwrap.wrap(text, width))
-
-    def display_results(self, results):
-        self.clear()
-        po_data = results.get('po_analysis', {})
-        company_name = results.get('company_name', 'Unknown Company')
-        clause_analysis = results.get('clause_analysis', [])
-
-        # Create root item
-        root = QTreeWidgetItem(self.tree)
-        root.setText(0, f"Contract Review Results for {company_name}")
-        root.setFont(0, QFont("Arial", 12, QFont.Bold))
-        root.setForeground(0, QColor("#ffffff"))
-
-        # Add PO Analysis
-        if po_data:
-            po_item = QTreeWidgetItem(root)
-            po_item.setText(0, "Purchase Order Analysis")
-            po_item.setFont(0, QFont("Arial", 11, QFont.Bold))
-import os
-from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QListWidget, QPushButton, QLabel, 
-                             QSizePolicy, QFileDialog, QLineEdit, QMessageBox, QComboBox, QTextEdit,
-                             QApplication, QMainWindow, QTreeWidget, QTreeWidgetItem, QMenu)
-from PyQt5.QtCore import Qt, QMimeData, QTimer, QThread, pyqtSignal
-from PyQt5.QtGui import QDragEnterEvent, QDropEvent, QColor, QFont, QPainter
-from src.review import review_documents
-import json
-
-class DropArea(QLabel):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setAlignment(Qt.AlignCenter)
-        self.setStyleSheet("""
-            QLabel {
-                border: 1px dashed #aaaaaa;
-                border-radius: 5px;
-                background-color: #2a2a2a;
-                color: #cccccc;
-                font-size: 14px;
-            }
-        """)
-        self.setAcceptDrops(True)
-        self.setText("Drop files here or click to upload")
-
-    def dragEnterEvent(self, event: QDragEnterEvent):
-        if event.mimeData().hasUrls():
-            event.acceptProposedAction()
-
-    def dropEvent(self, event: QDropEvent):
-        for url in event.mimeData().urls():
-            file_path = url.toLocalFile()
-            if os.path.isfile(file_path):
-                main_window = self.findMainWindow()
-                if main_window:
-                    main_window.add_file(file_path)
-                else:
-                    print("Error: Could not find MainWindow instance")
-
-    def findMainWindow(self):
-        parent = self.parent()
-        while parent is not None:
-            if isinstance(parent, MainWindow):
-                return parent
-            parent = parent.parent()
-        return None
-
-class ModernButton(QPushButton):
-    def __init__(self, text, color):
-        super().__init__(text)
-        self.setStyleSheet(f"""
-            QPushButton {{
-                background-color: {color};
-                border: none;
-                color: white;
-                padding: 8px 16px;
-                text-align: center;
-                text-decoration: none;
-                font-size: 13px;
-                margin: 4px 2px;
-                border-radius: 4px;
-            }}
-            QPushButton:hover {{
-                background-color: {QColor(color).darker(110).name()};
-            }}
-        """)
-
-class LoadingIndicator(QWidget):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.angle = 0
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.rotate)
-        self.timer.start(50)
-        self.setFixedSize(100, 100)
-        self.hide()
-
-    def rotate(self):
-        self.angle = (self.angle + 10) % 360
-        self.update()
-
-    def paintEvent(self, event):
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
-        painter.translate(50, 50)
-        painter.rotate(self.angle)
-        painter.setPen(Qt.NoPen)
-        for i in range(8):
-            painter.rotate(45)
-            painter.setBrush(QColor(255, 255, 255, 25 * (i + 1)))
-            painter.drawRect(-4, -20, 8, 20)
-
-class ReviewThread(QThread):
-    finished = pyqtSignal(dict)
-
-    def __init__(self, jobs):
+    def __init__(self, run_id=None):
         super().__init__()
-        self.jobs = jobs
+        self.run_id = run_id
 
     def run(self):
-        results = {}
-        for company_name, file_paths in self.jobs.items():
-            results[company_name] = review_documents(file_paths, company_name)
-        self.finished.emit(results)
+        from src.service_client import SERVICE_URL
+
+        try:
+            if SERVICE_URL:
+                from src.service_client import remote_load_run, remote_runs
+                self.loaded.emit(remote_runs() if self.run_id is None else remote_load_run(self.run_id))
+            else:
+                from src.result_store import result_store
+                self.loaded.emit(result_store.runs() if self.run_id is None else result_store.load(self.run_id))
+        except Exception as e:
+            self.failed.emit(str(e))
 
 class MainWindow(QWidget):
     def __init__(self):
@@ -522,7 +205,7 @@ class MainWindow(QWidget):
             }
         """)
         
-        self.layout = QHBoxLayout(self)
+        self._layout = QHBoxLayout(self)
         
         # Left side: File drop area and current files
         left_layout = QVBoxLayout()
@@ -566,10 +249,27 @@ class MainWindow(QWidget):
         self.results_display = ResultsDisplay()
         right_layout.addWidget(QLabel("Review Results:"))
         right_layout.addWidget(self.results_display)
+
+        self.progress_label = QLabel()
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setStyleSheet("""
+            QProgressBar {
+                border: 1px solid #444444;
+                border-radius: 4px;
+                text-align: center;
+            }
+            QProgressBar::chunk {
+                background-color: #2196F3;
+            }
+        """)
+        self.progress_label.hide()
+        self.progress_bar.hide()
+        right_layout.addWidget(self.progress_label)
+        right_layout.addWidget(self.progress_bar)
         
-        self.layout.addLayout(left_layout, 2)
-        self.layout.addLayout(middle_layout, 1)
-        self.layout.addLayout(right_layout, 3)
+        self._layout.addLayout(left_layout, 2)
+        self._layout.addLayout(middle_layout, 1)
+        self._layout.addLayout(right_layout, 3)
         
         self.files = []
         self.jobs = {}
@@ -583,6 +283,18 @@ class MainWindow(QWidget):
         self.clear_button.clicked.connect(self.clear_all)
         middle_layout.addWidget(self.clear_button)
 
+        # Runs kept in the result store, double click to open one without reviewing again
+        self.history_list = QListWidget()
+        self.history_list.itemDoubleClicked.connect(self.open_stored_run)
+        self.history_list.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.history_list.customContextMenuRequested.connect(self.show_history_context_menu)
+        middle_layout.addWidget(QLabel("Past Runs:"))
+        middle_layout.addWidget(self.history_list)
+        self.history_thread = None
+        self.history_stale = False
+        self.open_run_threads = []
+        QTimer.singleShot(0, self.load_history)
+
         # Enable context menu for job_list and current_files
         self.job_list.setContextMenuPolicy(Qt.CustomContextMenu)
         self.job_list.customContextMenuRequested.connect(self.show_job_context_menu)
@@ -597,6 +309,20 @@ class MainWindow(QWidget):
         if action == delete_action:
             self.delete_selected_job()
 
+    def show_history_context_menu(self, position):
+        item = self.history_list.itemAt(position)
+        if item is None:
+            return
+        menu = QMenu()
+        open_action = menu.addAction("Open")
+        rereview_action = menu.addAction("Re-review Changed Clauses")
+        rereview_action.setEnabled(self.review_button.isEnabled())
+        action = menu.exec_(self.history_list.mapToGlobal(position))
+        if action == open_action:
+            self.open_stored_run(item)
+        elif action == rereview_action:
+            self.rereview_stored_run(item)
+
     def show_file_context_menu(self, position):
         menu = QMenu()
         delete_action = menu.addAction("Delete File")
@@ -672,145 +398,190 @@ class MainWindow(QWidget):
         for company, files in self.jobs.items():
             self.job_list.addItem(f"{company} ({len(files)} files)")
     
+    def set_editing_enabled(self, enabled):
+        # The job selector stays usable so partial results can be browsed during a review
+        for widget in (self.drop_area, self.current_files, self.job_list, self.company_name_input,
+                       self.add_job_button, self.review_button, self.clear_button):
+            widget.setEnabled(enabled)
+
     def review_all_jobs(self):
         self.loading_indicator.show()
-        self.setEnabled(False)  # Disable the entire window
+        self.set_editing_enabled(False)
         
         self.results_display.clear()
         self.review_results.clear()
         self.job_selector.clear()
+        self.progress_label.show()
+        self.progress_bar.show()
 
         self.review_thread = ReviewThread(self.jobs)
+        self.review_thread.progress.connect(self.on_review_progress)
+        self.review_thread.job_finished.connect(self.on_job_finished)
         self.review_thread.finished.connect(self.on_review_finished)
         self.review_thread.start()
 
+    def partial_results(self, company_name):
+        if company_name not in self.review_results:
+            self.review_results[company_name] = {"company_name": company_name, "po_analysis": None, "clause_analysis": []}
+            self.job_selector.addItem(company_name)
+        return self.review_results[company_name]
+
+    def on_review_progress(self, event):
+        job, stage = event["job"], event["stage"]
+        if stage == "started":
+            self.partial_results(job)
+            self.progress_bar.setRange(0, event["total"] or 1)
+            self.progress_bar.setValue(0)
+            self.progress_bar.setFormat("Documents %v/%m")
+        elif stage == "document_done":
+            self.progress_bar.setValue(event["current"])
+        elif stage == "stored":
+            self.progress_bar.setRange(0, 1)
+            self.progress_bar.setValue(0)
+            self.progress_bar.setFormat("Retrieving clauses")
+        elif stage == "clause_analysed":
+            self.progress_bar.setRange(0, event["total"])
+            self.progress_bar.setValue(event["current"])
+            self.progress_bar.setFormat("Clauses %v/%m")
+            if event["result"] and event["result"]["invoked"] == "Yes":
+                self.partial_results(job)["clause_analysis"].append(event["result"])
+                if self.job_selector.currentText() == job:
+                    self.results_display.add_clause(event["result"])
+        elif stage == "po_analysed" and event["po_analysis"]:
+            self.partial_results(job)["po_analysis"] = event["po_analysis"]
+            self.refresh_if_selected(job)
+
+        self.show_progress_text(event)
+
+    def show_progress_text(self, event):
+        job, document, stage = event["job"], event["document"], event["stage"]
+        labels = {
+            "started": "starting",
+            "parsed": "parsed",
+            "classified": f"classified as {event.get('doc_type')}",
+            "embedding": f"{event.get('chunks')} chunks embedded",
+            "embedded": "embedded",
+            "po_analysed": "purchase order analysed",
+            "document_done": "attached from corpus" if event.get("attached") else "processed",
+            "document_failed": f"failed: {event.get('error')}",
+            "stored": f"stored {event.get('points')} chunks",
+            "clause_analysed": f"analysed {event.get('clause')}",
+            "completed": "done",
+            "failed": f"failed: {event.get('error')}",
+        }
+        subject = f"{job} / {document}" if document else job
+        self.progress_label.setText(f"{subject}: {labels.get(stage, stage)}")
+
+    def on_job_finished(self, company_name, result):
+        self.partial_results(company_name)
+        self.review_results[company_name] = result
+        self.refresh_if_selected(company_name)
+
+    def refresh_if_selected(self, company_name):
+        if self.job_selector.currentText() == company_name:
+            self.update_results_display()
+
     def on_review_finished(self, results):
-        self.review_results = results
+        self.review_results.update(results)
         for company_name in results.keys():
-            self.job_selector.addItem(company_name)
+            self.partial_results(company_name)
 
         if self.job_selector.count() > 0:
-            self.job_selector.setCurrentIndex(0)
             self.update_results_display()
 
+        self.progress_label.hide()
+        self.progress_bar.hide()
         self.loading_indicator.hide()
-        self.setEnabled(True)  # Re-enable the window
+        self.set_editing_enabled(True)
+        self.load_history()
+
+    def load_history(self):
+        # A reload asked for while one is running starts when it's done, so it sees the latest runs
+        if self.history_thread is not None and self.history_thread.isRunning():
+            self.history_stale = True
+            return
+        self.history_thread = StoredRunsThread()
+        self.history_thread.loaded.connect(self.show_history)
+        self.history_thread.failed.connect(lambda error: logger.warning("Could not load past runs: %s", error))
+        self.history_thread.finished.connect(self.on_history_thread_finished)
+        self.history_thread.start()
+
+    def on_history_thread_finished(self):
+        if self.history_stale:
+            self.history_stale = False
+            self.load_history()
+
+    def show_history(self, runs):
+        self.history_list.clear()
+        for run in runs:
+            created = time.strftime("%Y-%m-%d %H:%M", time.localtime(run.created))
+            item = QListWidgetItem(f"{run.company_name} - {created} ({len(run.file_names)} files, {run.invoked} clauses)")
+            item.setToolTip("\n".join(run.file_names))
+            item.setData(Qt.UserRole, run.id)
+            self.history_list.addItem(item)
+
+    def rereview_stored_run(self, item):
+        self.loading_indicator.show()
+        self.set_editing_enabled(False)
+        self.progress_label.show()
+        self.progress_bar.show()
+        self.progress_bar.setRange(0, 0)
+
+        self.rereview_thread = RereviewThread(item.data(Qt.UserRole))
+        self.rereview_thread.progress.connect(self.on_rereview_progress)
+        self.rereview_thread.finished.connect(self.on_rereview_finished)
+        self.rereview_thread.failed.connect(self.on_rereview_failed)
+        self.rereview_thread.start()
+
+    def on_rereview_progress(self, event):
+        # Merged into the stored report at the end, so only progress is shown here
+        if event["stage"] == "clause_analysed":
+            self.progress_bar.setRange(0, event["total"])
+            self.progress_bar.setValue(event["current"])
+            self.progress_bar.setFormat("Clauses %v/%m")
+        self.show_progress_text(event)
+
+    def on_rereview_finished(self, result):
+        self.on_review_finished({})
+        self.show_stored_run(result)
+
+    def on_rereview_failed(self, error):
+        self.on_review_finished({})
+        QMessageBox.warning(self, "Re-review Failed", error)
+
+    def open_stored_run(self, item):
+        thread = StoredRunsThread(item.data(Qt.UserRole))
+        thread.loaded.connect(self.on_stored_run_loaded)
+        thread.failed.connect(self.on_stored_run_failed)
+        thread.finished.connect(self.on_open_run_thread_finished)
+        self.open_run_threads.append(thread)
+        thread.start()
+
+    def on_stored_run_loaded(self, result):
+        if result is not None:
+            self.show_stored_run(result)
+
+    def on_stored_run_failed(self, error):
+        QMessageBox.warning(self, "Open Failed", error)
+
+    def on_open_run_thread_finished(self):
+        self.open_run_threads.remove(self.sender())
+
+    def show_stored_run(self, result):
+        # A re-review with failed clauses isn't stored and has no run id
+        run = f"run {result['run']['id']}" if "run" in result else "unsaved re-review"
+        label = f"{result['company_name']} ({run})"
+        self.review_results[label] = result
+        if self.job_selector.findText(label) < 0:
+            self.job_selector.addItem(label)
+        self.job_selector.setCurrentText(label)
+        self.update_results_display()
 
     def update_results_display(self):
         selected_job = self.job_selector.currentText()
         if selected_job in self.review_results:
             self.results_display.display_results(self.review_results[selected_job])
 
-import json
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QTreeWidget, QTreeWidgetItem
-from PyQt5.QtGui import QFont, QColor
-from PyQt5.QtCore import Qt
-import textwrap
-
-class ResultsDisplay(QWidget):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.layout = QVBoxLayout(self)
-        self.tree = QTreeWidget()
-        self.tree.setHeaderLabels(["Category / Clause / Quote"])
-        self.tree.setColumnCount(1)
-        self.tree.setWordWrap(True)
-        self.tree.setUniformRowHeights(False)
-        self.layout.addWidget(self.tree)
-        
-        with open('notable_clauses.json', 'r') as f:
-            self.categories = json.load(f)
-
-        self.setStyleSheet("""
-            QTreeWidget {
-                background-color: #2a2a2a;
-                color: #cccccc;
-                font-size: 13px;
-            }
-            QTreeWidget::item {
-                padding: 4px;
-            }
-            QTreeWidget::item:selected {
-                background-color: #3a3a3a;
-            }
-        """)
-
-    def clear(self):
-        self.tree.clear()
-
-    def wrap_text(self, text, width=80):
-        return '\n'.join(textwrap.wrap(text, width))
-
-    def display_results(self, results):
-        self.clear()
-        po_data = results.get('po_analysis', {})
-        company_name = results.get('company_name', 'Unknown Company')
-        clause_analysis = results.get('clause_analysis', [])
-
-        # Create root item
-        root = QTreeWidgetItem(self.tree)
-        root.setText(0, f"Contract Review Results for {company_name}")
-        root.setFont(0, QFont("Arial", 12, QFont.Bold))
-        root.setForeground(0, QColor("#ffffff"))
-
-        # Add PO Analysis
-        if po_data:
-            po_item = QTreeWidgetItem(root)
-            po_item.setText(0, "Purchase Order Analysis")
-            po_item.setFont(0, QFont("Arial", 11, QFont.Bold))
-            po_item.setForeground(0, QColor("#4CAF50"))
-
-            clause_identifiers = QTreeWidgetItem(po_item)
-            clause_identifiers.setText(0, self.wrap_text(f"Clause Identifiers: {', '.join(po_data.get('clause_identifiers', []))}"))
-
-            requirements_item = QTreeWidgetItem(po_item)
-            requirements_item.setText(0, "Requirements")
-            for req in po_data.get('requirements', []):
-                req_item = QTreeWidgetItem(requirements_item)
-                req_item.setText(0, self.wrap_text(req))
-
-        # Process clause analysis
-        for clause_id, _ in self.categories.items():
-            matching_clause = next((clause for clause in clause_analysis if clause['clause'] == clause_id and clause['invoked'] == 'Yes'), None)
-            
-            if matching_clause:
-                clause_item = QTreeWidgetItem(root)
-                clause_item.setText(0, clause_id)
-                clause_item.setFont(0, QFont("Arial", 10, QFont.Bold))
-                clause_item.setForeground(0, QColor("#4CAF50"))
-                
-                for quote in matching_clause['quotes']:
-                    quote_item = QTreeWidgetItem(clause_item)
-                    
-                    # Debugging: Print the entire quote dictionary
-                    print(f"DEBUG: Quote object: {json.dumps(quote, indent=2)}")
-                    
-                    # Access the header directly from the quote
-                    source = quote.get('header', 'Unknown Source')
-                    doc_type = quote.get('document_type', 'Unknown Type')
-                    
-                    print(f"DEBUG: Extracted source: {source}, doc_type: {doc_type}")
-                    
-                    requires_review = quote.get('requires_human_review', 'Yes')
-                    quote_text = f"[{source}] ({doc_type}) [Requires Review: {requires_review}]\n  {quote['quote']}"
-                    full_text = self.wrap_text(quote_text)
-                    
-                    quote_item.setText(0, full_text)
-                    
-                    # Set the quote and document type to normal weight and light gray
-                    quote_item.setData(0, Qt.UserRole, 0)
-                    quote_item.setData(0, Qt.UserRole + 1, full_text)
-
-        self.tree.expandToDepth(1)  # Expand to show categories and clauses, but not quotes
-
-    def showEvent(self, event):
-        super().showEvent(event)
-        self.tree.itemExpanded.connect(self.adjust_column_width)
-        self.tree.itemCollapsed.connect(self.adjust_column_width)
-
-    def adjust_column_width(self, item):
-        self.tree.resizeColumnToContents(0)
-
 if __name__ == "__main__":
     app = QApplication([])
     window = QMainWindow()
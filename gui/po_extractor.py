@@ -1,11 +1,16 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QPushButton, QTextEdit, QFileDialog, QProgressBar,
                              QLabel)
 from PyQt5.QtCore import QThread, pyqtSignal, Qt
-from src.po_extract import process_multiple_purchase_orders
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 class POProcessingThread(QThread):
     update_progress = pyqtSignal(int)
+    status = pyqtSignal(str)
+    result_ready = pyqtSignal(dict)
+    file_failed = pyqtSignal(str, str)
     finished = pyqtSignal(list)
 
     def __init__(self, file_paths):
@@ -13,12 +18,32 @@ class POProcessingThread(QThread):
         self.file_paths = file_paths
 
     def run(self):
-        results = process_multiple_purchase_orders(self.file_paths)
-        total_files = len(self.file_paths)
-        for i, result in enumerate(results, 1):
-            self.update_progress.emit(int((i / total_files) * 100))
+        from src.service_client import SERVICE_URL
+        if SERVICE_URL:
+            from src.service_client import remote_process_multiple_purchase_orders as process_multiple_purchase_orders
+        else:
+            from src.po_extract import process_multiple_purchase_orders
+
+        try:
+            results = process_multiple_purchase_orders(self.file_paths, progress=self.on_progress)
+        except Exception as e:
+            logger.exception("PO extraction failed")
+            self.status.emit(f"PO extraction failed: {e}")
+            results = []
         self.finished.emit(results)
 
+    def on_progress(self, event):
+        stage, document = event["stage"], event["document"]
+        if stage == "parsed":
+            self.status.emit(f"Extracting references from {document}...")
+        elif stage in ("document_done", "document_failed"):
+            self.update_progress.emit(int((event["current"] / event["total"]) * 100))
+            self.status.emit(f"Processed {event['current']} of {event['total']} file(s)")
+            if stage == "document_done":
+                self.result_ready.emit(event["result"])
+            else:
+                self.file_failed.emit(document, event["error"])
+
 class POExtractorTab(QWidget):
     def __init__(self):
         super().__init__()
@@ -92,6 +117,10 @@ class POExtractorTab(QWidget):
         """)
         button_layout.addWidget(self.progress_bar)
 
+        self.status_label = QLabel()
+        self.status_label.setStyleSheet("font-size: 13px; color: #cccccc;")
+        button_layout.addWidget(self.status_label)
+
         layout.addLayout(button_layout)
 
         # Results area
@@ -142,21 +171,26 @@ class POExtractorTab(QWidget):
 
         self.thread = POProcessingThread(self.file_paths)
         self.thread.update_progress.connect(self.update_progress)
+        self.thread.status.connect(self.status_label.setText)
+        self.thread.result_ready.connect(self.append_result)
+        self.thread.file_failed.connect(self.append_failure)
         self.thread.finished.connect(self.on_processing_finished)
         self.thread.start()
 
     def update_progress(self, value):
         self.progress_bar.setValue(value)
 
+    def append_result(self, result):
+        output = f"File: {result['file_path']}\n"
+        output += "Referenced Documents:\n"
+        output += json.dumps(result['referenced_documents'], indent=2)
+        output += "\n"
+        self.result_text.append(output)
+
+    def append_failure(self, document, error):
+        self.result_text.append(f"File: {document}\nError: {error}\n")
+
     def on_processing_finished(self, results):
         self.process_button.setEnabled(True)
         self.progress_bar.setValue(100)
-
-        output = ""
-        for result in results:
-            output += f"File: {result['file_path']}\n"
-            output += "Referenced Documents:\n"
-            output += json.dumps(result['referenced_documents'], indent=2)
-            output += "\n\n"
-
-        self.result_text.setText(output)
\ No newline at end of file
+        self.status_label.setText(f"Extracted references from {len(results)} of {len(self.file_paths)} file(s)")
\ No newline at end of file
@@ -0,0 +1,237 @@
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QTreeView, QStyledItemDelegate, QStyleOptionViewItem
+from PyQt5.QtGui import QFont, QColor
+from PyQt5.QtCore import Qt, QAbstractItemModel, QModelIndex, QRect, QSize
+
+class ResultNode:
+    __slots__ = ("text", "parent", "children", "row", "style", "clause", "quotes")
+
+    def __init__(self, text, parent=None, style=None, clause=None, quotes=None):
+        self.text = text
+        self.parent = parent
+        self.children = []
+        self.row = 0
+        self.style = style
+        self.clause = clause
+        # Quote rows of a clause are only created once it is expanded, None after that
+        self.quotes = quotes or None
+        if parent is not None:
+            self.row = len(parent.children)
+            parent.children.append(self)
+
+def quote_text(quote):
+    source = quote.get('header', 'Unknown Source')
+    doc_type = quote.get('document_type', 'Unknown Type')
+    requires_review = quote.get('requires_human_review', 'Yes')
+    return f"[{source}] ({doc_type}) [Requires Review: {requires_review}]\n  {quote['quote']}"
+
+class ResultsModel(QAbstractItemModel):
+    # One review as a tree: title > PO analysis, invoked clauses in notable_clauses.json
+    # order, timings. Clauses are indexed by id so results streamed in during a review
+    # are inserted in place instead of rebuilding the tree.
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.order = {}
+        self.root = ResultNode("")
+        self.title = None
+        self.clause_nodes = {}
+        self.styles = {
+            "title": (QFont("Arial", 12, QFont.Bold), QColor("#ffffff")),
+            "section": (QFont("Arial", 11, QFont.Bold), QColor("#4CAF50")),
+            "clause": (QFont("Arial", 10, QFont.Bold), QColor("#4CAF50")),
+            "timings": (QFont("Arial", 10, QFont.Bold), QColor("#888888")),
+        }
+
+    def load_order(self):
+        # Read again for every review or stored run, so clauses added to the file since startup show up
+        from src.utils import load_notable_clauses
+        self.order = {clause_id: i for i, clause_id in enumerate(load_notable_clauses())}
+
+    def clear(self):
+        self.beginResetModel()
+        self.load_order()
+        self.root = ResultNode("")
+        self.title = None
+        self.clause_nodes = {}
+        self.endResetModel()
+
+    def set_results(self, results):
+        self.beginResetModel()
+        self.load_order()
+        self.root = ResultNode("")
+        self.clause_nodes = {}
+        company_name = results.get('company_name', 'Unknown Company')
+        self.title = ResultNode(f"Contract Review Results for {company_name}", self.root, "title")
+
+        po_data = results.get('po_analysis')
+        if po_data:
+            po_node = ResultNode("Purchase Order Analysis", self.title, "section")
+            ResultNode(f"Clause Identifiers: {', '.join(po_data.get('clause_identifiers', []))}", po_node)
+            requirements = ResultNode("Requirements", po_node)
+            for requirement in po_data.get('requirements', []):
+                ResultNode(requirement, requirements)
+
+        clauses = {}
+        for clause in results.get('clause_analysis', []):
+            if clause['invoked'] == 'Yes' and clause['clause'] in self.order:
+                clauses.setdefault(clause['clause'], clause)
+        for clause_id in sorted(clauses, key=self.order.get):
+            self.clause_nodes[clause_id] = ResultNode(clause_id, self.title, "clause", clause_id, clauses[clause_id]['quotes'])
+
+        # Per-stage time for the job, stages overlap since documents and clauses run in parallel
+        timings = results.get('timings')
+        if timings:
+            timings_node = ResultNode(f"Timings ({timings['total_seconds']:.1f}s total)", self.title, "timings")
+            for stage, timing in timings['stages'].items():
+                ResultNode(f"{stage}: {timing['seconds']:.2f}s ({timing['calls']} calls)", timings_node)
+        self.endResetModel()
+
+    def add_clause(self, clause):
+        clause_id = clause['clause']
+        if self.title is None or clause['invoked'] != 'Yes' or clause_id not in self.order or clause_id in self.clause_nodes:
+            return
+        siblings = self.title.children
+        position = next((node.row for node in siblings
+                         if node.style == "timings" or (node.clause and self.order[node.clause] > self.order[clause_id])),
+                        len(siblings))
+        self.beginInsertRows(self.createIndex(self.title.row, 0, self.title), position, position)
+        node = ResultNode(clause_id, None, "clause", clause_id, clause['quotes'])
+        node.parent = self.title
+        siblings.insert(position, node)
+        for row in range(position, len(siblings)):
+            siblings[row].row = row
+        self.clause_nodes[clause_id] = node
+        self.endInsertRows()
+
+    def clause_index(self, clause_id):
+        node = self.clause_nodes.get(clause_id)
+        return self.createIndex(node.row, 0, node) if node else QModelIndex()
+
+    def node(self, index):
+        return index.internalPointer() if index.isValid() else self.root
+
+    def index(self, row, column, parent=QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        return self.createIndex(row, column, self.node(parent).children[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        parent = index.internalPointer().parent
+        if parent is None or parent is self.root:
+            return QModelIndex()
+        return self.createIndex(parent.row, 0, parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        return len(self.node(parent).children)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QModelIndex()):
+        node = self.node(parent)
+        return bool(node.children or node.quotes)
+
+    def canFetchMore(self, parent):
+        return parent.isValid() and self.node(parent).quotes is not None
+
+    def fetchMore(self, parent):
+        node = self.node(parent)
+        quotes, node.quotes = node.quotes, None
+        self.beginInsertRows(parent, 0, len(quotes) - 1)
+        for quote in quotes:
+            ResultNode(quote_text(quote), node)
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role == Qt.DisplayRole:
+            return node.text
+        if node.style and role == Qt.FontRole:
+            return self.styles[node.style][0]
+        if node.style and role == Qt.ForegroundRole:
+            return self.styles[node.style][1]
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return "Category / Clause / Quote"
+        return None
+
+class WrapDelegate(QStyledItemDelegate):
+    # Rows are as tall as their text wrapped to the width of the view
+    PADDING = 8
+
+    def __init__(self, view):
+        super().__init__(view)
+        self.view = view
+
+    def initStyleOption(self, option, index):
+        super().initStyleOption(option, index)
+        option.features |= QStyleOptionViewItem.WrapText
+
+    def sizeHint(self, option, index):
+        options = QStyleOptionViewItem(option)
+        self.initStyleOption(options, index)
+        depth = 1
+        parent = index.parent()
+        while parent.isValid():
+            depth += 1
+            parent = parent.parent()
+        width = max(self.view.viewport().width() - self.view.indentation() * depth - self.PADDING, 50)
+        text = options.fontMetrics.boundingRect(QRect(0, 0, width, 0), Qt.TextWordWrap, options.text)
+        return QSize(width, text.height() + self.PADDING)
+
+class ResultsTree(QTreeView):
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        # Wrapped rows change height with the width
+        self.scheduleDelayedItemsLayout()
+
+class ResultsDisplay(QWidget):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._layout = QVBoxLayout(self)
+
+        self.model = ResultsModel(self)
+        self.tree = ResultsTree()
+        self.tree.setModel(self.model)
+        self.tree.setItemDelegate(WrapDelegate(self.tree))
+        self.tree.setWordWrap(True)
+        self.tree.setUniformRowHeights(False)
+        self.tree.setTextElideMode(Qt.ElideNone)
+        self._layout.addWidget(self.tree)
+
+        self.setStyleSheet("""
+            QTreeView {
+                background-color: #2a2a2a;
+                color: #cccccc;
+                font-size: 13px;
+            }
+            QTreeView::item {
+                padding: 4px;
+            }
+            QTreeView::item:selected {
+                background-color: #3a3a3a;
+            }
+        """)
+
+    def clear(self):
+        self.model.clear()
+
+    def display_results(self, results):
+        self.model.set_results(results)
+        # Title and PO analysis open, clauses collapsed so their quotes aren't built until asked for
+        title = self.model.index(0, 0)
+        self.tree.expand(title)
+        for row in range(self.model.rowCount(title)):
+            child = self.model.index(row, 0, title)
+            if self.model.node(child).style == "section":
+                self.tree.expand(child)
+
+    def add_clause(self, clause):
+        self.model.add_clause(clause)
@@ -1,9 +1,8 @@
 from PyQt5.QtWidgets import QTabWidget, QMainWindow, QApplication, QWidget, QVBoxLayout
-from PyQt5.QtCore import QSize, Qt
+from PyQt5.QtCore import QSize, Qt, QTimer
 from PyQt5.QtGui import QPalette, QColor
-from .main_window import MainWindow
-from .po_extractor import POExtractorTab
-from .chat_window import ChatWindow
+from .connection import BackendConnection
+from src.service_client import SERVICE_URL
 
 class StylishTabWidget(QTabWidget):
     def __init__(self, parent=None):
@@ -13,6 +12,29 @@ class StylishTabWidget(QTabWidget):
         self.setMovable(True)
         self.setTabBarAutoHide(False)
 
+class LazyTab(QWidget):
+    # Placeholder that builds the real tab the first time it is opened
+    def __init__(self, factory, parent=None):
+        super().__init__(parent)
+        self.factory = factory
+        self.content = None
+        self._layout = QVBoxLayout(self)
+        self._layout.setContentsMargins(0, 0, 0, 0)
+
+    def ensure_built(self):
+        if self.content is None:
+            self.content = self.factory()
+            self._layout.addWidget(self.content)
+        return self.content
+
+def create_main_tab():
+    from .main_window import MainWindow
+    return MainWindow()
+
+def create_po_extractor_tab():
+    from .po_extractor import POExtractorTab
+    return POExtractorTab()
+
 class TabbedInterface(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -60,11 +82,37 @@ class TabbedInterface(QMainWindow):
 
         layout.addWidget(self.tab_widget)
         
-        # Add tabs
-        self.tab_widget.addTab(MainWindow(), "Main")
-        self.tab_widget.addTab(ChatWindow(), "Chat")
-        self.tab_widget.addTab(POExtractorTab(), "PO Extractor")
-        
+        # Tabs are built on first open, the connection to Qdrant is made in the background
+        self.backend = BackendConnection("po_clauses")
+        self.statusBar().addPermanentWidget(self.backend)
+        self.statusBar().setStyleSheet("color: #b0b0b0;")
+
+        self.tab_widget.addTab(LazyTab(create_main_tab), "Main")
+        self.tab_widget.addTab(LazyTab(self.create_chat_tab), "Chat")
+        self.tab_widget.addTab(LazyTab(create_po_extractor_tab), "PO Extractor")
+        self.tab_widget.currentChanged.connect(self.build_tab)
+
+        # After the window has been shown
+        QTimer.singleShot(0, lambda: self.build_tab(self.tab_widget.currentIndex()))
+        if SERVICE_URL:
+            # Thin client, the service talks to Qdrant
+            self.backend.setText(f"Service: {SERVICE_URL}")
+            self.backend.setStyleSheet("color: #4CAF50; padding: 0 8px;")
+        else:
+            QTimer.singleShot(0, self.backend.start)
+
+    def build_tab(self, index):
+        tab = self.tab_widget.widget(index)
+        if isinstance(tab, LazyTab):
+            tab.ensure_built()
+
+    def create_chat_tab(self):
+        from .chat_window import ChatWindow
+        chat_window = ChatWindow()
+        if self.backend.client is not None:
+            chat_window.set_qdrant_client(self.backend.client)
+        self.backend.connected.connect(chat_window.set_qdrant_client)
+        return chat_window
 
     def sizeHint(self):
         return QSize(1600, 900)
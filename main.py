@@ -1,8 +1,10 @@
 import sys
 from PyQt5.QtWidgets import QApplication
+from src.logs import configure_logging
 from gui.tabbed_interface import TabbedInterface
 
 if __name__ == "__main__":
+    configure_logging()
     app = QApplication(sys.argv)
     window = TabbedInterface()
     window.show()
@@ -0,0 +1,104 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import NamedTuple, Optional
+import numpy as np
+from src.cache import CACHE_DIR
+from src.config import embedding_config
+
+# Cosine similarity of two questions' embeddings above which the earlier answer is returned
+# as is, and above which it is passed to the model alongside the new search results
+ANSWER_REUSE_THRESHOLD = float(os.getenv("CONTRACT_REVIEW_ANSWER_REUSE_THRESHOLD", "0.95"))
+ANSWER_AUGMENT_THRESHOLD = float(os.getenv("CONTRACT_REVIEW_ANSWER_AUGMENT_THRESHOLD", "0.85"))
+
+class CachedAnswer(NamedTuple):
+    query: str
+    answer: str
+    similarity: float
+
+class SemanticAnswerCache:
+    # Chat answers per collection, looked up by the similarity of the question's embedding.
+    # Entries are tied to a fingerprint of the collection's contents and are dropped as soon
+    # as the collection changes.
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS answers (
+                    collection TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    answer TEXT NOT NULL,
+                    created REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS answers_lookup ON answers (collection, fingerprint, model);
+                CREATE TABLE IF NOT EXISTS generations (
+                    collection TEXT PRIMARY KEY,
+                    generation INTEGER NOT NULL
+                );
+            """)
+        return self._connection
+
+    def generation(self, collection: str) -> int:
+        with self._lock:
+            row = self._connect().execute("SELECT generation FROM generations WHERE collection = ?", (collection,)).fetchone()
+            return row[0] if row else 0
+
+    def bump_generation(self, collection: str):
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute(
+                    "INSERT INTO generations (collection, generation) VALUES (?, 1) "
+                    "ON CONFLICT(collection) DO UPDATE SET generation = generation + 1",
+                    (collection,)
+                )
+                connection.execute("DELETE FROM answers WHERE collection = ?", (collection,))
+
+    def find(self, collection: str, fingerprint: str, query_vector) -> Optional[CachedAnswer]:
+        vector = np.asarray(query_vector, dtype=np.float32)
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                # Answers given against an earlier version of the collection can't be trusted
+                connection.execute("DELETE FROM answers WHERE collection = ? AND fingerprint != ?", (collection, fingerprint))
+            rows = connection.execute(
+                "SELECT query, vector, answer FROM answers WHERE collection = ? AND fingerprint = ? AND model = ?",
+                (collection, fingerprint, embedding_config.tag)
+            ).fetchall()
+        if not rows:
+            return None
+
+        vectors = np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+        similarities = vectors @ vector / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(vector) or 1.0)
+        best = int(np.argmax(similarities))
+        if similarities[best] < ANSWER_AUGMENT_THRESHOLD:
+            return None
+        return CachedAnswer(rows[best][0], rows[best][2], float(similarities[best]))
+
+    def add(self, collection: str, fingerprint: str, query: str, query_vector, answer: str):
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute(
+                    "INSERT INTO answers (collection, fingerprint, model, query, vector, answer, created) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (collection, fingerprint, embedding_config.tag, query,
+                     np.asarray(query_vector, dtype=np.float32).tobytes(), answer, time.time())
+                )
+
+answer_cache = SemanticAnswerCache(os.path.join(CACHE_DIR, "answers.sqlite3"))
+
+def collection_fingerprint(client, collection_name: str) -> str:
+    # Points written by this app bump the generation, the point count also catches
+    # deletions and writes made from elsewhere
+    points = client.get_collection(collection_name).points_count
+    return f"{points}:{answer_cache.generation(collection_name)}"
@@ -0,0 +1,219 @@
+# Headless batch review, one job per company:
+#   python batch.py jobs.json --output batch_results --workers 4
+#   python batch.py contracts/ --requests-per-minute 300
+# A manifest maps company names to file paths (relative to the manifest), a directory
+# has one sub-directory of files per company. Each finished job is written to
+# <output>/<company>.json as soon as it is done, a rerun skips jobs whose files haven't changed.
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import re
+import signal
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from src.logs import configure_logging
+from src.rate_limit import DEFAULT_REQUESTS_PER_MINUTE, SharedRateLimiter
+
+logger = logging.getLogger(__name__)
+
+EXIT_OK = 0
+EXIT_JOBS_FAILED = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+def load_manifest(path: str) -> Dict[str, List[str]]:
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if not isinstance(manifest, dict):
+        raise ValueError("The manifest must map company names to lists of files")
+    base = os.path.dirname(os.path.abspath(path))
+    return {company: [os.path.join(base, file_path) for file_path in files] for company, files in manifest.items()}
+
+def scan_directory(root: str) -> Dict[str, List[str]]:
+    jobs = {}
+    for entry in sorted(os.scandir(root), key=lambda entry: entry.name):
+        if not entry.is_dir() or entry.name.startswith("."):
+            continue
+        files = sorted(os.path.join(directory, name)
+                       for directory, _, names in os.walk(entry.path) for name in names if not name.startswith("."))
+        if files:
+            jobs[entry.name] = files
+    return jobs
+
+def job_output_path(output_dir: str, company_name: str) -> str:
+    return os.path.join(output_dir, re.sub(r"[^\w.-]+", "_", company_name) + ".json")
+
+def _read_record(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_record(path: str, record: Dict[str, Any]):
+    # Written whole or not at all, an interrupted run never leaves a half-written job behind
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(record, f, indent=2)
+    os.replace(temp_path, path)
+
+def _init_worker(limiter, log_level: str):
+    # Only the parent reacts to Ctrl+C, it stops the pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    configure_logging(log_level)
+    if limiter is not None:
+        from src.clients import set_rate_limiter
+        set_rate_limiter(limiter)
+
+def _run_job(job):
+    company_name, file_paths, force = job
+    from src.review import review_documents
+
+    start = time.perf_counter()
+    try:
+        result = review_documents(file_paths, company_name, reuse_stored=not force)
+        return company_name, result, None, time.perf_counter() - start
+    except Exception as e:
+        logger.exception("Job %s failed", company_name)
+        return company_name, None, f"{type(e).__name__}: {e}", time.perf_counter() - start
+
+def job_status(result: Optional[Dict[str, Any]], error: Optional[str]) -> str:
+    if error is not None:
+        return "failed"
+    if result.get("failed_documents") or result.get("failed_clauses"):
+        return "incomplete"
+    return "ok"
+
+def job_summary(record: Dict[str, Any]) -> Dict[str, Any]:
+    result = record["result"] or {}
+    return {
+        "status": record["status"],
+        "error": record["error"],
+        "wall_seconds": record["wall_seconds"],
+        "pipeline_seconds": result.get("timings", {}).get("total_seconds"),
+        "stages": result.get("timings", {}).get("stages", {}),
+        "invoked_clauses": len(result.get("clause_analysis", [])),
+        "usage": result.get("usage", {}).get("totals"),
+        "stored_run": result.get("run", {}).get("id"),
+    }
+
+def batch_summary(jobs: Dict[str, Dict[str, Any]], wall_seconds: float, settings: Dict[str, Any]) -> Dict[str, Any]:
+    counts = {"ok": 0, "incomplete": 0, "failed": 0, "skipped": 0}
+    stages: Dict[str, Dict[str, float]] = {}
+    usage: Dict[str, float] = {}
+    for summary in jobs.values():
+        counts["skipped" if summary.get("skipped") else summary["status"]] += 1
+        if summary.get("skipped"):
+            continue
+        for stage, timing in summary["stages"].items():
+            total = stages.setdefault(stage, {"seconds": 0.0, "calls": 0})
+            total["seconds"] = round(total["seconds"] + timing["seconds"], 3)
+            total["calls"] += timing["calls"]
+        for key, value in (summary["usage"] or {}).items():
+            usage[key] = round(usage.get(key, 0) + value, 6)
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": settings,
+        "wall_seconds": round(wall_seconds, 3),
+        "counts": counts,
+        "stages": dict(sorted(stages.items(), key=lambda item: -item[1]["seconds"])),
+        "usage": usage,
+        "jobs": jobs,
+    }
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+def run_batch(jobs: Dict[str, List[str]], output_dir: str, workers: int, requests_per_minute: int,
+              force: bool = False, log_level: str = "INFO") -> int:
+    from src.corpus import document_hash
+
+    os.makedirs(output_dir, exist_ok=True)
+    start = time.perf_counter()
+    inputs = {company_name: sorted(document_hash(file_path) for file_path in file_paths) for company_name, file_paths in jobs.items()}
+
+    summaries = {}
+    pending = []
+    for company_name, file_paths in jobs.items():
+        previous = _read_record(job_output_path(output_dir, company_name))
+        if not force and previous and previous["status"] == "ok" and previous["inputs"] == inputs[company_name]:
+            summaries[company_name] = {**job_summary(previous), "skipped": True}
+        else:
+            pending.append((company_name, file_paths, force))
+    logger.info("%d jobs, %d already done, running %d on %d workers", len(jobs), len(summaries), len(pending), min(workers, len(pending)))
+
+    # Spawned rather than forked, the parent's logging and tracing threads don't survive a fork
+    context = multiprocessing.get_context("spawn")
+    limiter = SharedRateLimiter(requests_per_minute, context=context) if requests_per_minute else None
+    interrupted = False
+    if pending:
+        pool = context.Pool(min(workers, len(pending)), _init_worker, (limiter, log_level))
+        previous_handler = signal.signal(signal.SIGTERM, _interrupt) if threading.current_thread() is threading.main_thread() else None
+        try:
+            for done, (company_name, result, error, seconds) in enumerate(pool.imap_unordered(_run_job, pending), 1):
+                record = {
+                    "company_name": company_name,
+                    "status": job_status(result, error),
+                    "error": error,
+                    "files": jobs[company_name],
+                    "inputs": inputs[company_name],
+                    "wall_seconds": round(seconds, 3),
+                    "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "result": result,
+                }
+                _write_record(job_output_path(output_dir, company_name), record)
+                summaries[company_name] = job_summary(record)
+                logger.info("%s: %s in %.1fs (%d of %d)", company_name, record["status"], seconds, done, len(pending))
+            pool.close()
+        except KeyboardInterrupt:
+            interrupted = True
+            logger.warning("Interrupted, finished jobs are kept and skipped on the next run")
+            pool.terminate()
+        finally:
+            pool.join()
+            if previous_handler is not None:
+                signal.signal(signal.SIGTERM, previous_handler)
+
+    settings = {"workers": workers, "requests_per_minute": requests_per_minute, "force": force, "interrupted": interrupted}
+    summary = batch_summary(summaries, time.perf_counter() - start, settings)
+    _write_record(os.path.join(output_dir, "summary.json"), summary)
+    logger.info("Batch finished in %.1fs: %s", summary["wall_seconds"], summary["counts"])
+
+    if interrupted:
+        return EXIT_INTERRUPTED
+    if summary["counts"]["failed"] or summary["counts"]["incomplete"]:
+        return EXIT_JOBS_FAILED
+    return EXIT_OK
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Review contract jobs without the GUI")
+    parser.add_argument("input", help="JSON manifest {company: [files]} or a directory with one sub-directory per company")
+    parser.add_argument("--output", default="batch_results", help="Directory for per-job results and summary.json")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="Jobs run at the same time, one process each")
+    parser.add_argument("--requests-per-minute", type=int, default=DEFAULT_REQUESTS_PER_MINUTE,
+                        help="OpenAI request budget shared by all workers, 0 for unlimited")
+    parser.add_argument("--force", action="store_true", help="Run jobs again even if their files haven't changed or a stored run exists")
+    parser.add_argument("--log-level", default=os.getenv("CONTRACT_REVIEW_LOG_LEVEL", "INFO").upper())
+    args = parser.parse_args(argv)
+    configure_logging(args.log_level)
+
+    try:
+        jobs = load_manifest(args.input) if os.path.isfile(args.input) else scan_directory(args.input)
+    except (OSError, ValueError) as e:
+        logger.error("Could not read jobs from %s: %s", args.input, str(e))
+        return EXIT_USAGE
+    if not jobs:
+        logger.error("No jobs found in %s", args.input)
+        return EXIT_USAGE
+    missing = [file_path for file_paths in jobs.values() for file_path in file_paths if not os.path.isfile(file_path)]
+    if missing:
+        logger.error("Missing files: %s", ", ".join(missing))
+        return EXIT_USAGE
+    if args.workers < 1:
+        logger.error("--workers must be at least 1")
+        return EXIT_USAGE
+
+    return run_batch(jobs, args.output, args.workers, args.requests_per_minute, args.force, args.log_level)
@@ -0,0 +1,58 @@
+import hashlib
+import io
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+import numpy as np
+
+CACHE_DIR = os.getenv("CONTRACT_REVIEW_CACHE_DIR", ".cache")
+
+def content_hash(data) -> str:
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+def cache_path(namespace: str, key: str, suffix: str = "") -> str:
+    # Fan entries out over sub-directories so no single directory gets huge
+    directory = os.path.join(CACHE_DIR, namespace, key[:2])
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, key + suffix)
+
+def _write_atomic(path: str, data: bytes):
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+def read_text(namespace: str, key: str) -> Optional[str]:
+    path = cache_path(namespace, key, ".md")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+def write_text(namespace: str, key: str, text: str):
+    _write_atomic(cache_path(namespace, key, ".md"), text.encode("utf-8"))
+
+def read_json(namespace: str, key: str) -> Optional[Any]:
+    path = cache_path(namespace, key, ".json")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def write_json(namespace: str, key: str, value: Any):
+    _write_atomic(cache_path(namespace, key, ".json"), json.dumps(value).encode("utf-8"))
+
+def read_arrays(namespace: str, key: str) -> Optional[Dict[str, np.ndarray]]:
+    path = cache_path(namespace, key, ".npz")
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+def write_arrays(namespace: str, key: str, **arrays: np.ndarray):
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    _write_atomic(cache_path(namespace, key, ".npz"), buffer.getvalue())
@@ -0,0 +1,220 @@
+import re
+import functools
+from itertools import islice
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from src.config import embedding_config
+from src.cpu_pool import cpu_map
+from src.tracing import traced
+
+if TYPE_CHECKING:
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+HEADER_PATTERN = re.compile(r"^(#{1,6})[ \t]+(.+?)[ \t#]*$")
+FENCE_PATTERN = re.compile(r"^(```|~~~)")
+TABLE_ROW_PATTERN = re.compile(r"^[ \t]*\|")
+
+# Sizes are in tokens of the embedding model's encoding
+CHUNK_TOKENS = 400
+CHUNK_OVERLAP_TOKENS = 40
+TABLE_MAX_TOKENS = 1200
+# Sections are sized on the CPU workers in groups of about this many characters,
+# shorter documents are sized on the calling thread
+SECTION_GROUP_CHARS = 50_000
+
+@functools.lru_cache(maxsize=None)
+def get_encoding():
+    # tiktoken loads its BPE ranks on first use, not when the app starts
+    import tiktoken
+    return tiktoken.encoding_for_model(embedding_config.model)
+
+def count_tokens(text: str) -> int:
+    return len(get_encoding().encode(text, disallowed_special=()))
+
+@functools.lru_cache(maxsize=None)
+def get_splitter(chunk_tokens: int, chunk_overlap: int, table: bool = False) -> "RecursiveCharacterTextSplitter":
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    # Built once per size and shared, splitting is stateless.
+    # Tables are only ever cut between rows.
+    separators = ["\n", " ", ""] if table else ["\n\n", "\n", ".", "!", "?", ";", ",", " ", ""]
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_tokens,
+        chunk_overlap=0 if table else chunk_overlap,
+        length_function=count_tokens,
+        separators=separators
+    )
+
+class Chunk(NamedTuple):
+    # source is the parsed document itself, chunks only keep offsets into it
+    source: str
+    start: int
+    end: int
+    header: str
+    tokens: int = 0
+
+    @property
+    def text(self) -> str:
+        return self.source[self.start:self.end]
+
+    def to_payload(self, **metadata) -> Dict:
+        return {
+            "content": self.text,
+            "metadata": {"header": self.header, "token_count": self.tokens, **metadata}
+        }
+
+def _strip_span(text: str, start: int, end: int):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+def iter_sections(markdown_text: str) -> Iterator[Chunk]:
+    headers = []  # stack of (level, title)
+    section_start = 0
+    position = 0
+    in_fence = False
+
+    for line in markdown_text.splitlines(keepends=True):
+        line_start = position
+        position += len(line)
+        stripped = line.strip()
+
+        if FENCE_PATTERN.match(stripped):
+            in_fence = not in_fence
+            continue
+        match = None if in_fence else HEADER_PATTERN.match(stripped)
+        if not match:
+            continue
+
+        start, end = _strip_span(markdown_text, section_start, line_start)
+        if start < end:
+            yield Chunk(markdown_text, start, end, headers[0][1] if headers else "")
+
+        level = len(match.group(1))
+        while headers and headers[-1][0] >= level:
+            headers.pop()
+        headers.append((level, match.group(2)))
+        section_start = position
+
+    start, end = _strip_span(markdown_text, section_start, len(markdown_text))
+    if start < end:
+        yield Chunk(markdown_text, start, end, headers[0][1] if headers else "")
+
+def _iter_blocks(section: Chunk) -> Iterator[Tuple[Chunk, bool]]:
+    # Break a section into runs of table rows and runs of everything else
+    block_start = section.start
+    block_is_table = None
+    position = section.start
+    for line in section.text.splitlines(keepends=True):
+        is_table = bool(TABLE_ROW_PATTERN.match(line))
+        if block_is_table is not None and is_table != block_is_table:
+            start, end = _strip_span(section.source, block_start, position)
+            if start < end:
+                yield Chunk(section.source, start, end, section.header), block_is_table
+            block_start = position
+        block_is_table = is_table
+        position += len(line)
+    start, end = _strip_span(section.source, block_start, section.end)
+    if start < end:
+        yield Chunk(section.source, start, end, section.header), bool(block_is_table)
+
+def _split_block(block: Chunk, splitter: "RecursiveCharacterTextSplitter") -> Iterator[Chunk]:
+    block_text = block.text
+    cursor = 0
+    for piece in splitter.split_text(block_text):
+        # Pieces are slices of the block in order, overlapping pieces start before
+        # the previous one ended
+        offset = block_text.find(piece, cursor)
+        if offset == -1:
+            offset = block_text.find(piece)
+        if offset == -1:
+            yield Chunk(piece, 0, len(piece), block.header, count_tokens(piece))
+            continue
+        cursor = offset + 1
+        start = block.start + offset
+        yield Chunk(block.source, start, start + len(piece), block.header, count_tokens(piece))
+
+def _iter_sized_chunks(section: Chunk, chunk_tokens: int, chunk_overlap: int) -> Iterator[Chunk]:
+    tokens = count_tokens(section.text)
+    if tokens <= chunk_tokens:
+        yield section._replace(tokens=tokens)
+        return
+
+    for block, is_table in _iter_blocks(section):
+        tokens = count_tokens(block.text)
+        limit = TABLE_MAX_TOKENS if is_table else chunk_tokens
+        if tokens <= limit:
+            # Tables stay whole up to TABLE_MAX_TOKENS so rows keep their column headings
+            yield block._replace(tokens=tokens)
+        else:
+            yield from _split_block(block, get_splitter(chunk_tokens, chunk_overlap, is_table))
+
+def _size_sections(sections: List[Tuple[int, str, str]], chunk_tokens: int,
+                   chunk_overlap: int) -> List[Tuple[int, int, str, int, Optional[str]]]:
+    # Runs on a CPU worker. Only the sections' text is sent over, chunks come back as
+    # offsets into the document, or with their own text when the splitter rewrote it.
+    sized = []
+    for offset, text, header in sections:
+        for chunk in _iter_sized_chunks(Chunk(text, 0, len(text), header), chunk_tokens, chunk_overlap):
+            if chunk.source is text:
+                sized.append((offset + chunk.start, offset + chunk.end, chunk.header, chunk.tokens, None))
+            else:
+                sized.append((0, len(chunk.source), chunk.header, chunk.tokens, chunk.source))
+    return sized
+
+def _section_groups(markdown_text: str) -> Iterator[List[Tuple[int, str, str]]]:
+    group = []
+    size = 0
+    for section in iter_sections(markdown_text):
+        group.append((section.start, section.text, section.header))
+        size += section.end - section.start
+        if size >= SECTION_GROUP_CHARS:
+            yield group
+            group = []
+            size = 0
+    if group:
+        yield group
+
+def _iter_document_chunks(markdown_text: str, chunk_tokens: int, chunk_overlap: int) -> Iterator[Chunk]:
+    if len(markdown_text) < SECTION_GROUP_CHARS:
+        for section in iter_sections(markdown_text):
+            yield from _iter_sized_chunks(section, chunk_tokens, chunk_overlap)
+        return
+
+    size = functools.partial(_size_sections, chunk_tokens=chunk_tokens, chunk_overlap=chunk_overlap)
+    for sized in cpu_map(size, _section_groups(markdown_text)):
+        for start, end, header, tokens, text in sized:
+            if text is None:
+                yield Chunk(markdown_text, start, end, header, tokens)
+            else:
+                yield Chunk(text, start, end, header, tokens)
+
+@traced("chunk_markdown_text")
+def chunk_markdown_text(markdown_text: str, chunk_tokens: int = CHUNK_TOKENS,
+                        chunk_overlap: int = CHUNK_OVERLAP_TOKENS) -> Iterator[Chunk]:
+    pending = None
+    for chunk in _iter_document_chunks(markdown_text, chunk_tokens, chunk_overlap):
+        # Small neighbouring sections under the same header are merged into one chunk,
+        # the span between them also picks up their sub-headings
+        if pending is not None and pending.header == chunk.header \
+                and pending.source is chunk.source \
+                and pending.tokens + chunk.tokens <= chunk_tokens:
+            merged = Chunk(pending.source, pending.start, chunk.end, pending.header)
+            merged_tokens = count_tokens(merged.text)
+            if merged_tokens <= chunk_tokens:
+                pending = merged._replace(tokens=merged_tokens)
+                continue
+        if pending is not None:
+            yield pending
+        pending = chunk
+    if pending is not None:
+        yield pending
+
+def batched(iterable: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
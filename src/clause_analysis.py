@@ -1,10 +1,11 @@
 from pydantic import BaseModel
-from typing import List, Optional
-from openai import OpenAI
-import os
+from typing import Callable, List, Optional
 import asyncio
+import logging
+from src.tracing import span, traced, with_current_context
+from src.usage import record_chat
 
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+logger = logging.getLogger(__name__)
 
 class Quote(BaseModel):
     quote: str
@@ -17,22 +18,36 @@ class ClauseAnalysisResponse(BaseModel):
     invoked: str
     quotes: List[Quote]
 
-async def analyze_clauses_batch(client: OpenAI, prompts: List[str]) -> List[ClauseAnalysisResponse]:
-    def process_batch(prompt):
+@traced("analyze_clauses_batch", attributes=lambda args: {"prompts": len(args["prompts"])})
+async def analyze_clauses_batch(client, prompts: List[str], clause_ids: Optional[List[str]] = None,
+                                on_result: Callable[[str, Optional[ClauseAnalysisResponse]], None] = None) -> List[ClauseAnalysisResponse]:
+    # on_result is called from the worker thread as soon as each clause is done
+    def process_batch(prompt, clause_id=None):
+        analysis = analyze_clause(prompt, clause_id)
+        if on_result is not None:
+            on_result(clause_id, analysis)
+        return analysis
+
+    def analyze_clause(prompt, clause_id):
         try:
-            completion = client.beta.chat.completions.parse(
-                model="gpt-4o-2024-08-06",
-                messages=[
-                    {"role": "system", "content": "You are a legal expert analyzing contract clauses."},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format=ClauseAnalysisResponse
-            )
+            messages = [
+                {"role": "system", "content": "You are a legal expert analyzing contract clauses."},
+                {"role": "user", "content": prompt}
+            ]
+            with span("analyze_clause", clause=clause_id):
+                completion = client.beta.chat.completions.parse(
+                    model="gpt-4o-2024-08-06",
+                    messages=messages,
+                    response_format=ClauseAnalysisResponse
+                )
+                record_chat("clause_analysis", "gpt-4o-2024-08-06", messages, completion)
             return completion.choices[0].message.parsed
         except Exception as e:
-            print(f"Error processing batch: {str(e)}")
+            logger.error("Error analyzing clause %s: %s", clause_id, str(e))
             return None
 
     loop = asyncio.get_running_loop()
-    tasks = [loop.run_in_executor(None, process_batch, prompt) for prompt in prompts]
+    clause_ids = clause_ids or [None] * len(prompts)
+    tasks = [loop.run_in_executor(None, with_current_context(process_batch), prompt, clause_id)
+             for prompt, clause_id in zip(prompts, clause_ids)]
     return await asyncio.gather(*tasks)
\ No newline at end of file
@@ -0,0 +1,81 @@
+import os
+import threading
+from typing import Any, Callable, Dict
+
+# One shared instance per service, built on first use so importing the app (and opening
+# the window) never waits on the OpenAI, LlamaParse or Qdrant libraries
+
+QDRANT_URL = "https://50238ac6-e670-42be-933e-c836f812c16e.europe-west3-0.gcp.cloud.qdrant.io"
+LLAMA_PARSE_MODEL = "gpt-4o-2024-08-06"
+
+def _load_env():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+_rate_limiter = None
+
+def set_rate_limiter(limiter):
+    # Every OpenAI HTTP request, retries included, waits on limiter.acquire() first.
+    # Only applies to clients built afterwards.
+    global _rate_limiter
+    _rate_limiter = limiter
+
+def _build_openai():
+    from openai import OpenAI, DefaultHttpxClient
+    _load_env()
+    if _rate_limiter is None:
+        return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    limiter = _rate_limiter
+    return OpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        http_client=DefaultHttpxClient(event_hooks={"request": [lambda request: limiter.acquire()]})
+    )
+
+def _build_llama_parser():
+    from llama_parse import LlamaParse
+    _load_env()
+    return LlamaParse(
+        result_type="markdown",
+        api_key=os.getenv("LLAMA_CLOUD_API_KEY"),
+        model=LLAMA_PARSE_MODEL
+    )
+
+def _build_qdrant():
+    from qdrant_client import QdrantClient
+    _load_env()
+    return QdrantClient(
+        url=QDRANT_URL,
+        api_key=os.getenv("QDRANT_API_KEY"),
+    )
+
+FACTORIES: Dict[str, Callable[[], Any]] = {
+    "openai": _build_openai,
+    "llama_parse": _build_llama_parser,
+    "qdrant": _build_qdrant,
+}
+
+_lock = threading.Lock()
+_clients: Dict[str, Any] = {}
+
+def get_client(name: str):
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = FACTORIES[name]()
+    return client
+
+def set_client(name: str, client):
+    # Swaps in another instance, e.g. the local fakes used by the benchmarks
+    with _lock:
+        _clients[name] = client
+
+def get_openai_client():
+    return get_client("openai")
+
+def get_llama_parser():
+    return get_client("llama_parse")
+
+def get_qdrant_client():
+    return get_client("qdrant")
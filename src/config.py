@@ -0,0 +1,18 @@
+import os
+from dataclasses import dataclass
+
+@dataclass(frozen=True)
+class EmbeddingConfig:
+    model: str = "text-embedding-3-small"
+    # text-embedding-3 models can return shortened vectors, 1536 is the full size of -small
+    dimensions: int = 1536
+
+    @property
+    def tag(self) -> str:
+        # Identifies vectors that are interchangeable, used to key caches and corpus records
+        return f"{self.model}@{self.dimensions}"
+
+embedding_config = EmbeddingConfig(
+    model=os.getenv("CONTRACT_REVIEW_EMBEDDING_MODEL", EmbeddingConfig.model),
+    dimensions=int(os.getenv("CONTRACT_REVIEW_EMBEDDING_DIMENSIONS", EmbeddingConfig.dimensions)),
+)
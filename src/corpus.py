@@ -0,0 +1,49 @@
+import hashlib
+import logging
+from typing import Dict, List, Optional, Tuple
+from qdrant_client import QdrantClient
+from src.cache import read_json, write_json
+from src.dedup import JobChunkIndex
+from src.config import embedding_config
+from src.qdrant_operations import point_id, retrieve_points
+
+logger = logging.getLogger(__name__)
+
+# Documents are recognised by the hash of the file itself, so the same quality manual
+# attached to many POs is parsed, classified, chunked and embedded only once
+
+def document_hash(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_corpus_record(file_hash: str) -> Optional[Dict]:
+    record = read_json("corpus", file_hash)
+    if record is None or record.get("embedding_model") != embedding_config.tag:
+        return None
+    return record
+
+def save_corpus_record(file_hash: str, doc_type: str, po_analysis: Optional[Dict], collection_name: str, content_hashes: List[str]):
+    write_json("corpus", file_hash, {
+        "doc_type": doc_type,
+        "po_analysis": po_analysis,
+        "collection": collection_name,
+        "embedding_model": embedding_config.tag,
+        "content_hashes": sorted(set(content_hashes))
+    })
+
+def attach_corpus_document(client: QdrantClient, record: Dict, chunk_index: JobChunkIndex) -> Optional[Tuple[List[Dict], List[List[float]]]]:
+    ids = [point_id(content_hash) for content_hash in record["content_hashes"]]
+    try:
+        payloads, vectors = retrieve_points(client, record["collection"], ids)
+    except Exception as e:
+        logger.warning("Could not read stored vectors from %s: %s", record['collection'], str(e))
+        return None
+    if len(payloads) < len(ids):
+        # Collection was cleared or partially deleted, the document has to be ingested again
+        return None
+
+    kept = [(payload, vector) for payload, vector in zip(payloads, vectors) if chunk_index.add(payload)]
+    return [payload for payload, _ in kept], [vector for _, vector in kept]
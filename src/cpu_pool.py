@@ -0,0 +1,85 @@
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+from collections import deque
+from typing import Callable, Iterable, Iterator, TypeVar
+
+logger = logging.getLogger(__name__)
+
+# Page hashing, OCR, chunking and MinHash run in worker processes so they use every core
+# instead of taking turns under the GIL with the threads waiting on OpenAI, LlamaParse and Qdrant.
+# 0 runs them on the calling thread, the default on a single core where workers gain nothing.
+_CORES = os.cpu_count() or 1
+CPU_WORKERS = int(os.getenv("CONTRACT_REVIEW_CPU_WORKERS", str(_CORES if _CORES > 1 else 0)))
+# Tasks submitted but not finished, across all callers. Submitting blocks beyond this,
+# so fast producers wait for the workers instead of queueing whole documents in memory.
+MAX_PENDING = CPU_WORKERS * 2
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(max(MAX_PENDING, 1))
+_in_worker = False
+
+def _init_worker():
+    global _in_worker
+    _in_worker = True
+    # The parent decides when to stop, Ctrl+C only reaches it
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def _inline() -> bool:
+    # Daemonic processes (the batch runner's workers) can't start children, they already
+    # have a process per job
+    return CPU_WORKERS < 1 or _in_worker or multiprocessing.current_process().daemon
+
+def _get_executor() -> concurrent.futures.ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawned rather than forked, the parent's logging and tracing threads don't survive a fork
+            _executor = concurrent.futures.ProcessPoolExecutor(
+                CPU_WORKERS, multiprocessing.get_context("spawn"), initializer=_init_worker
+            )
+            logger.debug("Started %d CPU workers", CPU_WORKERS)
+        return _executor
+
+def submit_cpu(fn: Callable[..., R], *args) -> "concurrent.futures.Future[R]":
+    if _inline():
+        future = concurrent.futures.Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    _slots.acquire()
+    try:
+        future = _get_executor().submit(fn, *args)
+    except Exception:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future
+
+def run_cpu(fn: Callable[..., R], *args) -> R:
+    return submit_cpu(fn, *args).result()
+
+def cpu_map(fn: Callable[[T], R], items: Iterable[T], lookahead: int = MAX_PENDING) -> Iterator[R]:
+    # Results come back in input order, at most `lookahead` items are in flight so the
+    # consumer can start on the first results while later ones are still being computed
+    pending = deque()
+    try:
+        for item in items:
+            pending.append(submit_cpu(fn, item))
+            if len(pending) > max(lookahead, 1):
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
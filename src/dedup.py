@@ -0,0 +1,78 @@
+import threading
+from typing import Dict, List, Set
+from src.cache import content_hash
+
+SOURCE_FIELDS = ("document_name", "document_type", "header")
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+class JobChunkIndex:
+    # Shared by every document of a job so each distinct chunk text is embedded
+    # and stored once, with every place it appeared recorded in its payload
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._payloads: Dict[str, Dict] = {}
+        # Payloads to embed again at the end of the job, because their embedding or the document that
+        # claimed them failed. Kept with every source that was skipped in their favour.
+        self.failed: Dict[str, Dict] = {}
+        self.duplicates = 0
+
+    def add(self, payload: Dict) -> bool:
+        metadata = payload["metadata"]
+        # Payloads attached from the shared corpus already carry their hash and sources
+        key = metadata.get("content_hash") or content_hash(normalize_text(payload["content"]))
+        metadata["content_hash"] = key
+        source = {field: metadata.get(field) for field in SOURCE_FIELDS}
+
+        with self._lock:
+            existing = self._payloads.get(key)
+            if existing is not None:
+                self.duplicates += 1
+                if source not in existing["metadata"]["sources"]:
+                    existing["metadata"]["sources"].append(source)
+                return False
+
+            sources = metadata.setdefault("sources", [])
+            if source not in sources:
+                sources.append(source)
+            # Another document's copy failed to embed earlier, this one takes over its sources
+            for failed_source in self.failed.pop(key, {"metadata": {"sources": []}})["metadata"]["sources"]:
+                if failed_source not in sources:
+                    sources.append(failed_source)
+            self._payloads[key] = payload
+            return True
+
+    def discard(self, payload: Dict):
+        # Duplicates skipped in favour of this payload still need it, it is retried at the end of the job
+        with self._lock:
+            key = payload["metadata"].get("content_hash")
+            failed = self._payloads.pop(key, None)
+            if failed is not None:
+                self.failed[key] = failed
+
+    def release(self, content_hashes: List[str], claimed: Set[str], document_name: str, document_type: str):
+        # For a document that failed after adding its chunks: its locations are removed, and the
+        # chunks it claimed that other documents also contain are retried at the end of the job
+        with self._lock:
+            for key in set(content_hashes):
+                payload = self._payloads.get(key) or self.failed.get(key)
+                if payload is None:
+                    continue
+                sources = [source for source in payload["metadata"]["sources"]
+                           if (source["document_name"], source["document_type"]) != (document_name, document_type)]
+                payload["metadata"]["sources"] = sources
+                if not sources:
+                    self._payloads.pop(key, None)
+                    self.failed.pop(key, None)
+                elif key in claimed and self._payloads.get(key) is payload:
+                    self.failed[key] = self._payloads.pop(key)
+
+    def resolve(self, payload: Dict):
+        with self._lock:
+            key = payload["metadata"]["content_hash"]
+            if self.failed.pop(key, None) is not None:
+                self._payloads[key] = payload
+
+    def __len__(self):
+        return len(self._payloads)
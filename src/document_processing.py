@@ -1,52 +1,30 @@
 from src.get_formatted_text import parse_document
 from src.embeddings import create_embeddings
-from src.utils import memoize
-from typing import List, Dict
-from langchain_text_splitters import MarkdownHeaderTextSplitter, RecursiveCharacterTextSplitter
-from openai import OpenAI
+from src.chunking import chunk_markdown_text, batched
+from src.dedup import JobChunkIndex
+from src.near_duplicates import reuse_known_embeddings, remember_chunks
+from typing import List, Dict, NamedTuple, Optional, Set, Tuple
 import os
-from src.po_analysis import review_po
-
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-@memoize
-def chunk_markdown_text(markdown_text):
-    headers_to_split_on = [
-        ("#", "Header 1"),
-        ("##", "Header 2"),
-        ("###", "Header 3"),
-        ("####", "Header 4"),
-        ("#####", "Header 5"),
-        ("######", "Header 6")
-    ]
-    splitter = MarkdownHeaderTextSplitter(headers_to_split_on=headers_to_split_on)
-    initial_chunks = splitter.split_text(markdown_text)
-
-    sub_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=800,
-        chunk_overlap=100,
-        length_function=len,
-        separators=["\n\n", "\n", ".", "!", "?", ";", ",", " ", ""]
-    )
+import numpy as np
+from src.po_analysis import review_po, POAnalysisResponse
+from src.clients import get_openai_client
+from src.tracing import traced
+from src.progress import report
+from src.usage import record_chat
+
+EMBEDDING_BATCH_SIZE = 100
 
-    final_chunks = []
-    for chunk in initial_chunks:
-        header = next((chunk.metadata[key] for key in chunk.metadata if key.startswith("Header")), "")
-        if len(chunk.page_content) > 1000:
-            sub_chunks = sub_splitter.split_text(chunk.page_content)
-            for sub_chunk in sub_chunks:
-                final_chunks.append({
-                    "page_content": sub_chunk,
-                    "metadata": {"header": header}
-                })
-        else:
-            final_chunks.append({
-                "page_content": chunk.page_content,
-                "metadata": {"header": header}
-            })
-
-    return final_chunks
+class ProcessedDocument(NamedTuple):
+    file_path: str
+    doc_type: str
+    chunks: List[Dict]
+    embeddings: List[List[float]]
+    po_analysis: Optional[POAnalysisResponse]
+    known_ratio: float
+    # Every chunk of the document, including ones stored under another document's payload
+    content_hashes: List[str]
 
+@traced("determine_document_type")
 def determine_document_type(content: str) -> str:
     prompt = f"""
     Analyze the following text and determine if it is a Purchase Order, Quality Document, or Terms and Conditions.
@@ -56,34 +34,103 @@ def determine_document_type(content: str) -> str:
     {content[:2000]}  # Using the first 2000 characters as a sample
     """
 
-    response = openai_client.beta.chat.completions.parse(
+    messages = [
+        {"role": "system", "content": "You are an expert at identifying document types."},
+        {"role": "user", "content": prompt}
+    ]
+    response = get_openai_client().beta.chat.completions.parse(
         model="gpt-4o-2024-08-06",
-        messages=[
-            {"role": "system", "content": "You are an expert at identifying document types."},
-            {"role": "user", "content": prompt}
-        ]
+        messages=messages
     )
+    record_chat("classification", "gpt-4o-2024-08-06", messages, response)
 
     return response.choices[0].message.content.strip()
 
-def process_document(file_path):
+def embed_failed_chunks(chunk_index: JobChunkIndex) -> Tuple[List[Dict], List[np.ndarray]]:
+    # One more attempt for chunks whose embedding batch failed, the ones embedded now are
+    # stored for every document that contains them
+    payloads = list(chunk_index.failed.values())
+    if not payloads:
+        return [], []
+    embedded = [(payload, embedding) for payload, embedding in zip(payloads, create_embeddings([payload["content"] for payload in payloads]))
+                if embedding is not None]
+    for payload, _ in embedded:
+        chunk_index.resolve(payload)
+    return [payload for payload, _ in embedded], [embedding for _, embedding in embedded]
+
+def embed_document(content: str, doc_type: str, document_name: str, chunk_index: JobChunkIndex,
+                   content_hashes: List[str], claimed: Set[str]) -> Tuple[List[Dict], List[np.ndarray], float]:
+    # Embed each batch as soon as the chunker produces it, payloads are built once.
+    # Text already seen in this job only adds its location to the existing payload,
+    # text seen in an earlier job reuses the embedding of its near-duplicate.
+    # Every chunk is listed in content_hashes, the ones this document stores in claimed.
+    chunks = []
+    embeddings = []
+    total_tokens = 0
+    known_tokens = 0
+    for batch in batched(chunk_markdown_text(content), EMBEDDING_BATCH_SIZE):
+        payloads = [chunk.to_payload(document_type=doc_type, document_name=document_name) for chunk in batch]
+        total_tokens += sum(payload["metadata"]["token_count"] for payload in payloads)
+        new_payloads = []
+        for payload in payloads:
+            added = chunk_index.add(payload)
+            content_hashes.append(payload["metadata"]["content_hash"])
+            if added:
+                claimed.add(payload["metadata"]["content_hash"])
+                new_payloads.append(payload)
+            else:
+                known_tokens += payload["metadata"]["token_count"]
+        if not new_payloads:
+            continue
+
+        batch_embeddings, signatures = reuse_known_embeddings(new_payloads)
+        known_tokens += sum(payload["metadata"]["token_count"]
+                            for payload, embedding in zip(new_payloads, batch_embeddings) if embedding is not None)
+        missing = [i for i, embedding in enumerate(batch_embeddings) if embedding is None]
+        for i, embedding in zip(missing, create_embeddings([new_payloads[i]["content"] for i in missing])):
+            batch_embeddings[i] = embedding
+
+        for payload, embedding in zip(new_payloads, batch_embeddings):
+            # The job retries the chunks that failed and fails the documents that still miss one
+            if embedding is None:
+                chunk_index.discard(payload)
+                continue
+            chunks.append(payload)
+            embeddings.append(embedding)
+        remember_chunks([payload for payload, embedding in zip(new_payloads, batch_embeddings) if embedding is not None],
+                        [signature for signature, embedding in zip(signatures, batch_embeddings) if embedding is not None])
+        report("embedding", chunks=len(chunks))
+
+    known_ratio = known_tokens / total_tokens if total_tokens else 0.0
+    report("embedded", chunks=len(chunks), known_ratio=round(known_ratio, 3))
+    return chunks, embeddings, known_ratio
+
+@traced("process_document", attributes=lambda args: {"document": os.path.basename(args["file_path"])})
+def process_document(file_path, chunk_index: JobChunkIndex = None):
+    if chunk_index is None:
+        chunk_index = JobChunkIndex()
+
     content = parse_document(file_path)
+    report("parsed", characters=len(content))
 
     doc_type = determine_document_type(content)
+    report("classified", doc_type=doc_type)
 
-    chunks = chunk_markdown_text(content)
-    
     # Extract just the file name without extension
     document_name = file_path.split('/')[-1].split('.')[0]
-    
-    for chunk in chunks:
-        chunk['metadata']['document_type'] = doc_type
-        chunk['metadata']['document_name'] = document_name
-    
-    embeddings = create_embeddings(chunks)
-    
-    po_analysis = None
-    if doc_type == "Purchase Order":
-        po_analysis = review_po(content)
-    
-    return file_path, doc_type, chunks, embeddings, po_analysis
\ No newline at end of file
+
+    content_hashes = []
+    claimed = set()
+    try:
+        chunks, embeddings, known_ratio = embed_document(content, doc_type, document_name, chunk_index, content_hashes, claimed)
+
+        po_analysis = None
+        if doc_type == "Purchase Order":
+            po_analysis = review_po(content)
+            report("po_analysed", po_analysis=po_analysis.model_dump() if po_analysis else None)
+    except Exception:
+        # Nothing of this document is stored, chunks other documents skipped in its favour are stored for them instead
+        chunk_index.release(content_hashes, claimed, document_name, doc_type)
+        raise
+
+    return ProcessedDocument(file_path, doc_type, chunks, embeddings, po_analysis, known_ratio, content_hashes)
@@ -1,30 +1,83 @@
-from openai import OpenAI
-from typing import List, Dict
+from typing import List, Optional
 import time
+import logging
 import os
-from src.utils import memoize
-
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-embedding_model_name = "text-embedding-3-small"
-
-@memoize
-def create_embeddings(chunks: List[Dict], batch_size: int = 100) -> List[List[float]]:
-    all_embeddings = []
-    for i in range(0, len(chunks), batch_size):
-        batch = chunks[i:i+batch_size]
-        batch_texts = [chunk['page_content'] for chunk in batch]
-        
+import numpy as np
+from src.cache import content_hash, read_arrays, write_arrays
+from src.clients import get_openai_client
+from src.config import embedding_config, EmbeddingConfig
+from src.tracing import traced
+from src.usage import record_embeddings, record_cache_hits
+
+logger = logging.getLogger(__name__)
+
+# Precision of embeddings in the local cache: "float32", "float16" or "int8"
+CACHE_DTYPE = os.getenv("CONTRACT_REVIEW_EMBEDDING_CACHE_DTYPE", "float16")
+
+def embedding_cache_key(text: str, config: EmbeddingConfig = embedding_config) -> str:
+    return content_hash(f"{config.tag}\n{text}")
+
+def compress_embedding(embedding: np.ndarray, dtype: str = CACHE_DTYPE):
+    if dtype == "int8":
+        scale = float(np.abs(embedding).max()) / 127 or 1.0
+        return {"values": np.round(embedding / scale).astype(np.int8), "scale": np.float32(scale)}
+    return {"values": embedding.astype(dtype)}
+
+def decompress_embedding(arrays) -> np.ndarray:
+    values = arrays["values"].astype(np.float32)
+    if "scale" in arrays:
+        values *= arrays["scale"]
+    return values
+
+def get_cached_embedding(key: str) -> Optional[np.ndarray]:
+    arrays = read_arrays("embeddings", key)
+    return decompress_embedding(arrays) if arrays is not None else None
+
+def embed_query(query: str, config: EmbeddingConfig = embedding_config) -> List[float]:
+    # Clause queries and repeated chat questions are embedded once. Query vectors are kept at
+    # float32 whatever CACHE_DTYPE is, so retrieval and answer reuse don't depend on whether the
+    # query was seen before. An entry stored at lower precision (as a chunk) is fetched again.
+    key = embedding_cache_key(query, config)
+    cached = read_arrays("embeddings", key)
+    if cached is not None and cached["values"].dtype == np.float32 and "scale" not in cached:
+        record_cache_hits("query_embedding", 1)
+        return cached["values"].tolist()
+    response = get_openai_client().embeddings.create(input=query, model=config.model, dimensions=config.dimensions)
+    record_embeddings("query_embedding", config.model, [query], response)
+    embedding = np.asarray(response.data[0].embedding, dtype=np.float32)
+    write_arrays("embeddings", key, **compress_embedding(embedding, "float32"))
+    return embedding.tolist()
+
+@traced("create_embeddings", attributes=lambda args: {"texts": len(args["texts"])})
+def create_embeddings(texts: List[str], batch_size: int = 100, config: EmbeddingConfig = embedding_config) -> List[Optional[np.ndarray]]:
+    # Texts that haven't changed since an earlier run are served from the cache
+    keys = [embedding_cache_key(text, config) for text in texts]
+    all_embeddings = [get_cached_embedding(key) for key in keys]
+    pending = [i for i, embedding in enumerate(all_embeddings) if embedding is None]
+    if len(pending) < len(texts):
+        logger.debug("Reusing %d cached embeddings, creating %d", len(texts) - len(pending), len(pending))
+    record_cache_hits("embedding", len(texts) - len(pending))
+
+    for i in range(0, len(pending), batch_size):
+        batch = pending[i:i+batch_size]
+        batch_texts = [texts[index] for index in batch]
+
         try:
-            response = openai_client.embeddings.create(
+            response = get_openai_client().embeddings.create(
                 input=batch_texts,
-                model=embedding_model_name
+                model=config.model,
+                dimensions=config.dimensions
             )
-            batch_embeddings = [data.embedding for data in response.data]
-            all_embeddings.extend(batch_embeddings)
-            
-            
+            record_embeddings("embedding", config.model, batch_texts, response)
+            for index, data in zip(batch, response.data):
+                # float32 arrays instead of lists of Python floats, about an eighth of the memory
+                embedding = np.asarray(data.embedding, dtype=np.float32)
+                write_arrays("embeddings", keys[index], **compress_embedding(embedding))
+                all_embeddings[index] = embedding
+
             time.sleep(1)
         except Exception as e:
-            print(f"Error processing batch {i//batch_size + 1}: {str(e)}")
-    
-    return all_embeddings
\ No newline at end of file
+            logger.error("Error processing embedding batch %d: %s", i//batch_size + 1, str(e))
+
+    # Failed batches stay None so callers can keep chunks and embeddings aligned
+    return all_embeddings
@@ -1,74 +1,151 @@
-from llama_parse import LlamaParse
-from llama_index.core import SimpleDirectoryReader
 import os
-from dotenv import load_dotenv
-from PIL import Image
-import pytesseract
-import traceback
+import functools
+import hashlib
+import tempfile
+from typing import List
+import logging
+from src.cache import content_hash, read_text, write_text
+from src.clients import get_llama_parser, LLAMA_PARSE_MODEL
+from src.cpu_pool import cpu_map, run_cpu
+from src.tracing import traced
+from src.usage import record_pages, record_cache_hits
 
-load_dotenv()
+# pypdf, PIL, pytesseract and the llama_index reader are imported where they are used,
+# so they only load once a document is parsed
 
-# Set up LlamaParse
-parser = LlamaParse(
-    result_type="markdown",
-    api_key=os.getenv("LLAMA_CLOUD_API_KEY"),
-    model="gpt-4o-2024-08-06"
-)
+logger = logging.getLogger(__name__)
+
+# Bump whenever the parser settings change so cached pages are re-parsed
+PAGE_CACHE_VERSION = f"llamaparse-markdown-{LLAMA_PARSE_MODEL}"
+
+def _pdf_page_cache_key(page) -> str:
+    digest = hashlib.sha256(PAGE_CACHE_VERSION.encode("utf-8"))
+    digest.update(str(page.mediabox).encode("utf-8"))
+    digest.update(str(page.get("/Rotate", 0)).encode("utf-8"))
+    contents = page.get_contents()
+    if contents is not None:
+        digest.update(contents.get_data())
+
+    # Scanned pages share the same content stream, the difference is in the images
+    resources = page.get("/Resources")
+    xobjects = resources.get_object().get("/XObject") if resources else None
+    if xobjects:
+        for name, xobject in sorted(xobjects.get_object().items()):
+            digest.update(name.encode("utf-8"))
+            digest.update(xobject.get_object().get_data())
+    return digest.hexdigest()
+
+def _pdf_page_cache_keys(pdf_path: str) -> List[str]:
+    # Runs on a CPU worker, decompressing page contents and scanned images is the slow part
+    from pypdf import PdfReader
+    return [_pdf_page_cache_key(page) for page in PdfReader(pdf_path).pages]
+
+def _parse_pdf_pages(reader, page_indices: List[int]) -> List[str]:
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for index in page_indices:
+        writer.add_page(reader.pages[index])
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_file:
+        writer.write(temp_file)
+        temp_path = temp_file.name
+    try:
+        # LlamaParse returns one document per page
+        documents = get_llama_parser().load_data(temp_path)
+    finally:
+        os.remove(temp_path)
+
+    if len(documents) != len(page_indices) and len(page_indices) > 1:
+        # Can't tell which output belongs to which page, fall back to one page at a time.
+        # The pages are recorded by those calls, this batch's output is thrown away.
+        return [_parse_pdf_pages(reader, [index])[0] for index in page_indices]
+    record_pages("llamaparse", len(page_indices))
+    if len(documents) != len(page_indices):
+        return ["\n\n".join(doc.text for doc in documents)]
+    return [doc.text for doc in documents]
 
 def parse_pdf_to_markdown(pdf_path):
+    from pypdf import PdfReader
+
     if not os.path.exists(pdf_path):
         raise FileNotFoundError(f"The file {pdf_path} does not exist.")
     
     try:
-        file_extractor = {".pdf": parser}
-        reader = SimpleDirectoryReader(input_files=[pdf_path], file_extractor=file_extractor)
-        
-        documents = reader.load_data()
-
-        
-        if documents:
-            markdown_content = []
-            for doc in documents:
-                if hasattr(doc, 'text'):
-                    markdown_content.append(doc.text)
-                elif hasattr(doc, 'page_content'):
-                    markdown_content.append(doc.page_content)
-                else:
-                    print(f"Warning: Document doesn't have 'text' or 'page_content' attribute: {doc}")
-            return "\n\n".join(markdown_content)
-        else:
-            print(f"No documents were parsed from {pdf_path}")
+        page_keys = run_cpu(_pdf_page_cache_keys, pdf_path)
+        pages = [read_text("pages", key) for key in page_keys]
+
+        missing = [i for i, page in enumerate(pages) if page is None]
+        logger.debug("%s: %d of %d pages cached, parsing %d", pdf_path, len(pages) - len(missing), len(pages), len(missing))
+        record_cache_hits("llamaparse", len(pages) - len(missing))
+        if missing:
+            for index, markdown in zip(missing, _parse_pdf_pages(PdfReader(pdf_path), missing)):
+                write_text("pages", page_keys[index], markdown)
+                pages[index] = markdown
+
+        if not pages:
+            logger.warning("No documents were parsed from %s", pdf_path)
             return ""
+        return "\n\n".join(pages)
     except Exception as e:
-        print(f"Error processing {pdf_path}: {str(e)}")
-        print("Full traceback:")
-        traceback.print_exc()
+        logger.exception("Error processing %s", pdf_path)
         return ""
 
+def _ocr_tiff_frame(tiff_path: str, index: int) -> str:
+    # Runs on a CPU worker, frames are decoded and read in parallel
+    from PIL import Image
+
+    with Image.open(tiff_path) as img:
+        img.seek(index)
+        digest = hashlib.sha256(f"{img.mode}{img.size}".encode("utf-8"))
+        digest.update(img.tobytes())
+        key = digest.hexdigest()
+
+        text = read_text("ocr", key)
+        if text is None:
+            import pytesseract
+            pytesseract.pytesseract.tesseract_cmd = 'C:\\Users\\smckee\\AppData\\Local\\Programs\\Tesseract-OCR\\tesseract.exe'
+            text = pytesseract.image_to_string(img)
+            write_text("ocr", key, text)
+    return f"Page {index + 1}:\n{text}\n\n"
+
 def parse_tiff_to_markdown(tiff_path):
+    from PIL import Image
+    from llama_index.core import SimpleDirectoryReader
+
     if not os.path.exists(tiff_path):
         raise FileNotFoundError(f"The file {tiff_path} does not exist.")
     
-    pytesseract.pytesseract.tesseract_cmd = 'C:\\Users\\smckee\\AppData\\Local\\Programs\\Tesseract-OCR\\tesseract.exe'
-    
-    full_text = ""
+    # OCR is cached per frame, so only changed frames go through Tesseract again
     with Image.open(tiff_path) as img:
-        for i in range(img.n_frames):
-            img.seek(i)
-            text = pytesseract.image_to_string(img)
-            full_text += f"Page {i+1}:\n{text}\n\n"
+        frames = img.n_frames
+    full_text = "".join(cpu_map(functools.partial(_ocr_tiff_frame, tiff_path), range(frames)))
+
+    key = content_hash(PAGE_CACHE_VERSION + full_text)
+    markdown = read_text("pages", key)
+    if markdown is not None:
+        record_cache_hits("llamaparse", frames)
+        return markdown
     
     # Use LlamaParse to convert the OCR text to markdown
-    file_extractor = {".txt": parser}
-    with open("temp.txt", "w", encoding="utf-8") as temp_file:
+    file_extractor = {".txt": get_llama_parser()}
+    # A file of its own, other extractions may be parsing TIFFs at the same time
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", encoding="utf-8", delete=False) as temp_file:
         temp_file.write(full_text)
-    documents = SimpleDirectoryReader(input_files=["temp.txt"], file_extractor=file_extractor).load_data()
-    os.remove("temp.txt")
+        temp_path = temp_file.name
+    try:
+        documents = SimpleDirectoryReader(input_files=[temp_path], file_extractor=file_extractor).load_data()
+    finally:
+        os.remove(temp_path)
+    record_pages("llamaparse", len(documents))
     
     if documents:
-        return "\n\n".join(doc.text for doc in documents)
+        markdown = "\n\n".join(doc.text for doc in documents)
+        write_text("pages", key, markdown)
+        return markdown
     return ""
 
+@traced("parse_document")
 def parse_document(doc_path):
     if not os.path.exists(doc_path):
         raise FileNotFoundError(f"The file {doc_path} does not exist.")
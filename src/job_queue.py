@@ -0,0 +1,130 @@
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+from src.cache import CACHE_DIR, content_hash
+
+# Jobs submitted to the service, kept on disk so queued work survives a restart
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+class JobQueue:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    dedup_key TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created REAL NOT NULL,
+                    started REAL,
+                    finished REAL
+                );
+                CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+                CREATE INDEX IF NOT EXISTS jobs_dedup ON jobs (dedup_key, status);
+                CREATE TABLE IF NOT EXISTS events (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id TEXT NOT NULL,
+                    event TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS events_job ON events (job_id, seq);
+            """)
+        return self._connection
+
+    def submit(self, kind: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        # The same job submitted by several users while it is still waiting or running is only done once
+        dedup_key = content_hash(json.dumps({"kind": kind, "payload": payload}, sort_keys=True))
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                row = connection.execute(
+                    "SELECT id FROM jobs WHERE dedup_key = ? AND status IN (?, ?)", (dedup_key, QUEUED, RUNNING)
+                ).fetchone()
+                if row:
+                    job_id = row[0]
+                else:
+                    job_id = secrets.token_hex(8)
+                    connection.execute(
+                        "INSERT INTO jobs (id, kind, payload, dedup_key, status, created) VALUES (?, ?, ?, ?, ?, ?)",
+                        (job_id, kind, json.dumps(payload), dedup_key, QUEUED, time.time())
+                    )
+        return self.get(job_id)
+
+    def claim(self, kinds: Sequence[str]) -> Optional[Dict[str, Any]]:
+        placeholders = ", ".join("?" for _ in kinds)
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                row = connection.execute(
+                    f"SELECT id, kind, payload FROM jobs WHERE status = ? AND kind IN ({placeholders}) ORDER BY created LIMIT 1",
+                    (QUEUED, *kinds)
+                ).fetchone()
+                if row is None:
+                    return None
+                connection.execute("UPDATE jobs SET status = ?, started = ? WHERE id = ?", (RUNNING, time.time(), row[0]))
+        return {"id": row[0], "kind": row[1], "payload": json.loads(row[2])}
+
+    def requeue_interrupted(self) -> int:
+        # Jobs that were running when the service stopped are started again
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                cursor = connection.execute("UPDATE jobs SET status = ?, started = NULL WHERE status = ?", (QUEUED, RUNNING))
+                connection.execute("DELETE FROM events WHERE job_id IN (SELECT id FROM jobs WHERE status = ?)", (QUEUED,))
+        return cursor.rowcount
+
+    def add_event(self, job_id: str, event: Dict[str, Any]):
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("INSERT INTO events (job_id, event) VALUES (?, ?)", (job_id, json.dumps(event, default=str)))
+
+    def events(self, job_id: str, after: int = 0) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT seq, event FROM events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, after)
+            ).fetchall()
+        return [{"seq": row[0], **json.loads(row[1])} for row in rows]
+
+    def finish(self, job_id: str, result: Any = None, error: Optional[str] = None):
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute(
+                    "UPDATE jobs SET status = ?, result = ?, error = ?, finished = ? WHERE id = ?",
+                    (FAILED if error else DONE, json.dumps(result, default=str) if error is None else None, error, time.time(), job_id)
+                )
+
+    def get(self, job_id: str, with_result: bool = False) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT id, kind, payload, status, error, created, started, finished, result FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = {"id": row[0], "kind": row[1], "payload": json.loads(row[2]), "status": row[3], "error": row[4],
+               "created": row[5], "started": row[6], "finished": row[7]}
+        if with_result:
+            job["result"] = json.loads(row[8]) if row[8] else None
+        return job
+
+    def jobs(self, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        query = "SELECT id FROM jobs" + (" WHERE status = ?" if status else "") + " ORDER BY created DESC LIMIT ?"
+        with self._lock:
+            rows = self._connect().execute(query, ((status, limit) if status else (limit,))).fetchall()
+        return [self.get(row[0]) for row in rows]
+
+job_queue = JobQueue(os.path.join(CACHE_DIR, "jobs.sqlite3"))
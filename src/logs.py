@@ -0,0 +1,155 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+from src.tracing import current_span
+
+LOG_LEVEL = os.getenv("CONTRACT_REVIEW_LOG_LEVEL", "INFO").upper()
+LOG_DIR = os.getenv("CONTRACT_REVIEW_LOG_DIR", "logs")
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(name)s [%(job)s] %(message)s"
+# Loggers owned by the app, library loggers (openai, httpx, qdrant) keep their own settings
+APP_LOGGERS = ("src", "gui", "benchmarks")
+
+# Payload logs (retrieved chunks, quotes, responses) are truncated and limited per label
+PAYLOAD_MAX_CHARS = 2000
+PAYLOAD_BURST = 5
+PAYLOAD_INTERVAL = 10.0
+
+class ContextFilter(logging.Filter):
+    # Runs in the emitting thread, before the record is queued, so the span is still current
+    def filter(self, record):
+        span = current_span()
+        attributes = span.attributes if span else {}
+        record.job = attributes.get("job", "-")
+        record.document = attributes.get("document", "-")
+        record.clause = attributes.get("clause", "-")
+        record.trace_id = span.trace_id if span else None
+        return True
+
+class PayloadRateLimitFilter(logging.Filter):
+    # Lets through PAYLOAD_BURST payload records per label every PAYLOAD_INTERVAL seconds
+    # and reports how many were dropped on the next one that gets through
+    def __init__(self, burst: int = PAYLOAD_BURST, interval: float = PAYLOAD_INTERVAL):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._windows: Dict[str, list] = {}
+
+    def filter(self, record):
+        label = getattr(record, "payload_label", None)
+        if label is None:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.setdefault(label, [now, 0, 0])
+            if now - window[0] > self.interval:
+                window[:] = [now, 0, window[2]]
+            if window[1] >= self.burst:
+                window[2] += 1
+                return False
+            window[1] += 1
+            suppressed, window[2] = window[2], 0
+        if suppressed:
+            record.msg = f"{record.msg} ({suppressed} similar payloads suppressed)"
+        return True
+
+class JobFileRouter(logging.Handler):
+    # Writes each record to the log file of the job run it was emitted for, if that run has one open.
+    # Runs are told apart by trace id, two runs for the same company can overlap.
+    def __init__(self):
+        super().__init__()
+        self._handlers: Dict[str, logging.Handler] = {}
+        self._handlers_lock = threading.Lock()
+
+    def open(self, trace_id: str, path: str):
+        handler = logging.FileHandler(path, encoding="utf-8")
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        with self._handlers_lock:
+            self._handlers[trace_id] = handler
+
+    def close_job(self, trace_id: str):
+        with self._handlers_lock:
+            handler = self._handlers.pop(trace_id, None)
+        if handler:
+            handler.close()
+
+    def emit(self, record):
+        with self._handlers_lock:
+            handler = self._handlers.get(getattr(record, "trace_id", None))
+        if handler:
+            handler.handle(record)
+
+class _JobLogListener(logging.handlers.QueueListener):
+    # Callables put on the queue run on the listener thread, after every record queued before them
+    def handle(self, record):
+        if callable(record):
+            record()
+            return
+        super().handle(record)
+
+_log_queue = queue.SimpleQueue()
+_listener = None
+_job_router = JobFileRouter()
+
+def configure_logging(level: Optional[str] = None):
+    # Records are only formatted and written on the listener thread, callers pay for a queue put
+    global _listener
+    if _listener is not None:
+        return
+    queue_handler = logging.handlers.QueueHandler(_log_queue)
+    queue_handler.addFilter(ContextFilter())
+    queue_handler.addFilter(PayloadRateLimitFilter())
+
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(LOG_FORMAT))
+    handlers = [console, _job_router]
+    if os.getenv("CONTRACT_REVIEW_LOG_FILE"):
+        log_file = logging.FileHandler(os.getenv("CONTRACT_REVIEW_LOG_FILE"), encoding="utf-8")
+        log_file.setFormatter(logging.Formatter(LOG_FORMAT))
+        handlers.append(log_file)
+
+    for name in APP_LOGGERS:
+        logger = logging.getLogger(name)
+        logger.setLevel(level or LOG_LEVEL)
+        logger.addHandler(queue_handler)
+        logger.propagate = False
+
+    _listener = _JobLogListener(_log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+def log_payload(logger: logging.Logger, label: str, payload: Any):
+    # Serialising is skipped entirely unless DEBUG is enabled
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    text = payload if isinstance(payload, str) else json.dumps(payload, default=str)
+    if len(text) > PAYLOAD_MAX_CHARS:
+        text = f"{text[:PAYLOAD_MAX_CHARS]}... ({len(text)} chars)"
+    logger.debug("%s: %s", label, text, extra={"payload_label": label})
+
+@contextmanager
+def job_log(job: str):
+    # Everything logged in the current trace, from any thread, also goes to
+    # logs/<job>-<timestamp>-<trace>.log. Called from inside the job's traced function.
+    span = current_span()
+    if _listener is None or span is None:
+        yield None
+        return
+    trace_id = span.trace_id
+    os.makedirs(LOG_DIR, exist_ok=True)
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", job) or "job"
+    path = os.path.join(LOG_DIR, f"{safe_name}-{time.strftime('%Y%m%d-%H%M%S')}-{trace_id[:8]}.log")
+    _job_router.open(trace_id, path)
+    try:
+        yield path
+    finally:
+        # Closed behind the job's queued records so none of them are lost
+        _log_queue.put(lambda: _job_router.close_job(trace_id))
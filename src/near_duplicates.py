@@ -0,0 +1,143 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from src.cache import CACHE_DIR
+from src.dedup import normalize_text
+from src.config import embedding_config
+from src.cpu_pool import run_cpu
+from src.embeddings import embedding_cache_key, get_cached_embedding
+
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+SHINGLE_WORDS = 5
+# Estimated Jaccard similarity above which two chunks are treated as the same text
+SIMILARITY_THRESHOLD = 0.9
+
+_PRIME = (1 << 31) - 1
+_random = np.random.RandomState(20240801)
+_A = _random.randint(1, _PRIME, size=NUM_PERMUTATIONS).astype(np.uint64)
+_B = _random.randint(0, _PRIME, size=NUM_PERMUTATIONS).astype(np.uint64)
+
+def minhash_signature(text: str) -> np.ndarray:
+    words = normalize_text(text).split()
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "little") for shingle in shingles],
+        dtype=np.uint64
+    ) % _PRIME
+    return ((np.outer(hashes, _A) + _B) % _PRIME).min(axis=0).astype(np.uint32)
+
+def minhash_signatures(texts: List[str]) -> List[np.ndarray]:
+    return [minhash_signature(text) for text in texts]
+
+def _band_buckets(signature: np.ndarray) -> List[bytes]:
+    return [signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes() for band in range(BANDS)]
+
+class NearDuplicateIndex:
+    # Locality-sensitive hashing index over every chunk embedded so far, persisted
+    # across jobs so near-identical text from template T&Cs and document revisions
+    # can reuse the embedding of the first copy
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            # Entries used to be keyed by id alone, which kept text from being indexed again under a new model
+            columns = {row[1]: row[5] for row in self._connection.execute("PRAGMA table_info(entries)")}
+            if columns and not columns["model"]:
+                self._connection.executescript("""
+                    BEGIN;
+                    ALTER TABLE entries RENAME TO entries_by_id;
+                    CREATE TABLE entries (
+                        id TEXT NOT NULL,
+                        model TEXT NOT NULL,
+                        embedding_key TEXT NOT NULL,
+                        signature BLOB NOT NULL,
+                        PRIMARY KEY (id, model)
+                    );
+                    INSERT INTO entries SELECT id, model, embedding_key, signature FROM entries_by_id;
+                    DROP TABLE entries_by_id;
+                    COMMIT;
+                """)
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    id TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    embedding_key TEXT NOT NULL,
+                    signature BLOB NOT NULL,
+                    PRIMARY KEY (id, model)
+                );
+                CREATE TABLE IF NOT EXISTS bands (
+                    band INTEGER NOT NULL,
+                    bucket BLOB NOT NULL,
+                    entry_id TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS bands_lookup ON bands (band, bucket);
+            """)
+        return self._connection
+
+    def find(self, signature: np.ndarray, model: str) -> Optional[Tuple[str, str, float]]:
+        with self._lock:
+            connection = self._connect()
+            candidates = set()
+            for band, bucket in enumerate(_band_buckets(signature)):
+                rows = connection.execute("SELECT entry_id FROM bands WHERE band = ? AND bucket = ?", (band, bucket))
+                candidates.update(row[0] for row in rows)
+
+            best = None
+            for entry_id in candidates:
+                row = connection.execute(
+                    "SELECT embedding_key, signature FROM entries WHERE id = ? AND model = ?", (entry_id, model)
+                ).fetchone()
+                if row is None:
+                    continue
+                similarity = float(np.mean(np.frombuffer(row[1], dtype=np.uint32) == signature))
+                if similarity >= SIMILARITY_THRESHOLD and (best is None or similarity > best[2]):
+                    best = (entry_id, row[0], similarity)
+            return best
+
+    def add(self, entry_id: str, signature: np.ndarray, model: str, embedding_key: str):
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                # The bands depend only on the text, an id already indexed under another model has them
+                indexed = connection.execute("SELECT 1 FROM entries WHERE id = ?", (entry_id,)).fetchone()
+                cursor = connection.execute(
+                    "INSERT OR IGNORE INTO entries (id, model, embedding_key, signature) VALUES (?, ?, ?, ?)",
+                    (entry_id, model, embedding_key, signature.tobytes())
+                )
+                if cursor.rowcount and indexed is None:
+                    connection.executemany(
+                        "INSERT INTO bands (band, bucket, entry_id) VALUES (?, ?, ?)",
+                        [(band, bucket, entry_id) for band, bucket in enumerate(_band_buckets(signature))]
+                    )
+
+near_duplicate_index = NearDuplicateIndex(os.path.join(CACHE_DIR, "near_duplicates.sqlite3"))
+
+def reuse_known_embeddings(payloads: List[Dict]) -> Tuple[List[Optional[np.ndarray]], List[np.ndarray]]:
+    # Returns the embedding of a previously seen near-identical chunk where there is one.
+    # Every payload gets a canonical_id: the first chunk of its near-duplicate family.
+    embeddings = []
+    signatures = run_cpu(minhash_signatures, [payload["content"] for payload in payloads])
+    for payload, signature in zip(payloads, signatures):
+        metadata = payload["metadata"]
+        match = near_duplicate_index.find(signature, embedding_config.tag)
+        embedding = get_cached_embedding(match[1]) if match else None
+        metadata["canonical_id"] = match[0] if embedding is not None else metadata["content_hash"]
+        embeddings.append(embedding)
+    return embeddings, signatures
+
+def remember_chunks(payloads: List[Dict], signatures: List[np.ndarray]):
+    for payload, signature in zip(payloads, signatures):
+        metadata = payload["metadata"]
+        if metadata["canonical_id"] == metadata["content_hash"]:
+            near_duplicate_index.add(metadata["content_hash"], signature, embedding_config.tag,
+                                     embedding_cache_key(payload["content"]))
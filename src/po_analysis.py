@@ -1,15 +1,15 @@
 from pydantic import BaseModel
 from typing import List
-from openai import OpenAI
-import os
-
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from src.clients import get_openai_client
+from src.tracing import traced
+from src.usage import record_chat
 
 class POAnalysisResponse(BaseModel):
     all_invoked: bool
     clause_identifiers: List[str]
     requirements: List[str]
 
+@traced("review_po")
 def review_po(content: str) -> POAnalysisResponse:
     prompt = f"""
     Analyse this purchase order carefully and determine the following:
@@ -60,13 +60,15 @@ def review_po(content: str) -> POAnalysisResponse:
     {content}
     """
 
-    response = openai_client.beta.chat.completions.parse(
+    messages = [
+        {"role": "system", "content": "You are a legal expert analyzing contract clauses."},
+        {"role": "user", "content": prompt}
+    ]
+    response = get_openai_client().beta.chat.completions.parse(
         model="gpt-4o-2024-08-06",
-        messages=[
-            {"role": "system", "content": "You are a legal expert analyzing contract clauses."},
-            {"role": "user", "content": prompt}
-        ],
+        messages=messages,
         response_format=POAnalysisResponse
     )
+    record_chat("po_analysis", "gpt-4o-2024-08-06", messages, response)
 
     return response.choices[0].message.parsed
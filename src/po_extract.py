@@ -1,15 +1,24 @@
-import os
-from dotenv import load_dotenv
-from openai import OpenAI
+import concurrent.futures
 import json
+import logging
+from src.cache import content_hash, read_json, write_json
+from src.clients import get_openai_client
 from src.get_formatted_text import get_formatted_text
-from typing import List, Dict
+from src.usage import job_usage, record_chat, record_cache_hits
+from src.progress import ProgressCallback, report, reporting_to
+from src.tracing import current_span, traced, with_current_context
+from typing import Iterator, List, Dict, NamedTuple, Optional
+import os
+
+logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
+# Files parsed and analysed at the same time, one LlamaParse upload and one gpt-4o request each at most
+PO_EXTRACTION_WORKERS = int(os.getenv("CONTRACT_REVIEW_PO_EXTRACTION_WORKERS", "4"))
 
-# Set up OpenAI client
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+class ExtractionOutcome(NamedTuple):
+    file_path: str
+    result: Optional[Dict]
+    error: Optional[Exception]
 
 def analyze_for_referenced_documents(markdown_text):
     prompt = f"""
@@ -33,23 +42,33 @@ def analyze_for_referenced_documents(markdown_text):
     {markdown_text}  
     """
 
-    response = openai_client.chat.completions.create(
+    messages = [
+        {"role": "system", "content": "You are an expert at analyzing purchase orders and identifying referenced documents."},
+        {"role": "user", "content": prompt}
+    ]
+    response = get_openai_client().chat.completions.create(
         model="gpt-4o-2024-08-06",
         response_format={"type": "json_object"},
-        messages=[
-            {"role": "system", "content": "You are an expert at analyzing purchase orders and identifying referenced documents."},
-            {"role": "user", "content": prompt}
-        ]
+        messages=messages
     )
+    record_chat("po_extraction", "gpt-4o-2024-08-06", messages, response)
 
     return json.loads(response.choices[0].message.content)
 
+@traced("process_purchase_order", attributes=lambda args: {"document": os.path.basename(args["file_path"])})
 def process_purchase_order(file_path: str) -> Dict:
-    # Get formatted text using the method from get_formatted_text.py
+    # Get formatted text using the method from get_formatted_text.py, parsed pages are cached
     markdown_text = get_formatted_text(file_path)
+    report("parsed", document=os.path.basename(file_path), characters=len(markdown_text))
 
-    # Analyze for referenced documents
-    analysis = analyze_for_referenced_documents(markdown_text)
+    # The same PO text always gets the same answer, so it is only analysed once
+    analysis_key = content_hash(markdown_text)
+    analysis = read_json("po_references", analysis_key)
+    if analysis is not None:
+        record_cache_hits("po_extraction", 1)
+    else:
+        analysis = analyze_for_referenced_documents(markdown_text)
+        write_json("po_references", analysis_key, analysis)
 
     return {
         "file_path": file_path,
@@ -57,13 +76,42 @@ def process_purchase_order(file_path: str) -> Dict:
         "referenced_documents": analysis["referenced_documents"]
     }
 
-def process_multiple_purchase_orders(file_paths: List[str]) -> List[Dict]:
-    results = []
-    for file_path in file_paths:
-        try:
-            result = process_purchase_order(file_path)
-            results.append(result)
-        except Exception as e:
-            print(f"Error processing {file_path}: {str(e)}")
-    return results
+def extract_purchase_orders(file_paths: List[str], max_workers: int = PO_EXTRACTION_WORKERS) -> Iterator[ExtractionOutcome]:
+    # Yields each file as soon as it is done, in whatever order they finish. Parsing of one
+    # file overlaps the analysis of another. Files not started yet are dropped if the caller
+    # stops iterating.
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="po-extract")
+    try:
+        futures = {executor.submit(with_current_context(process_purchase_order), file_path): file_path
+                   for file_path in file_paths}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                yield ExtractionOutcome(futures[future], future.result(), None)
+            except Exception as e:
+                logger.error("Error processing %s: %s", futures[future], str(e))
+                yield ExtractionOutcome(futures[future], None, e)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+@traced("po_extraction", attributes=lambda args: {"job": "po_extraction"})
+def process_multiple_purchase_orders(file_paths: List[str], progress: Optional[ProgressCallback] = None,
+                                     max_workers: int = PO_EXTRACTION_WORKERS) -> List[Dict]:
+    results = {}
+    try:
+        with reporting_to(progress):
+            report("started", 0, len(file_paths))
+            for done, outcome in enumerate(extract_purchase_orders(file_paths, max_workers), 1):
+                document = os.path.basename(outcome.file_path)
+                if outcome.error is None:
+                    results[outcome.file_path] = outcome.result
+                    report("document_done", done, len(file_paths), document=document, result=outcome.result)
+                else:
+                    report("document_failed", done, len(file_paths), document=document, error=str(outcome.error))
+            report("completed", len(file_paths), len(file_paths))
+    finally:
+        # Every file's calls are made under this trace, they go to the ledger as one extraction
+        usage = job_usage(current_span().trace_id, "po_extraction")
+        logger.info("Usage for PO extraction of %d file(s): %s", len(file_paths), usage['totals'])
+    # Returned in the order the files were given
+    return [results[file_path] for file_path in file_paths if file_path in results]
 
@@ -0,0 +1,42 @@
+import contextvars
+import logging
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+from src.tracing import current_span
+
+logger = logging.getLogger(__name__)
+
+# Called with one event dict per step of a job, from whichever thread did the work:
+#   {"job", "document", "stage", "current", "total", ...stage specific fields}
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+_callback = contextvars.ContextVar("progress_callback", default=None)
+
+@contextmanager
+def reporting_to(callback: Optional[ProgressCallback]):
+    # Work started inside the block, including threads started with with_current_context,
+    # reports to callback
+    token = _callback.set(callback)
+    try:
+        yield
+    finally:
+        _callback.reset(token)
+
+def report(stage: str, current: int = None, total: int = None, **fields):
+    callback = _callback.get()
+    if callback is None:
+        return
+    attributes = current_span().attributes if current_span() else {}
+    event = {
+        "job": attributes.get("job"),
+        "document": attributes.get("document"),
+        "stage": stage,
+        "current": current,
+        "total": total,
+        **fields,
+    }
+    try:
+        callback(event)
+    except Exception:
+        # A broken listener must not fail the job
+        logger.exception("Progress callback failed for %s", stage)
@@ -1,29 +1,68 @@
 from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, Distance, PointStruct
+from qdrant_client.models import (VectorParams, Distance, PointStruct, ScalarQuantization, ScalarQuantizationConfig,
+                                  ScalarType, SearchParams, QuantizationSearchParams, Filter, FieldCondition, MatchAny,
+                                  PayloadSchemaType)
 import os
-from typing import List, Dict
+import uuid
+import logging
+import numpy as np
+from typing import Iterator, List, Dict, Optional
 from tenacity import retry, stop_after_attempt, wait_exponential
-from openai import OpenAI
-import tiktoken
+from src.clients import get_openai_client, get_qdrant_client
+from src.config import embedding_config
+from src.embeddings import embed_query
+from src.tracing import traced
+from src.usage import record_chat, record_cache_hits
+from src.answer_cache import answer_cache, collection_fingerprint, CachedAnswer, ANSWER_REUSE_THRESHOLD
 
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-embedding_model_name = "text-embedding-3-small"
+logger = logging.getLogger(__name__)
 
-def initialize_qdrant(collection_name: str, vector_size: int):
-    client = QdrantClient(
-        url="https://50238ac6-e670-42be-933e-c836f812c16e.europe-west3-0.gcp.cloud.qdrant.io", 
-        api_key=os.getenv("QDRANT_API_KEY"),
-    )
+# "int8" keeps a scalar-quantized copy of every vector in RAM and searches that first,
+# the original float32 vectors are only read to rescore the candidates
+QUANTIZATION = os.getenv("CONTRACT_REVIEW_QUANTIZATION", "none")
+RESCORE_OVERSAMPLING = 2.0
+# Loaded by hand rather than by reviews, so they can't be rebuilt after an embedding change
+HAND_LOADED_COLLECTIONS = ("po_clauses",)
+
+SEARCH_PARAMS = SearchParams(quantization=QuantizationSearchParams(rescore=True, oversampling=RESCORE_OVERSAMPLING))
+
+def quantization_config(quantization: str):
+    if quantization == "int8":
+        return ScalarQuantization(scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True))
+    return None
+
+def initialize_qdrant(collection_name: str, vector_size: int = None, quantization: str = QUANTIZATION):
+    client = get_qdrant_client()
+    vector_size = vector_size or embedding_config.dimensions
     
     collections = client.get_collections().collections
-    if not any(collection.name == collection_name for collection in collections):
+    exists = any(collection.name == collection_name for collection in collections)
+    if exists:
+        current_size = client.get_collection(collection_name).config.params.vectors.size
+        if current_size != vector_size and collection_name in HAND_LOADED_COLLECTIONS:
+            raise ValueError(
+                f"Collection {collection_name} holds {current_size}-dimension vectors but {embedding_config.tag} "
+                f"produces {vector_size}. Delete or re-ingest the collection, or restore the previous embedding settings."
+            )
+        if current_size != vector_size:
+            # Vectors of another size can't be searched with the configured model. Corpus records are keyed
+            # by the model and check their points are still there, so documents are embedded again when next reviewed.
+            logger.warning("Recreating %s for %d-dimension vectors, it held %d-dimension vectors", collection_name, vector_size, current_size)
+            client.delete_collection(collection_name)
+            exists = False
+    if not exists:
         client.create_collection(
             collection_name=collection_name,
             vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE),
+            quantization_config=quantization_config(quantization),
         )
+    # Clause searches are filtered to the chunks of one job, collections created before the filter get the index too
+    if "metadata.content_hash" not in (client.get_collection(collection_name).payload_schema or {}):
+        client.create_payload_index(collection_name, "metadata.content_hash", PayloadSchemaType.KEYWORD)
     return client
 
 @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+@traced("upsert", attributes=lambda args: {"points": len(args["batch"])})
 def upsert_with_retry(client, collection_name, batch):
     try:
         client.upsert(
@@ -31,19 +70,20 @@ def upsert_with_retry(client, collection_name, batch):
             points=batch
         )
     except Exception as e:
-        print(f"Error during upsert: {str(e)}")
+        logger.warning("Error during upsert: %s", str(e))
         raise
 
+def point_id(content_hash: str) -> str:
+    # Same text always maps to the same point, so re-running a job overwrites instead of piling up
+    return str(uuid.UUID(content_hash[:32]))
+
 def store_embeddings_in_qdrant(client: QdrantClient, collection_name: str, chunks: List[Dict], embeddings: List[List[float]]):
     points = []
-    for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
+    for payload, embedding in zip(chunks, embeddings):
         points.append(PointStruct(
-            id=i,
-            vector=embedding,
-            payload={
-                "content": chunk["page_content"],
-                "metadata": chunk["metadata"]
-            }
+            id=point_id(payload["metadata"]["content_hash"]),
+            vector=embedding.tolist() if isinstance(embedding, np.ndarray) else embedding,
+            payload=payload
         ))
     
     batch_size = 100
@@ -52,17 +92,57 @@ def store_embeddings_in_qdrant(client: QdrantClient, collection_name: str, chunk
         try:
             upsert_with_retry(client, collection_name, batch)
         except Exception as e:
-            print(f"Failed to upload batch {i//batch_size + 1} after multiple retries: {str(e)}")
+            logger.error("Failed to upload batch %d after multiple retries: %s", i//batch_size + 1, str(e))
+    if points:
+        # Cached chat answers were given without these documents
+        answer_cache.bump_generation(collection_name)
+
+def retrieve_points(client: QdrantClient, collection_name: str, ids: List[str]):
+    payloads = []
+    vectors = []
+    for i in range(0, len(ids), 100):
+        for point in client.retrieve(collection_name=collection_name, ids=ids[i:i+100], with_payload=True, with_vectors=True):
+            payloads.append(point.payload)
+            vectors.append(point.vector)
+    return payloads, vectors
 
-def query_qdrant_for_clauses(client: QdrantClient, collection_name: str, clause: str, description: str, top_k: int = 10) -> List[Dict]:
+# Ground truth for recall, "exact" alone may still read the quantized vectors
+EXACT_SEARCH_PARAMS = SearchParams(exact=True, quantization=QuantizationSearchParams(ignore=True))
+
+def measure_quantization_recall(client: QdrantClient, collection_name: str, query_vectors: List[List[float]], top_k: int = 10) -> Dict[str, float]:
+    # Recall@k of quantized search against exact full-precision search, with and without rescoring
+    modes = {
+        "quantized": SearchParams(quantization=QuantizationSearchParams(rescore=False)),
+        "quantized_rescored": SEARCH_PARAMS,
+    }
+    hits = {mode: 0 for mode in modes}
+    total = 0
+    for query_vector in query_vectors:
+        exact = client.search(collection_name=collection_name, query_vector=query_vector, limit=top_k,
+                              search_params=EXACT_SEARCH_PARAMS)
+        expected = {hit.id for hit in exact}
+        total += len(expected)
+        for mode, params in modes.items():
+            found = client.search(collection_name=collection_name, query_vector=query_vector, limit=top_k, search_params=params)
+            hits[mode] += len(expected & {hit.id for hit in found})
+    return {mode: hits[mode] / total if total else 1.0 for mode in modes}
+
+def content_hash_filter(content_hashes: List[str]) -> Filter:
+    return Filter(must=[FieldCondition(key="metadata.content_hash", match=MatchAny(any=sorted(set(content_hashes))))])
+
+@traced("query_qdrant_for_clauses", attributes=lambda args: {"clause": args["clause"]})
+def query_qdrant_for_clauses(client: QdrantClient, collection_name: str, clause: str, description: str, top_k: int = 10,
+                             content_hashes: Optional[List[str]] = None) -> List[Dict]:
     query = f"{clause}: {description}"
     
-    query_vector = openai_client.embeddings.create(input=query, model=embedding_model_name).data[0].embedding
+    query_vector = embed_query(query)
 
     search_result = client.search(
         collection_name=collection_name,
         query_vector=query_vector,
-        limit=top_k
+        query_filter=content_hash_filter(content_hashes) if content_hashes is not None else None,
+        limit=top_k,
+        search_params=SEARCH_PARAMS
     )
     return [
         {
@@ -72,15 +152,14 @@ def query_qdrant_for_clauses(client: QdrantClient, collection_name: str, clause:
         for hit in search_result
     ]
 
-def get_ai_response(client: QdrantClient, collection_name: str, query: str, max_tokens: int = 1000) -> str:
-    # Embed the query
-    query_vector = openai_client.embeddings.create(input=query, model=embedding_model_name).data[0].embedding
-
+def build_chat_messages(client: QdrantClient, collection_name: str, query: str, query_vector: List[float],
+                        related: CachedAnswer = None) -> List[Dict]:
     # Search Qdrant for top 10 results
     search_result = client.search(
         collection_name=collection_name,
         query_vector=query_vector,
-        limit=10
+        limit=10,
+        search_params=SEARCH_PARAMS
     )
 
     # Prepare context from search results
@@ -88,19 +167,72 @@ def get_ai_response(client: QdrantClient, collection_name: str, query: str, max_
 
     # Prepare the prompt for OpenAI
     prompt = f"Context:\n{context}\n\nQuery: {query}\n\nAnswer:"
+    if related:
+        prompt = (f"A similar question was answered earlier from the same documents.\n"
+                  f"Earlier question: {related.query}\nEarlier answer: {related.answer}\n\n{prompt}")
 
+    return [
+        {"role": "system", "content": "You are a helpful assistant who is an expert in contract law and aerospace engineering." 
+         "Provide a concise answer to the query based on the given context. "
+         "Please provide quotes from the context that support your answer only if absolutely necessary and make sure to shorten the quotes as much as possible."},
+        {"role": "user", "content": prompt}
+    ]
+
+def find_cached_answer(client: QdrantClient, collection_name: str, query: str):
+    # Returns the query vector, the collection fingerprint and the closest earlier answer, if any
+    query_vector = embed_query(query)
+    fingerprint = collection_fingerprint(client, collection_name)
+    return query_vector, fingerprint, answer_cache.find(collection_name, fingerprint, query_vector)
+
+def get_ai_response(client: QdrantClient, collection_name: str, query: str, max_tokens: int = 1000) -> str:
+    query_vector, fingerprint, cached = find_cached_answer(client, collection_name, query)
+    if cached and cached.similarity >= ANSWER_REUSE_THRESHOLD:
+        record_cache_hits("chat", 1)
+        return cached.answer
+    messages = build_chat_messages(client, collection_name, query, query_vector, cached)
 
     # Get response from OpenAI
-    response = openai_client.chat.completions.create(
+    response = get_openai_client().chat.completions.create(
         model="gpt-4o-2024-08-06",
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant who is an expert in contract law and aerospace engineering." 
-             "Provide a concise answer to the query based on the given context. "
-             "Please provide quotes from the context that support your answer only if absolutely necessary and make sure to shorten the quotes as much as possible."},
-            {"role": "user", "content": prompt}
-        ],
+        messages=messages,
         # max_tokens=max_tokens,
         temperature=0,
     )
+    record_chat("chat", "gpt-4o-2024-08-06", messages, response)
 
-    return response.choices[0].message.content.strip()
+    answer = response.choices[0].message.content.strip()
+    answer_cache.add(collection_name, fingerprint, query, query_vector, answer)
+    return answer
+
+def stream_ai_response(client: QdrantClient, collection_name: str, query: str) -> Iterator[str]:
+    # Yields the answer as it is generated. Closing the generator early stops the stream.
+    query_vector, fingerprint, cached = find_cached_answer(client, collection_name, query)
+    if cached and cached.similarity >= ANSWER_REUSE_THRESHOLD:
+        record_cache_hits("chat", 1)
+        yield cached.answer
+        return
+    messages = build_chat_messages(client, collection_name, query, query_vector, cached)
+    stream = get_openai_client().chat.completions.create(
+        model="gpt-4o-2024-08-06",
+        messages=messages,
+        temperature=0,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    completion = []
+    usage_chunk = None
+    try:
+        for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                usage_chunk = chunk
+            if chunk.choices and chunk.choices[0].delta.content:
+                completion.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+    finally:
+        # A cancelled answer is still billed for the tokens generated so far
+        record_chat("chat", "gpt-4o-2024-08-06", messages, usage_chunk, completion="".join(completion))
+        close = getattr(stream, "close", None)
+        if close:
+            close()
+    # Only complete answers are reused
+    answer_cache.add(collection_name, fingerprint, query, query_vector, "".join(completion).strip())
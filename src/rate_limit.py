@@ -0,0 +1,25 @@
+import multiprocessing
+import os
+import time
+
+# OpenAI requests per minute allowed across all workers of a batch or the service
+DEFAULT_REQUESTS_PER_MINUTE = int(os.getenv("CONTRACT_REVIEW_OPENAI_RPM", "500"))
+
+class SharedRateLimiter:
+    # Request budget shared by every process it is handed to when they are started.
+    # Each request reserves the next free slot, slots are 60 / requests_per_minute
+    # seconds apart, and up to `burst` requests may go out at once after a quiet spell.
+    def __init__(self, requests_per_minute: int, burst: int = 10, context=None):
+        context = context or multiprocessing.get_context()
+        self.interval = 60.0 / requests_per_minute
+        self.burst = max(1, burst)
+        self._lock = context.Lock()
+        self._next = context.Value("d", 0.0, lock=False)
+
+    def acquire(self):
+        with self._lock:
+            now = time.time()
+            slot = max(self._next.value, now - self.interval * (self.burst - 1))
+            self._next.value = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
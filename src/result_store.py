@@ -0,0 +1,100 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+from src.cache import CACHE_DIR, content_hash
+from src.config import embedding_config
+
+# Bump when the pipeline starts deciding differently, so runs stored by an older
+# version are no longer handed back for new submissions
+RESULT_VERSION = 1
+
+def review_input_key(company_name: str, file_hashes: List[str], clauses: Dict) -> str:
+    # Identical documents reviewed against identical clauses give the same report
+    return content_hash(json.dumps({
+        "version": RESULT_VERSION,
+        "company": company_name,
+        "files": sorted(file_hashes),
+        "clauses": clauses,
+        "embedding_model": embedding_config.tag,
+    }, sort_keys=True))
+
+class StoredRun(NamedTuple):
+    id: int
+    company_name: str
+    created: float
+    file_names: List[str]
+    invoked: int
+
+class ResultStore:
+    # One row per finished job run, summary columns for browsing and the full result as JSON
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    company TEXT NOT NULL,
+                    input_key TEXT NOT NULL,
+                    file_hashes TEXT NOT NULL,
+                    file_names TEXT NOT NULL,
+                    invoked INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    result TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS runs_input ON runs (input_key);
+            """)
+        return self._connection
+
+    @staticmethod
+    def _with_run(run_id: int, created: float, file_hashes: List[str], file_names: List[str], result: Dict[str, Any]) -> Dict[str, Any]:
+        return {**result, "run": {"id": run_id, "created": created, "file_hashes": file_hashes, "file_names": file_names}}
+
+    def _from_row(self, row) -> Dict[str, Any]:
+        return self._with_run(row[0], row[1], json.loads(row[2]), json.loads(row[3]), json.loads(row[4]))
+
+    def save(self, company_name: str, input_key: str, file_paths: List[str], file_hashes: List[str], result: Dict[str, Any]) -> Dict[str, Any]:
+        created = time.time()
+        file_names = [os.path.basename(path) for path in file_paths]
+        result = {key: value for key, value in result.items() if key != "run"}
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                cursor = connection.execute(
+                    "INSERT INTO runs (company, input_key, file_hashes, file_names, invoked, created, result) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (company_name, input_key, json.dumps(file_hashes), json.dumps(file_names),
+                     len(result.get("clause_analysis", [])), created, json.dumps(result))
+                )
+        return self._with_run(cursor.lastrowid, created, file_hashes, file_names, result)
+
+    def find(self, input_key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT id, created, file_hashes, file_names, result FROM runs WHERE input_key = ? ORDER BY created DESC LIMIT 1",
+                (input_key,)
+            ).fetchone()
+        return self._from_row(row) if row else None
+
+    def load(self, run_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT id, created, file_hashes, file_names, result FROM runs WHERE id = ?", (run_id,)
+            ).fetchone()
+        return self._from_row(row) if row else None
+
+    def runs(self, limit: int = 200) -> List[StoredRun]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT id, company, created, file_names, invoked FROM runs ORDER BY created DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [StoredRun(row[0], row[1], row[2], json.loads(row[3]), row[4]) for row in rows]
+
+result_store = ResultStore(os.path.join(CACHE_DIR, "results.sqlite3"))
@@ -1,72 +1,82 @@
-from src.document_processing import process_document
-from src.po_analysis import review_po
-from src.clause_analysis import analyze_clauses_batch
-from src.qdrant_operations import initialize_qdrant, store_embeddings_in_qdrant, query_qdrant_for_clauses
+from src.document_processing import process_document, embed_failed_chunks
+from src.dedup import JobChunkIndex, normalize_text
+from src.po_analysis import review_po, POAnalysisResponse
+from src.corpus import document_hash, load_corpus_record, save_corpus_record, attach_corpus_document
+from src.clause_analysis import analyze_clauses_batch, ClauseAnalysisResponse
+from src.qdrant_operations import initialize_qdrant, store_embeddings_in_qdrant, query_qdrant_for_clauses, content_hash_filter
 from src.utils import load_notable_clauses
+from src.cache import content_hash, read_json, write_json
+from src.clients import get_openai_client
+from src.tracing import traced, current_span, job_timings, with_current_context
+from src.usage import job_usage, record_cache_hits
+from src.logs import job_log, log_payload
+from src.progress import ProgressCallback, report, reporting_to
+from src.result_store import result_store, review_input_key
 import concurrent.futures
+import threading
 import asyncio
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 import json
+import logging
 import os
-from openai import OpenAI
 
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+logger = logging.getLogger(__name__)
 
-def review_documents(file_paths: List[str], company_name: str) -> Dict[str, Any]:
-    print(f"Clause Analysis for {company_name}\n")
+def clause_decision_key(clause_id: str, clause_info: Dict, clause_results: List[Dict], all_invoked: bool, invoked_clauses: List[str]) -> str:
+    # Retrieved chunks are identified by their exact text. canonical_id only decides embedding reuse,
+    # a near-duplicate revision ("shall" to "shall not") must not get the old decision and its quotes.
+    retrieved = sorted(
+        (result["metadata"].get("content_hash") or content_hash(normalize_text(result["content"])), result["metadata"].get("document_type", ""))
+        for result in clause_results
+    )
+    return content_hash(json.dumps({
+        "clause": clause_id,
+        "description": clause_info["Description"],
+        "examples": clause_info["Examples"],
+        "retrieved": retrieved,
+        "all_invoked": all_invoked,
+        "invoked_clauses": invoked_clauses
+    }, sort_keys=True))
 
-    print(f"[DEBUG] Starting review for company: {company_name}")
-    print(f"[DEBUG] Files to process: {file_paths}")
+def clause_hashes(notable_clauses: Dict) -> Dict[str, str]:
+    # Stored with each result so a later re-review knows which clauses were added or edited
+    return {clause_id: content_hash(json.dumps(clause_info, sort_keys=True)) for clause_id, clause_info in notable_clauses.items()}
 
-    collection_name = f"{company_name}"
-    vector_size = 1536  # Size for text-embedding-3-small
-    qdrant_client = initialize_qdrant(collection_name, vector_size)
-    print(f"[DEBUG] Initialized Qdrant collection: {collection_name}")
+def analyze_notable_clauses(qdrant_client, collection_name: str, notable_clauses: Dict, all_invoked: bool,
+                            invoked_clauses: List[str], content_hashes: List[str]) -> Tuple[List[Dict], List[str]]:
+    # Returns the invoked clauses and the ids of clauses that could not be analysed
+    # Clauses finish on the analysis threads in any order, each one is reported with its result
+    clauses_done = []
+    clauses_lock = threading.Lock()
 
-    all_chunks = []
-    all_embeddings = []
-    document_types = {}
-    po_analysis = None
-    invoked_clauses = []
-    all_invoked = False
-
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        futures = [executor.submit(process_document, file_path) for file_path in file_paths]
-        for future in concurrent.futures.as_completed(futures):
-            try:
-                file_path, doc_type, chunks, embeddings, doc_po_analysis = future.result()
-                document_types[file_path] = doc_type
-                all_chunks.extend(chunks)
-                all_embeddings.extend(embeddings)
-                
-                if doc_type == "Purchase Order" and doc_po_analysis:
-                    po_analysis = doc_po_analysis
-                    all_invoked = po_analysis.all_invoked
-                    invoked_clauses = po_analysis.clause_identifiers
-                
-                print(f"[DEBUG] Processed {file_path}: {len(chunks)} chunks created, doc_type: {doc_type}")
-                if doc_po_analysis:
-                    print(f"[DEBUG] PO Analysis for {file_path}: all_invoked={all_invoked}, invoked_clauses={invoked_clauses}")
-            except Exception as e:
-                print(f"[DEBUG] Error processing {file_path}: {str(e)}")
-
-    print(f"[DEBUG] Total chunks: {len(all_chunks)}, Total embeddings: {len(all_embeddings)}")
-    store_embeddings_in_qdrant(qdrant_client, collection_name, all_chunks, all_embeddings)
-    print(f"[DEBUG] Stored embeddings in Qdrant collection: {collection_name}")
-
-    notable_clauses = load_notable_clauses()
-    print(f"[DEBUG] Loaded notable clauses structure")
+    def clause_done(clause_id, analysis, reused=False):
+        with clauses_lock:
+            clauses_done.append(clause_id)
+            done = len(clauses_done)
+        report("clause_analysed", done, len(notable_clauses), clause=clause_id, reused=reused,
+               result=analysis.model_dump() if analysis else None)
 
     results = []
     prompts = []
+    prompt_clause_ids = []
+    decision_keys = []
+    reused_analyses = []
 
     for clause_id, clause_info in notable_clauses.items():
-        print(f"\nAnalyzing clause: {clause_id}")
-        print(f"Description: {clause_info['Description']}")
+        logger.debug("Analyzing clause: %s", clause_id)
         
-        clause_results = query_qdrant_for_clauses(qdrant_client, collection_name, clause_id, clause_info['Description'])
-        print(f"DEBUG: Clause results: {clause_results}")
-        print(f"Found {len(clause_results)} relevant text chunks for clause: {clause_id}")
+        clause_results = query_qdrant_for_clauses(qdrant_client, collection_name, clause_id, clause_info['Description'],
+                                                  content_hashes=content_hashes)
+        log_payload(logger, "Clause results", clause_results)
+        logger.debug("Found %d relevant text chunks for clause: %s", len(clause_results), clause_id)
+
+        decision_key = clause_decision_key(clause_id, clause_info, clause_results, all_invoked, invoked_clauses)
+        previous_decision = read_json("clause_decisions", decision_key)
+        if previous_decision is not None:
+            logger.debug("Reusing previous decision for clause: %s", clause_id)
+            reused_analyses.append(ClauseAnalysisResponse(**previous_decision))
+            clause_done(clause_id, reused_analyses[-1], reused=True)
+            continue
         
         prompt = f"""
         Given the following information:
@@ -140,30 +150,240 @@ def review_documents(file_paths: List[str], company_name: str) -> Dict[str, Any]
         """
         
         prompts.append(prompt)
+        prompt_clause_ids.append(clause_id)
+        decision_keys.append(decision_key)
 
-    print(f"Sending {len(prompts)} prompts to OpenAI for clause analysis in batches")
+    logger.info("Sending %d prompts to OpenAI for clause analysis, reusing %d previous decisions", len(prompts), len(reused_analyses))
+    record_cache_hits("clause_analysis", len(reused_analyses))
     
     # Create a new event loop and run the coroutine
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
-    analyses = loop.run_until_complete(analyze_clauses_batch(openai_client, prompts))
+    analyses = loop.run_until_complete(analyze_clauses_batch(get_openai_client(), prompts, prompt_clause_ids, clause_done))
     loop.close()
+
+    for decision_key, analysis in zip(decision_keys, analyses):
+        if analysis:
+            write_json("clause_decisions", decision_key, analysis.model_dump())
     
-    for analysis in analyses:
+    for analysis in reused_analyses + list(analyses):
         if analysis and analysis.invoked == 'Yes':
             results.append(analysis.model_dump())
-            print(f"Clause {analysis.clause} is invoked. Added to results.")
+            logger.debug("Clause %s is invoked. Added to results.", analysis.clause)
         elif analysis:
-            print(f"Clause {analysis.clause} is not invoked. Skipped.")
+            logger.debug("Clause %s is not invoked. Skipped.", analysis.clause)
         else:
-            print("Failed to analyze a clause")
+            logger.warning("Failed to analyze a clause")
 
-    print(f"Review completed. Total results: {len(results)}")
+    failed_clauses = [clause_id for clause_id, analysis in zip(prompt_clause_ids, analyses) if analysis is None]
 
-   
+    return results, failed_clauses
+
+@traced("review_documents", attributes=lambda args: {"job": args["company_name"]})
+def review_documents(file_paths: List[str], company_name: str, progress: Optional[ProgressCallback] = None,
+                     reuse_stored: bool = True) -> Dict[str, Any]:
+    with job_log(company_name), reporting_to(progress):
+        try:
+            file_hashes = {file_path: document_hash(file_path) for file_path in file_paths}
+            notable_clauses = load_notable_clauses()
+            input_key = review_input_key(company_name, list(file_hashes.values()), notable_clauses)
+
+            stored = result_store.find(input_key) if reuse_stored else None
+            if stored is not None:
+                logger.info("Returning stored run %d for %s, the inputs are unchanged", stored['run']['id'], company_name)
+                result = stored
+            else:
+                result = _review_documents(file_paths, company_name, file_hashes, notable_clauses)
+                # A run with failures would be handed back for every resubmission, so it isn't kept
+                if not result["failed_documents"] and not result["failed_clauses"]:
+                    result = result_store.save(company_name, input_key, file_paths, list(file_hashes.values()), result)
+        except Exception as e:
+            report("failed", error=str(e))
+            raise
+        report("completed", result=result, stored=stored is not None)
+        return result
+
+def _review_documents(file_paths: List[str], company_name: str, file_hashes: Dict[str, str], notable_clauses: Dict) -> Dict[str, Any]:
+    logger.info("Clause analysis for %s", company_name)
+    logger.debug("Files to process: %s", file_paths)
+    report("started", 0, len(file_paths), documents=[os.path.basename(file_path) for file_path in file_paths])
+
+    collection_name = f"{company_name}"
+    qdrant_client = initialize_qdrant(collection_name)
+    logger.debug("Initialized Qdrant collection: %s", collection_name)
+
+    all_chunks = []
+    all_embeddings = []
+    document_types = {}
+    known_content = {}
+    po_analysis = None
+    invoked_clauses = []
+    all_invoked = False
+
+    chunk_index = JobChunkIndex()
+
+    # Documents already in the shared corpus attach their stored vectors instead of being ingested again
+    to_process = []
+    for file_path in file_paths:
+        record = load_corpus_record(file_hashes[file_path])
+        attached = attach_corpus_document(qdrant_client, record, chunk_index) if record else None
+        if attached is None:
+            to_process.append(file_path)
+            continue
+
+        payloads, vectors = attached
+        all_chunks.extend(payloads)
+        all_embeddings.extend(vectors)
+        document_types[file_path] = record["doc_type"]
+        known_content[file_path] = 1.0
+        if record["doc_type"] == "Purchase Order" and record["po_analysis"]:
+            po_analysis = POAnalysisResponse(**record["po_analysis"])
+            all_invoked = po_analysis.all_invoked
+            invoked_clauses = po_analysis.clause_identifiers
+        report("document_done", len(document_types), len(file_paths), document=os.path.basename(file_path),
+               doc_type=record["doc_type"], attached=True)
+        logger.info("Attached %s from shared corpus: %d chunks, doc_type: %s", file_path, len(record['content_hashes']), record['doc_type'])
+
+    processed = []
+    failed_documents = []
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        futures = {executor.submit(with_current_context(process_document), file_path, chunk_index): file_path for file_path in to_process}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                document = future.result()
+                file_path, doc_type, chunks, embeddings, doc_po_analysis, known_ratio, _ = document
+                processed.append(document)
+                document_types[file_path] = doc_type
+                known_content[file_path] = round(known_ratio, 3)
+                all_chunks.extend(chunks)
+                all_embeddings.extend(embeddings)
+                
+                if doc_type == "Purchase Order" and doc_po_analysis:
+                    po_analysis = doc_po_analysis
+                    all_invoked = po_analysis.all_invoked
+                    invoked_clauses = po_analysis.clause_identifiers
+                
+                report("document_done", len(document_types), len(file_paths), document=os.path.basename(file_path),
+                       doc_type=doc_type, attached=False)
+                logger.info("Processed %s: %d chunks created, doc_type: %s, %.0f%% already known", file_path, len(chunks), doc_type, known_ratio * 100)
+                if doc_po_analysis:
+                    logger.debug("PO Analysis for %s: all_invoked=%s, invoked_clauses=%s", file_path, all_invoked, invoked_clauses)
+            except Exception as e:
+                logger.exception("Error processing %s", futures[future])
+                failed_documents.append(os.path.basename(futures[future]))
+                report("document_failed", document=os.path.basename(futures[future]), error=str(e))
+
+    retried_chunks, retried_embeddings = embed_failed_chunks(chunk_index)
+    all_chunks.extend(retried_chunks)
+    all_embeddings.extend(retried_embeddings)
+    if chunk_index.failed:
+        # A document missing chunks would be attached incomplete by later jobs
+        incomplete = [document for document in processed if not chunk_index.failed.keys().isdisjoint(document.content_hashes)]
+        for document in incomplete:
+            logger.error("%s is missing chunks that could not be embedded", document.file_path)
+            failed_documents.append(os.path.basename(document.file_path))
+            report("document_failed", document=os.path.basename(document.file_path), error="Chunks could not be embedded")
+        processed = [document for document in processed if document not in incomplete]
+
+    logger.debug("Total chunks: %d, Total embeddings: %d, duplicates skipped: %d", len(all_chunks), len(all_embeddings), chunk_index.duplicates)
+    store_embeddings_in_qdrant(qdrant_client, collection_name, all_chunks, all_embeddings)
+    logger.debug("Stored embeddings in Qdrant collection: %s", collection_name)
+    report("stored", points=len(all_chunks))
+
+    for document in processed:
+        save_corpus_record(
+            file_hashes[document.file_path], document.doc_type,
+            document.po_analysis.model_dump() if document.po_analysis else None,
+            collection_name, document.content_hashes
+        )
+
+    # The company collection also holds chunks of earlier jobs, clauses are only matched against this job's documents
+    job_content_hashes = [payload["metadata"]["content_hash"] for payload in all_chunks]
+    results, failed_clauses = analyze_notable_clauses(qdrant_client, collection_name, notable_clauses, all_invoked,
+                                                      invoked_clauses, job_content_hashes)
+
+    logger.info("Review completed. Total results: %d", len(results))
+
+    job_span = current_span()
+    timings = {"total_seconds": round(job_span.duration, 3), "stages": job_timings(job_span.trace_id)}
+    usage = job_usage(job_span.trace_id, company_name)
+    logger.info("Usage for %s: %s", company_name, usage['totals'])
 
     return {
         "company_name": company_name,
         "po_analysis": po_analysis.model_dump() if po_analysis else None,
-        "clause_analysis": results
-    }
\ No newline at end of file
+        "clause_analysis": results,
+        "known_content": known_content,
+        "timings": timings,
+        "usage": usage,
+        "failed_documents": failed_documents,
+        "failed_clauses": failed_clauses,
+        "clause_hashes": clause_hashes(notable_clauses)
+    }
+
+def rereview_stored_run(run_id: int, progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+    # Brings a stored run up to date with notable_clauses.json, analysing only the clauses
+    # added or edited since, against the vectors already in the job's collection
+    stored = result_store.load(run_id)
+    if stored is None:
+        raise ValueError(f"No stored run with id {run_id}")
+    return _rereview(stored, stored["company_name"], progress)
+
+@traced("rereview", attributes=lambda args: {"job": args["company_name"]})
+def _rereview(stored: Dict[str, Any], company_name: str, progress: Optional[ProgressCallback]) -> Dict[str, Any]:
+    with job_log(company_name), reporting_to(progress):
+        try:
+            result = _merge_rereview(stored, company_name)
+        except Exception as e:
+            report("failed", error=str(e))
+            raise
+        report("completed", result=result)
+        return result
+
+def _merge_rereview(stored: Dict[str, Any], company_name: str) -> Dict[str, Any]:
+    notable_clauses = load_notable_clauses()
+    current_hashes = clause_hashes(notable_clauses)
+    previous_hashes = stored.get("clause_hashes", {})
+    changed = {clause_id: clause_info for clause_id, clause_info in notable_clauses.items()
+               if previous_hashes.get(clause_id) != current_hashes[clause_id]}
+    kept = [clause for clause in stored["clause_analysis"] if clause["clause"] in notable_clauses and clause["clause"] not in changed]
+    if not changed and len(kept) == len(stored["clause_analysis"]):
+        logger.info("Run %d for %s is up to date with the notable clauses", stored['run']['id'], company_name)
+        return stored
+
+    logger.info("Re-reviewing %d added or changed clauses for %s: %s", len(changed), company_name, sorted(changed))
+    report("started", 0, 0, clauses=sorted(changed))
+
+    collection_name = f"{company_name}"
+    qdrant_client = initialize_qdrant(collection_name)
+    new_results, failed_clauses = [], []
+    if changed:
+        # Clauses are matched against the run's own documents only, through their corpus records
+        records = [load_corpus_record(file_hash) for file_hash in stored["run"]["file_hashes"]]
+        if any(record is None or record["collection"] != collection_name for record in records):
+            raise ValueError(f"Not every document of run {stored['run']['id']} is in {collection_name}, the documents need a full review")
+        content_hashes = sorted({content_hash for record in records for content_hash in record["content_hashes"]})
+        if qdrant_client.count(collection_name=collection_name, count_filter=content_hash_filter(content_hashes)).count < len(content_hashes):
+            raise ValueError(f"Collection {collection_name} no longer holds every chunk of run {stored['run']['id']}, the documents need a full review")
+        po_analysis = stored["po_analysis"] or {}
+        new_results, failed_clauses = analyze_notable_clauses(
+            qdrant_client, collection_name, changed,
+            po_analysis.get("all_invoked", False), po_analysis.get("clause_identifiers", []), content_hashes
+        )
+
+    order = {clause_id: i for i, clause_id in enumerate(notable_clauses)}
+    job_span = current_span()
+    result = {key: value for key, value in stored.items() if key != "run"}
+    result.update({
+        "clause_analysis": sorted(kept + new_results, key=lambda clause: order[clause["clause"]]),
+        "clause_hashes": current_hashes,
+        "timings": {"total_seconds": round(job_span.duration, 3), "stages": job_timings(job_span.trace_id)},
+        "usage": job_usage(job_span.trace_id, company_name),
+        "failed_clauses": failed_clauses,
+        "rereview_of": stored["run"]["id"],
+        "rereviewed_clauses": sorted(changed),
+    })
+    if not failed_clauses:
+        input_key = review_input_key(company_name, stored["run"]["file_hashes"], notable_clauses)
+        result = result_store.save(company_name, input_key, stored["run"]["file_names"], stored["run"]["file_hashes"], result)
+    return result
\ No newline at end of file
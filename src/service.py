@@ -0,0 +1,325 @@
+# Local HTTP service, so several reviewers share one queue, one set of caches and
+# clients, and one OpenAI budget instead of each running the whole pipeline:
+#   python service.py --port 8765 --workers 2
+#   python service.py --host 0.0.0.0 --token <secret>    a token is required off loopback
+# Files are uploaded with the job (base64) and staged under the cache directory, the
+# service never reads paths given by a client.
+#   POST /jobs                    {"kind": "review", "company_name": ..., "files": [{"name": ..., "content": ...}]}
+#                                 {"kind": "po_extract", "files": [...]}
+#                                 {"kind": "chat", "company_name": ..., "message": ...}
+#                                 {"kind": "rereview", "run_id": ...}
+#   GET  /jobs?status=queued      latest jobs
+#   GET  /jobs/<id>               status
+#   GET  /jobs/<id>/events?after=<seq>   progress events, see src/progress.py
+#   GET  /jobs/<id>/result        200 when done, 409 while queued or running, 500 if it failed
+#   GET  /runs                    stored review runs, see src/result_store.py
+#   GET  /runs/<id>               a stored run's result
+import argparse
+import base64
+import binascii
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import signal
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List
+from urllib.parse import parse_qs, urlparse
+from src.cache import CACHE_DIR, content_hash
+from src.job_queue import DONE, FAILED, JobQueue, job_queue
+from src.logs import configure_logging
+from src.rate_limit import DEFAULT_REQUESTS_PER_MINUTE, SharedRateLimiter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = int(os.getenv("CONTRACT_REVIEW_SERVICE_PORT", "8765"))
+UPLOAD_DIR = os.path.join(CACHE_DIR, "uploads")
+# Largest request body accepted, uploads are sent base64 encoded inside it
+MAX_REQUEST_BYTES = int(os.getenv("CONTRACT_REVIEW_SERVICE_MAX_REQUEST_MB", "200")) * 1024 * 1024
+
+def stage_upload(name: str, content: bytes) -> Dict[str, str]:
+    # Stored by content hash under the file's own name, the pipeline names documents after their file
+    name = os.path.basename(name.replace("\\", "/"))
+    if not name or name.startswith("."):
+        raise ValueError(f"Invalid file name: {name!r}")
+    digest = content_hash(content)
+    path = os.path.join(UPLOAD_DIR, digest, name)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(content)
+        os.replace(temp_path, path)
+    return {"name": name, "sha256": digest}
+
+def staged_path(file: Dict[str, str]) -> str:
+    return os.path.join(UPLOAD_DIR, file["sha256"], file["name"])
+
+def _run_review(payload: Dict[str, Any], progress: Callable) -> Any:
+    from src.review import review_documents
+    return review_documents([staged_path(file) for file in payload["files"]], payload["company_name"], progress=progress)
+
+def _client_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    # Clients know their files by name, not by where the service staged them
+    return {**result, "file_path": os.path.basename(result["file_path"])}
+
+def _run_po_extract(payload: Dict[str, Any], progress: Callable) -> Any:
+    from src.po_extract import process_multiple_purchase_orders
+
+    def client_progress(event):
+        progress({**event, "result": _client_result(event["result"])} if event.get("result") else event)
+
+    results = process_multiple_purchase_orders([staged_path(file) for file in payload["files"]], progress=client_progress)
+    return [_client_result(result) for result in results]
+
+def _run_chat(payload: Dict[str, Any], progress: Callable) -> Any:
+    from src.clients import get_qdrant_client
+    from src.qdrant_operations import get_ai_response
+    return {"answer": get_ai_response(get_qdrant_client(), payload["company_name"], payload["message"])}
+
+def _run_rereview(payload: Dict[str, Any], progress: Callable) -> Any:
+    from src.review import rereview_stored_run
+    return rereview_stored_run(payload["run_id"], progress=progress)
+
+RUNNERS = {
+    "review": _run_review,
+    "po_extract": _run_po_extract,
+    "chat": _run_chat,
+    "rereview": _run_rereview,
+}
+
+REQUIRED_FIELDS = {
+    "review": ("company_name", "files"),
+    "po_extract": ("files",),
+    "chat": ("company_name", "message"),
+    "rereview": ("run_id",),
+}
+
+def _stage_files(files: Any) -> List[Dict[str, str]]:
+    if not isinstance(files, list):
+        raise ValueError("files must be a list of {name, content} objects")
+    staged = []
+    for file in files:
+        if not isinstance(file, dict) or not isinstance(file.get("name"), str) or not isinstance(file.get("content"), str):
+            raise ValueError("files must be a list of {name, content} objects")
+        try:
+            content = base64.b64decode(file["content"], validate=True)
+        except binascii.Error:
+            raise ValueError(f"The content of {file['name']} is not valid base64")
+        staged.append(stage_upload(file["name"], content))
+    return staged
+
+def _queued_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    # The final result is fetched from /result, it isn't repeated in the event log
+    if event["stage"] == "completed":
+        return {key: value for key, value in event.items() if key != "result"}
+    return event
+
+class ServiceWorkers:
+    # Review, re-review and PO extraction jobs share `workers` threads, chat has its own so a
+    # question isn't stuck behind a long review
+    def __init__(self, queue: JobQueue, workers: int = 2, chat_workers: int = 1):
+        self.queue = queue
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self.threads = [threading.Thread(target=self._work, args=(("review", "po_extract", "rereview"),), name=f"service-worker-{i}", daemon=True)
+                        for i in range(workers)]
+        self.threads += [threading.Thread(target=self._work, args=(("chat",),), name=f"service-chat-{i}", daemon=True)
+                         for i in range(chat_workers)]
+
+    def start(self):
+        requeued = self.queue.requeue_interrupted()
+        if requeued:
+            logger.info("Requeued %d jobs interrupted by the last shutdown", requeued)
+        for thread in self.threads:
+            thread.start()
+
+    def notify(self):
+        self._wakeup.set()
+
+    def stop(self):
+        self._stopping.set()
+        self._wakeup.set()
+
+    def _work(self, kinds):
+        while not self._stopping.is_set():
+            job = self.queue.claim(kinds)
+            if job is None:
+                if self._wakeup.wait(1.0):
+                    self._wakeup.clear()
+                continue
+            self._run(job)
+
+    def _run(self, job: Dict[str, Any]):
+        logger.info("Starting %s job %s", job["kind"], job["id"])
+        try:
+            result = RUNNERS[job["kind"]](job["payload"], lambda event: self.queue.add_event(job["id"], _queued_event(event)))
+        except Exception as e:
+            logger.exception("%s job %s failed", job["kind"], job["id"])
+            self.queue.finish(job["id"], error=f"{type(e).__name__}: {e}")
+            return
+        self.queue.finish(job["id"], result)
+        logger.info("Finished %s job %s", job["kind"], job["id"])
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    server_version = "ContractReview/1"
+
+    def log_message(self, format, *args):
+        logger.debug("%s " + format, self.address_string(), *args)
+
+    def _send(self, status: HTTPStatus, body: Dict[str, Any]):
+        data = json.dumps(body, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _authorized(self) -> bool:
+        token = self.server.token
+        if token is None or hmac.compare_digest(self.headers.get("Authorization", ""), f"Bearer {token}"):
+            return True
+        self._send(HTTPStatus.UNAUTHORIZED, {"error": "A valid bearer token is required"})
+        return False
+
+    def _send_runs(self, parts, query):
+        from src.result_store import result_store
+
+        if len(parts) == 1:
+            try:
+                limit = int(query.get("limit", ["200"])[0])
+            except ValueError:
+                return self._send(HTTPStatus.BAD_REQUEST, {"error": "limit must be an integer"})
+            return self._send(HTTPStatus.OK, {"runs": [run._asdict() for run in result_store.runs(limit)]})
+        if len(parts) == 2 and parts[1].isdigit():
+            result = result_store.load(int(parts[1]))
+            if result is None:
+                return self._send(HTTPStatus.NOT_FOUND, {"error": f"No run {parts[1]}"})
+            return self._send(HTTPStatus.OK, {"result": result})
+        return self._send(HTTPStatus.NOT_FOUND, {"error": f"No route for /{'/'.join(parts)}"})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = [part for part in url.path.split("/") if part]
+        queue = self.server.queue
+
+        if parts == ["health"]:
+            return self._send(HTTPStatus.OK, {"status": "ok"})
+        if not self._authorized():
+            return
+        if parts[:1] == ["runs"]:
+            return self._send_runs(parts, query)
+        if parts == ["jobs"]:
+            return self._send(HTTPStatus.OK, {"jobs": queue.jobs(query.get("status", [None])[0])})
+        if len(parts) < 2 or parts[0] != "jobs" or parts[2:] not in ([], ["events"], ["result"]):
+            return self._send(HTTPStatus.NOT_FOUND, {"error": f"No route for {url.path}"})
+
+        job = queue.get(parts[1], with_result=parts[2:] == ["result"])
+        if job is None:
+            return self._send(HTTPStatus.NOT_FOUND, {"error": f"No job {parts[1]}"})
+        if parts[2:] == ["events"]:
+            try:
+                after = int(query.get("after", ["0"])[0])
+            except ValueError:
+                return self._send(HTTPStatus.BAD_REQUEST, {"error": "after must be an integer"})
+            return self._send(HTTPStatus.OK, {"events": queue.events(job["id"], after)})
+        if parts[2:] == ["result"]:
+            if job["status"] == DONE:
+                return self._send(HTTPStatus.OK, {"id": job["id"], "result": job["result"]})
+            if job["status"] == FAILED:
+                return self._send(HTTPStatus.INTERNAL_SERVER_ERROR, {"id": job["id"], "error": job["error"]})
+            return self._send(HTTPStatus.CONFLICT, {"id": job["id"], "status": job["status"]})
+        return self._send(HTTPStatus.OK, job)
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        if urlparse(self.path).path.rstrip("/") != "/jobs":
+            return self._send(HTTPStatus.NOT_FOUND, {"error": f"No route for {self.path}"})
+        length = int(self.headers.get("Content-Length", 0))
+        if length > MAX_REQUEST_BYTES:
+            self.close_connection = True
+            return self._send(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": f"Requests are limited to {MAX_REQUEST_BYTES} bytes"})
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._send(HTTPStatus.BAD_REQUEST, {"error": "The body must be JSON"})
+        if not isinstance(body, dict):
+            return self._send(HTTPStatus.BAD_REQUEST, {"error": "The body must be a JSON object"})
+
+        kind = body.pop("kind", None)
+        if kind not in RUNNERS:
+            return self._send(HTTPStatus.BAD_REQUEST, {"error": f"kind must be one of {', '.join(RUNNERS)}"})
+        missing = [field for field in REQUIRED_FIELDS[kind] if not body.get(field)]
+        if missing:
+            return self._send(HTTPStatus.BAD_REQUEST, {"error": f"Missing {', '.join(missing)}"})
+        if kind == "rereview" and not isinstance(body["run_id"], int):
+            return self._send(HTTPStatus.BAD_REQUEST, {"error": "run_id must be an integer"})
+        if "files" in body:
+            try:
+                body["files"] = _stage_files(body["files"])
+            except ValueError as e:
+                return self._send(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+
+        job = self.server.queue.submit(kind, body)
+        self.server.workers.notify()
+        return self._send(HTTPStatus.ACCEPTED, job)
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+class ReviewService(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, queue: JobQueue, workers: ServiceWorkers, token: str = None):
+        super().__init__(address, ServiceHandler)
+        self.queue = queue
+        self.workers = workers
+        self.token = token
+
+def is_loopback(host: str) -> bool:
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return host == "localhost"
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve review, PO extraction and chat jobs over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=2, help="Review and PO extraction jobs run at the same time")
+    parser.add_argument("--chat-workers", type=int, default=1)
+    parser.add_argument("--requests-per-minute", type=int, default=DEFAULT_REQUESTS_PER_MINUTE,
+                        help="OpenAI request budget shared by all jobs, 0 for unlimited")
+    parser.add_argument("--token", default=os.getenv("CONTRACT_REVIEW_SERVICE_TOKEN"),
+                        help="Bearer token clients must send, required unless the service only listens on loopback")
+    parser.add_argument("--log-level", default=os.getenv("CONTRACT_REVIEW_LOG_LEVEL", "INFO").upper())
+    args = parser.parse_args(argv)
+    configure_logging(args.log_level)
+
+    if not args.token and not is_loopback(args.host):
+        # Jobs send documents to OpenAI and LlamaParse, an open port would do that for anyone
+        logger.error("Listening on %s needs a token, set --token or CONTRACT_REVIEW_SERVICE_TOKEN", args.host)
+        return 2
+
+    if args.requests_per_minute:
+        from src.clients import set_rate_limiter
+        set_rate_limiter(SharedRateLimiter(args.requests_per_minute))
+
+    workers = ServiceWorkers(job_queue, args.workers, args.chat_workers)
+    server = ReviewService((args.host, args.port), job_queue, workers, args.token or None)
+    workers.start()
+    logger.info("Serving on http://%s:%d with %d workers", args.host, server.server_port, args.workers)
+    signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down, running jobs are requeued on the next start")
+    finally:
+        workers.stop()
+        server.server_close()
+    return 0
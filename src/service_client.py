@@ -0,0 +1,125 @@
+import base64
+import json
+import os
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from src.result_store import StoredRun
+
+# When set, the GUI sends its work to a running service (src/service.py) instead of
+# running the pipeline itself
+SERVICE_URL = os.getenv("CONTRACT_REVIEW_SERVICE_URL")
+SERVICE_TOKEN = os.getenv("CONTRACT_REVIEW_SERVICE_TOKEN")
+
+class ServiceError(Exception):
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+class ServiceClient:
+    def __init__(self, base_url: str, poll_interval: float = 1.0, timeout: float = 30.0, token: Optional[str] = SERVICE_TOKEN):
+        self.base_url = base_url.rstrip("/")
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.token = token
+
+    def _request(self, method: str, path: str, body: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        import urllib.error
+        import urllib.request
+
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        request = urllib.request.Request(self.base_url + path, data=data, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            try:
+                body = json.loads(e.read())
+                detail = body.get("error") or body.get("status")
+            except ValueError:
+                detail = e.reason
+            raise ServiceError(f"{method} {path} failed with {e.code}: {detail}", e.code) from e
+        except urllib.error.URLError as e:
+            raise ServiceError(f"Could not reach the service at {self.base_url}: {e.reason}") from e
+
+    def health(self) -> Dict[str, Any]:
+        return self._request("GET", "/health")
+
+    def submit(self, kind: str, **payload) -> Dict[str, Any]:
+        return self._request("POST", "/jobs", {"kind": kind, **payload})
+
+    def job(self, job_id: str) -> Dict[str, Any]:
+        return self._request("GET", f"/jobs/{job_id}")
+
+    def events(self, job_id: str, after: int = 0) -> List[Dict[str, Any]]:
+        return self._request("GET", f"/jobs/{job_id}/events?after={after}")["events"]
+
+    def result(self, job_id: str) -> Any:
+        return self._request("GET", f"/jobs/{job_id}/result")["result"]
+
+    def runs(self, limit: int = 200) -> List[Dict[str, Any]]:
+        return self._request("GET", f"/runs?limit={limit}")["runs"]
+
+    def load_run(self, run_id: int) -> Dict[str, Any]:
+        return self._request("GET", f"/runs/{run_id}")["result"]
+
+    def run(self, kind: str, progress: Optional[Callable[[Dict[str, Any]], None]] = None, **payload) -> Any:
+        # Submits a job and waits for it, passing its progress events on as they arrive
+        job_id = self.submit(kind, **payload)["id"]
+        seen = 0
+        while True:
+            status = self.job(job_id)
+            for event in self.events(job_id, seen):
+                seen = event.pop("seq")
+                if progress is not None:
+                    progress(event)
+            if status["status"] == "done":
+                return self.result(job_id)
+            if status["status"] == "failed":
+                raise ServiceError(status["error"])
+            time.sleep(self.poll_interval)
+
+def upload(file_path: str) -> Dict[str, str]:
+    # The service may run on another machine, files travel with the job
+    with open(file_path, "rb") as f:
+        return {"name": os.path.basename(file_path), "content": base64.b64encode(f.read()).decode("ascii")}
+
+def remote_review_documents(file_paths: List[str], company_name: str, progress=None) -> Dict[str, Any]:
+    return ServiceClient(SERVICE_URL).run("review", progress, company_name=company_name,
+                                          files=[upload(file_path) for file_path in file_paths])
+
+def remote_process_multiple_purchase_orders(file_paths: List[str], progress=None) -> List[Dict]:
+    # Results name their file, mapped back to the path it was picked from
+    local_paths = {os.path.basename(file_path): file_path for file_path in file_paths}
+
+    def local_result(result):
+        return {**result, "file_path": local_paths.get(result["file_path"], result["file_path"])}
+
+    def local_progress(event):
+        if progress is not None:
+            progress({**event, "result": local_result(event["result"])} if event.get("result") else event)
+
+    results = ServiceClient(SERVICE_URL).run("po_extract", local_progress, files=[upload(file_path) for file_path in file_paths])
+    return [local_result(result) for result in results]
+
+def remote_chat(company_name: str, message: str) -> str:
+    return ServiceClient(SERVICE_URL, poll_interval=0.25).run("chat", company_name=company_name, message=message)["answer"]
+
+def remote_rereview_stored_run(run_id: int, progress=None) -> Dict[str, Any]:
+    return ServiceClient(SERVICE_URL).run("rereview", progress, run_id=run_id)
+
+def remote_runs(limit: int = 200) -> List["StoredRun"]:
+    from src.result_store import StoredRun
+    return [StoredRun(**run) for run in ServiceClient(SERVICE_URL).runs(limit)]
+
+def remote_load_run(run_id: int) -> Optional[Dict[str, Any]]:
+    try:
+        return ServiceClient(SERVICE_URL).load_run(run_id)
+    except ServiceError as e:
+        if e.status == 404:
+            return None
+        raise
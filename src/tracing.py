@@ -0,0 +1,256 @@
+import atexit
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+# Attributes copied from a span to every span started inside it
+INHERITED_ATTRIBUTES = ("job", "document", "clause")
+
+logger = logging.getLogger(__name__)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attributes", "start_ns", "end_ns", "status")
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        inherited = {key: parent.attributes[key] for key in INHERITED_ATTRIBUTES if parent and key in parent.attributes}
+        self.attributes = {**inherited, **attributes}
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = "ok"
+
+    @property
+    def duration(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration * 1000, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+class JsonLinesExporter:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+class OtlpHttpExporter:
+    # Sends spans in OTLP/HTTP JSON to a collector from a background thread, so the
+    # pipeline never waits on the network for tracing
+    def __init__(self, endpoint: str, service_name: str = "contract-review", batch_size: int = 256):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        threading.Thread(target=self._run, name="otlp-exporter", daemon=True).start()
+        atexit.register(self.flush)
+
+    def export(self, span: Span):
+        self._queue.put(span)
+
+    @staticmethod
+    def _attribute(key: str, value: Any) -> Dict[str, Any]:
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    def _send(self, spans: List[Span]):
+        import urllib.request
+
+        body = {"resourceSpans": [{
+            "resource": {"attributes": [self._attribute("service.name", self.service_name)]},
+            "scopeSpans": [{
+                "scope": {"name": "contract-review"},
+                "spans": [{
+                    "traceId": span.trace_id,
+                    "spanId": span.span_id,
+                    "parentSpanId": span.parent_id or "",
+                    "name": span.name,
+                    "kind": 1,
+                    "startTimeUnixNano": str(span.start_ns),
+                    "endTimeUnixNano": str(span.end_ns),
+                    "attributes": [self._attribute(key, value) for key, value in span.attributes.items()],
+                    "status": {"code": 2 if span.status == "error" else 1},
+                } for span in spans],
+            }],
+        }]}
+        request = urllib.request.Request(self.url, data=json.dumps(body).encode("utf-8"),
+                                         headers={"Content-Type": "application/json"}, method="POST")
+        try:
+            urllib.request.urlopen(request, timeout=5).close()
+        except Exception as e:
+            logger.warning("Could not export %d spans to %s: %s", len(spans), self.url, str(e))
+
+    def _drain(self, first: Optional[Span] = None) -> List[Span]:
+        spans = [first] if first else []
+        while len(spans) < self.batch_size:
+            try:
+                spans.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return spans
+
+    def _run(self):
+        while True:
+            spans = self._drain(self._queue.get())
+            self._send(spans)
+            for _ in spans:
+                self._queue.task_done()
+
+    def flush(self):
+        self._queue.join()
+
+class _TimingCollector:
+    # Per-trace totals by span name, read back by review_documents for the GUI breakdown
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals: Dict[str, Dict[str, List[float]]] = {}
+
+    def export(self, span: Span):
+        with self._lock:
+            if span.parent_id is None:
+                # Traces nobody read back (PO extraction, chat) end here instead of piling up
+                self._totals.pop(span.trace_id, None)
+                return
+            totals = self._totals.setdefault(span.trace_id, {})
+            entry = totals.setdefault(span.name, [0.0, 0])
+            # A generator's span is charged for producing items, not for the consumer's work in between
+            entry[0] += span.attributes["busy_ms"] / 1000 if "busy_ms" in span.attributes else span.duration
+            entry[1] += 1
+
+    def pop(self, trace_id: str) -> Dict[str, List[float]]:
+        with self._lock:
+            return self._totals.pop(trace_id, {})
+
+_timings = _TimingCollector()
+exporters = [_timings]
+if os.getenv("CONTRACT_REVIEW_TRACE_FILE"):
+    exporters.append(JsonLinesExporter(os.getenv("CONTRACT_REVIEW_TRACE_FILE")))
+if os.getenv("CONTRACT_REVIEW_OTLP_ENDPOINT"):
+    exporters.append(OtlpHttpExporter(os.getenv("CONTRACT_REVIEW_OTLP_ENDPOINT")))
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+def _end(current: Span):
+    current.end_ns = time.time_ns()
+    for exporter in exporters:
+        exporter.export(current)
+
+def _mark_error(current: Span, error: BaseException):
+    current.status = "error"
+    current.attributes["error"] = f"{type(error).__name__}: {error}"
+
+@contextmanager
+def span(name: str, **attributes):
+    current = Span(name, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        _mark_error(current, e)
+        raise
+    finally:
+        _current_span.reset(token)
+        _end(current)
+
+def traced(name: str = None, attributes: Callable[[Dict[str, Any]], Dict[str, Any]] = None):
+    # Wraps a function in a span. `attributes` gets the call's bound arguments by name.
+    def decorator(func):
+        span_name = name or func.__name__
+        signature = inspect.signature(func)
+
+        def span_attributes(args, kwargs):
+            if attributes is None:
+                return {}
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return attributes(bound.arguments)
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                # The span lasts as long as the generator but is only current while an item is being
+                # produced, spans the consumer opens between items aren't its children.
+                # busy_ms is the time spent producing items.
+                current = Span(span_name, _current_span.get(), span_attributes(args, kwargs))
+                generator = func(*args, **kwargs)
+                busy = 0.0
+                items = 0
+                try:
+                    while True:
+                        token = _current_span.set(current)
+                        start = time.perf_counter()
+                        try:
+                            item = next(generator)
+                        except StopIteration:
+                            return
+                        finally:
+                            busy += time.perf_counter() - start
+                            _current_span.reset(token)
+                        items += 1
+                        yield item
+                except GeneratorExit:
+                    raise
+                except BaseException as e:
+                    _mark_error(current, e)
+                    raise
+                finally:
+                    generator.close()
+                    current.attributes["busy_ms"] = round(busy * 1000, 3)
+                    current.attributes["items"] = items
+                    _end(current)
+        elif inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with span(span_name, **span_attributes(args, kwargs)):
+                    return await func(*args, **kwargs)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with span(span_name, **span_attributes(args, kwargs)):
+                    return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def with_current_context(func: Callable) -> Callable:
+    # Executor threads don't inherit context variables, bind the caller's so spans nest
+    return functools.partial(contextvars.copy_context().run, func)
+
+def job_timings(trace_id: str) -> Dict[str, Dict[str, float]]:
+    return {
+        name: {"seconds": round(seconds, 3), "calls": int(calls)}
+        for name, (seconds, calls) in sorted(_timings.pop(trace_id).items(), key=lambda item: -item[1][0])
+    }
@@ -0,0 +1,131 @@
+import functools
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from src.cache import CACHE_DIR
+from src.tracing import current_span
+
+# USD per million tokens (input, output)
+TOKEN_PRICES = {
+    "gpt-4o-2024-08-06": (2.50, 10.00),
+    "gpt-4o": (2.50, 10.00),
+    "text-embedding-3-small": (0.02, 0.0),
+    "text-embedding-3-large": (0.13, 0.0),
+}
+# USD per page parsed by LlamaParse
+LLAMAPARSE_PAGE_PRICE = float(os.getenv("CONTRACT_REVIEW_LLAMAPARSE_PAGE_PRICE", "0.003"))
+
+LEDGER_PATH = os.path.join(CACHE_DIR, "usage_ledger.jsonl")
+
+@functools.lru_cache(maxsize=None)
+def _encoding(model: str):
+    import tiktoken
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+def estimate_tokens(text: str, model: str) -> int:
+    return len(_encoding(model).encode(text))
+
+def cost(model: str, prompt_tokens: int, completion_tokens: int = 0, pages: int = 0) -> float:
+    input_price, output_price = TOKEN_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1e6 + pages * LLAMAPARSE_PAGE_PRICE
+
+class UsageMeter:
+    # Usage records grouped by trace, so a job reads back only the calls made on its behalf.
+    # Calls made outside a traced job go straight to the ledger.
+    def __init__(self, ledger_path: str):
+        self.ledger_path = ledger_path
+        self._lock = threading.Lock()
+        self._records: Dict[str, List[Dict[str, Any]]] = {}
+
+    def add(self, record: Dict[str, Any]):
+        span = current_span()
+        if span is None:
+            self.write_ledger({"job": None, **record})
+            return
+        record.update({key: span.attributes[key] for key in ("job", "document", "clause") if key in span.attributes})
+        with self._lock:
+            self._records.setdefault(span.trace_id, []).append(record)
+
+    def pop(self, trace_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return self._records.pop(trace_id, [])
+
+    def write_ledger(self, entry: Dict[str, Any]):
+        line = json.dumps({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), **entry})
+        with self._lock:
+            os.makedirs(os.path.dirname(self.ledger_path), exist_ok=True)
+            with open(self.ledger_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+usage_meter = UsageMeter(LEDGER_PATH)
+
+def _record(stage: str, model: str, prompt_tokens: int = 0, completion_tokens: int = 0,
+            pages: int = 0, requests: int = 1, estimated: bool = False, cached: int = 0):
+    usage_meter.add({
+        "stage": stage,
+        "model": model,
+        "requests": requests,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "pages": pages,
+        "cached": cached,
+        "estimated": requests if estimated else 0,
+        "cost_usd": cost(model, prompt_tokens, completion_tokens, pages),
+    })
+
+def record_chat(stage: str, model: str, messages: List[Dict[str, str]], response=None, completion: str = None):
+    # Uses the usage the API returned, streamed or failed responses fall back to a tiktoken estimate
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        _record(stage, model, usage.prompt_tokens, usage.completion_tokens)
+        return
+    if completion is None and response is not None:
+        completion = response.choices[0].message.content or ""
+    prompt = "\n".join(message["content"] for message in messages)
+    _record(stage, model, estimate_tokens(prompt, model), estimate_tokens(completion or "", model), estimated=True)
+
+def record_embeddings(stage: str, model: str, texts: List[str], response=None):
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        _record(stage, model, usage.prompt_tokens)
+        return
+    _record(stage, model, sum(estimate_tokens(text, model) for text in texts), estimated=True)
+
+def record_pages(stage: str, pages: int, requests: int = 1):
+    _record(stage, "llamaparse", pages=pages, requests=requests)
+
+def record_cache_hits(stage: str, hits: int):
+    # Calls an earlier run made for us, tracked so the ledger shows what the caches save
+    if hits:
+        _record(stage, "cache", requests=0, cached=hits)
+
+def _totals(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    totals = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "pages": 0, "cached": 0, "estimated": 0, "cost_usd": 0.0}
+    for record in records:
+        for key in totals:
+            totals[key] += record[key]
+    totals["cost_usd"] = round(totals["cost_usd"], 6)
+    return totals
+
+def _grouped(records: List[Dict[str, Any]], key: str) -> Dict[str, Dict[str, Any]]:
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for record in records:
+        if record.get(key) is not None:
+            groups.setdefault(record[key], []).append(record)
+    return {name: _totals(group) for name, group in groups.items()}
+
+def job_usage(trace_id: str, job: Optional[str] = None) -> Dict[str, Any]:
+    records = usage_meter.pop(trace_id)
+    summary = {
+        "totals": _totals(records),
+        "by_stage": _grouped(records, "stage"),
+        "by_document": _grouped(records, "document"),
+        "by_clause": _grouped(records, "clause"),
+    }
+    usage_meter.write_ledger({"job": job, "totals": summary["totals"], "by_stage": summary["by_stage"]})
+    return summary
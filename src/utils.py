@@ -1,7 +1,11 @@
 import functools
 import json
+import os
+import threading
 from typing import Dict, Any
 
+NOTABLE_CLAUSES_PATH = 'notable_clauses.json'
+
 def memoize(func):
     cache = {}
     @functools.wraps(func)
@@ -12,7 +16,15 @@ def memoize(func):
         return cache[key]
     return memoized_func
 
-@memoize
+_notable_clauses = (None, None)
+_notable_clauses_lock = threading.Lock()
+
 def load_notable_clauses() -> Dict[str, Dict[str, Any]]:
-    with open('notable_clauses.json', 'r') as f:
-        return json.load(f)
+    # Re-read whenever the file changes, the GUI and service outlive edits to it
+    global _notable_clauses
+    mtime = os.stat(NOTABLE_CLAUSES_PATH).st_mtime_ns
+    with _notable_clauses_lock:
+        if _notable_clauses[0] != mtime:
+            with open(NOTABLE_CLAUSES_PATH, 'r') as f:
+                _notable_clauses = (mtime, json.load(f))
+        return _notable_clauses[1]